@@ -0,0 +1,157 @@
+import numpy as np
+
+from batch_engine import calculate_results_arrays
+from grid_engine import sweep_grid
+from instrumentation import instrumented
+from result_cache import memoize
+
+# מספר הנקודות בכל ציר בחלון הנוכחי - הרזולוציה שנשלחת לדפדפן
+DEFAULT_RESOLUTION = 100
+
+# מספר רמות העידון סביב קו המתאר - כל רמה מחלקת תא ל-2x2, כך שבעומק 4 הרזולוציה
+# האפקטיבית לאורך הקו היא פי 16 מזו של החלון (1600x1600 ב-100 נקודות לציר)
+DEFAULT_REFINEMENT_DEPTH = 4
+
+
+# פונקציה לחישוב המדד על רשת דו-ממדית, בצורה ש-go.Heatmap מצפה לה
+def evaluate_grid(base_params, param1, param2, x_values, y_values, output='רווח לפני מס'):
+    """
+    Returns:
+        np.ndarray: מערך בגודל (len(y_values), len(x_values)) - שורה לכל ערך של param2.
+    """
+
+    grid, _ = sweep_grid(base_params, [(param2, y_values), (param1, x_values)], output=output)
+    return grid
+
+
+# ערכי המדד בנקודות בודדות (x, y) - לעידון, בלי לבנות רשת מלאה
+def _evaluate_points(base_params, param1, param2, x, y, output):
+    columns = dict(base_params)
+    columns[param1], columns[param2] = x, y
+    return np.broadcast_to(calculate_results_arrays(columns)[output], x.shape)
+
+
+# התאים שבפינות שלהם המדד חוצה את הרמה (קו המתאר עובר בהם)
+def _straddling(corners, level):
+    above = corners > level
+    return above.any(axis=1) & ~above.all(axis=1)
+
+
+# פונקציה לחישוב קו מתאר מדויק בעידון מקומי של התאים שהוא חוצה
+def refine_contour(base_params, param1, param2, x_values, y_values, z, level=0.0, depth=DEFAULT_REFINEMENT_DEPTH,
+                   output='רווח לפני מס'):
+    """
+    מעדן רק את התאים שקו המתאר (למשל רווח 0 - נקודת האיזון) חוצה: בכל רמה כל
+    תא כזה מחולק ל-2x2, המדד מחושב בפינות החדשות בקריאה וקטורית אחת, ורק תתי
+    התאים שהקו חוצה ממשיכים לרמה הבאה. מספר ההערכות גדל עם אורך הקו ולא עם
+    שטח הרשת.
+
+    Args:
+        x_values, y_values, z: הרשת הגסה (כמו ב-evaluate_grid).
+        level (float): ערך המדד של קו המתאר.
+        depth (int): מספר רמות העידון.
+
+    Returns:
+        tuple: (x, y, evaluations) - קטעי הקו כרשימות נקודות עם None בין קטע לקטע
+            (הפורמט של go.Scatter), ומספר הערכות המודל.
+    """
+
+    x_values, y_values = np.asarray(x_values, dtype=np.float64), np.asarray(y_values, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    if len(x_values) < 2 or len(y_values) < 2:
+        return [], [], 0
+
+    # תאים: פינה שמאלית-תחתונה, רוחב, גובה וערכי ארבע הפינות (ש"ת, י"ת, ש"ע, י"ע)
+    rows, cols = np.meshgrid(np.arange(len(y_values) - 1), np.arange(len(x_values) - 1), indexing='ij')
+    rows, cols = rows.ravel(), cols.ravel()
+    x0, y0 = x_values[cols], y_values[rows]
+    width, height = x_values[cols + 1] - x0, y_values[rows + 1] - y0
+    corners = np.stack([z[rows, cols], z[rows, cols + 1], z[rows + 1, cols], z[rows + 1, cols + 1]], axis=1)
+    keep = _straddling(corners, level)
+    x0, y0, width, height, corners = x0[keep], y0[keep], width[keep], height[keep], corners[keep]
+
+    evaluations = 0
+    for _ in range(depth):
+        if not len(x0):
+            break
+        # חמש נקודות חדשות לכל תא: אמצעי הצלעות והמרכז
+        half_w, half_h = width / 2, height / 2
+        new_x = np.stack([x0 + half_w, x0, x0 + width, x0 + half_w, x0 + half_w], axis=1)
+        new_y = np.stack([y0, y0 + half_h, y0 + half_h, y0 + height, y0 + half_h], axis=1)
+        bottom, left, right, top, center = np.moveaxis(
+            _evaluate_points(base_params, param1, param2, new_x, new_y, output), 1, 0)
+        evaluations += new_x.size
+        bottom_left, bottom_right, top_left, top_right = corners.T
+
+        children = np.concatenate([
+            np.stack([bottom_left, bottom, left, center], axis=1),
+            np.stack([bottom, bottom_right, center, right], axis=1),
+            np.stack([left, center, top_left, top], axis=1),
+            np.stack([center, right, top, top_right], axis=1),
+        ])
+        x0 = np.concatenate([x0, x0 + half_w, x0, x0 + half_w])
+        y0 = np.concatenate([y0, y0, y0 + half_h, y0 + half_h])
+        width, height = np.tile(half_w, 4), np.tile(half_h, 4)
+        keep = _straddling(children, level)
+        x0, y0, width, height, corners = x0[keep], y0[keep], width[keep], height[keep], children[keep]
+
+    # קטע אחד לכל תא סופי: בין נקודות החיתוך (אינטרפולציה ליניארית) על הצלעות שהקו חוצה
+    bottom_left, bottom_right, top_left, top_right = corners.T
+    edges = (
+        (bottom_left, bottom_right, x0, y0, width, 0.0),
+        (top_left, top_right, x0, y0 + height, width, 0.0),
+        (bottom_left, top_left, x0, y0, 0.0, height),
+        (bottom_right, top_right, x0 + width, y0, 0.0, height),
+    )
+    contour_x, contour_y = [], []
+    crossings = []
+    for start, end, edge_x, edge_y, dx, dy in edges:
+        crosses = (start > level) != (end > level)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip((level - start) / (end - start), 0.0, 1.0)
+        crossings.append((crosses, edge_x + t * dx, edge_y + t * dy))
+    for index in range(len(x0)):
+        points = [(xs[index], ys[index]) for crosses, xs, ys in crossings if crosses[index]]
+        for first, second in zip(points[::2], points[1::2]):
+            contour_x += [first[0], second[0], None]
+            contour_y += [first[1], second[1], None]
+    return contour_x, contour_y, evaluations
+
+
+# פונקציה לחישוב מפת חום לחלון הנוכחי, עם קו מתאר מעודן
+@instrumented('adaptive_grid.adaptive_heatmap')
+@memoize('adaptive_heatmap')
+def adaptive_heatmap(base_params, param1, param2, x_range, y_range, output='רווח לפני מס',
+                     resolution=DEFAULT_RESOLUTION, depth=DEFAULT_REFINEMENT_DEPTH, level=0.0):
+    """
+    מחשב את המדד ישירות כמערך דו-ממדי על החלון (x_range, y_range) ברזולוציה
+    קבועה. הגדלה (zoom) מחשבת מחדש רק את החלון החדש, כך שהרזולוציה האפקטיבית
+    גדלה עם ההגדלה בלי לחשב או לשלוח מיליון תאים מראש. קו המתאר ברמה level
+    מעודן בנפרד (ראו refine_contour).
+
+    Args:
+        base_params (dict): פרמטרי הבסיס.
+        param1, param2 (str): הפרמטרים בציר x ובציר y.
+        x_range, y_range (tuple): (מינימום, מקסימום) של החלון בכל ציר.
+        output (str): מפתח המדד.
+        resolution (int): מספר הנקודות בכל ציר.
+        depth (int): רמות העידון של קו המתאר (0 - ללא קו).
+        level (float): ערך המדד של קו המתאר.
+
+    Returns:
+        dict: 'x', 'y', 'z' (מערך (len(y), len(x))), 'contour_x', 'contour_y' ו-'evaluations'.
+    """
+
+    x_values = np.linspace(x_range[0], x_range[1], resolution)
+    y_values = np.linspace(y_range[0], y_range[1], resolution)
+    z = evaluate_grid(base_params, param1, param2, x_values, y_values, output)
+    contour_x, contour_y, evaluations = ([], [], 0) if depth <= 0 else refine_contour(
+        base_params, param1, param2, x_values, y_values, z, level, depth, output)
+    return {
+        'x': x_values,
+        'y': y_values,
+        'z': z,
+        'contour_x': contour_x,
+        'contour_y': contour_y,
+        'evaluations': z.size + evaluations,
+    }
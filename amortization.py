@@ -0,0 +1,130 @@
+import numpy as np
+
+from result_cache import memoize
+
+# ריבית שנתית ברירת מחדל (%) - ההנחה שהייתה קבועה במודל לפני שהפכה לפרמטר
+DEFAULT_ANNUAL_RATE = 5
+
+# סדרות לוח הסילוקין, בסדר הזה
+SCHEDULE_KEYS = ('תשלום', 'ריבית', 'קרן', 'יתרה')
+
+
+# פונקציה לחישוב סך התשלומים על הלוואה אחת (נתיב סקלרי, בפייתון טהור)
+def total_loan_payments(amount, annual_rate, months, grace_months=0, balloon=0.0):
+    """
+    סך כל התשלומים לאורך חיי ההלוואה: ריבית בתקופת הגרייס, תשלומי שפיצר ותשלום הבלון.
+
+    Args:
+        amount (float): קרן ההלוואה.
+        annual_rate (float): ריבית שנתית כשבר עשרוני (0.05 = 5%).
+        months (int): משך ההלוואה בחודשים, כולל תקופת הגרייס.
+        grace_months (int): חודשים ראשונים שבהם משולמת ריבית בלבד.
+        balloon (float): יתרת קרן שנפרעת יחד עם התשלום האחרון.
+
+    Returns:
+        float: סך התשלומים (0 כאשר אין חודשי הלוואה).
+    """
+
+    if months <= 0:
+        return 0.0
+    monthly_rate = annual_rate / 12
+    grace_months = min(grace_months, months)
+    amortizing_months = months - grace_months
+    if amortizing_months == 0:
+        return grace_months * amount * monthly_rate + amount
+    if monthly_rate == 0:
+        monthly_payment = (amount - balloon) / amortizing_months
+    else:
+        # np.power ולא **: ה-pow הווקטורי של NumPy (SIMD) עשוי להיות שונה ב-ulp מזה של
+        # פייתון, ושני הנתיבים חייבים להשתמש באותו מימוש כדי להישאר זהים בביט
+        discount = float(np.power(1 + monthly_rate, -amortizing_months))
+        monthly_payment = (amount - balloon * discount) * monthly_rate / (1 - discount)
+    return monthly_payment * amortizing_months + grace_months * amount * monthly_rate + balloon
+
+
+# אותו חישוב וקטורית - מערכים שניתנים ל-broadcast, זהה בביט לנתיב הסקלרי
+def loan_payment_totals(amount, annual_rate, months, grace_months=0, balloon=0.0):
+    amount, annual_rate, months, grace_months, balloon = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (amount, annual_rate, months, grace_months, balloon)))
+    monthly_rate = annual_rate / 12
+    grace_months = np.minimum(grace_months, months)
+    amortizing_months = months - grace_months
+    discount = np.power(1 + monthly_rate, -amortizing_months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        monthly_payment = np.where(monthly_rate == 0, (amount - balloon) / amortizing_months,
+                                   (amount - balloon * discount) * monthly_rate / (1 - discount))
+        totals = monthly_payment * amortizing_months + grace_months * amount * monthly_rate + balloon
+    totals = np.where(amortizing_months == 0, grace_months * amount * monthly_rate + amount, totals)
+    return np.where(months <= 0, 0.0, totals)
+
+
+# פונקציה לחישוב לוחות סילוקין חודשיים להלוואות רבות בבת אחת
+def amortization_schedule(amount, annual_rate, months, grace_months=0, balloon=0.0, horizon=None):
+    """
+    לוח סילוקין חודשי (שפיצר) עם תקופת גרייס של ריבית בלבד ותשלום בלון בסוף.
+
+    הלוח מחושב פעם אחת לכל צירוף ייחודי של תנאי הלוואה, כך שתרחישים רבים
+    שחולקים את אותה הלוואה (למשל בסריקת רגישות) אינם מחשבים אותו שוב.
+
+    Args:
+        amount, annual_rate, months, grace_months, balloon: כמו ב-total_loan_payments,
+            כסקלרים או מערכים שניתנים ל-broadcast (הלוואה אחת לכל איבר).
+        horizon (int): מספר החודשים בלוח. ברירת מחדל - משך ההלוואה הארוך ביותר.
+
+    Returns:
+        dict: מערך (N, horizon) לכל מפתח ב-SCHEDULE_KEYS. החודשים שאחרי סוף
+            ההלוואה הם 0.
+    """
+
+    terms = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (amount, annual_rate, months, grace_months, balloon)))
+    terms = np.stack([np.atleast_1d(value).ravel() for value in terms], axis=1)
+    terms[:, 2:4] = np.trunc(terms[:, 2:4])
+    if horizon is None:
+        horizon = int(terms[:, 2].max(initial=0))
+    unique_terms, inverse = np.unique(terms, axis=0, return_inverse=True)
+    schedule = _schedule(*unique_terms.T, int(horizon))
+    return {key: values[inverse.ravel()] for key, values in schedule.items()}
+
+
+def _schedule(amount, annual_rate, months, grace_months, balloon, horizon):
+    monthly_rate = (annual_rate / 12)[:, None]
+    grace_months = np.minimum(grace_months, months)
+    amortizing_months = months - grace_months
+    # בהלוואה ללא חודשי שפיצר כל הקרן נפרעת בסוף תקופת הגרייס
+    final_principal = np.where(amortizing_months > 0, balloon, amount)
+
+    growth_total = (1 + monthly_rate[:, 0]) ** (-amortizing_months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = np.where(monthly_rate[:, 0] == 0, (amount - balloon) / amortizing_months,
+                           (amount - balloon * growth_total) * monthly_rate[:, 0] / (1 - growth_total))
+    payment = np.where(amortizing_months > 0, payment, 0.0)[:, None]
+
+    # יתרה לפני חודש k, אחרי j תשלומי שפיצר: A(1+r)^j - P((1+r)^j - 1)/r
+    month = np.arange(1, horizon + 1)[None, :]
+    paid = np.maximum(month - 1 - grace_months[:, None], 0)
+    growth = (1 + monthly_rate) ** paid
+    with np.errstate(divide='ignore', invalid='ignore'):
+        balance_before = np.where(monthly_rate == 0, amount[:, None] - payment * paid,
+                                  amount[:, None] * growth - payment * (growth - 1) / monthly_rate)
+
+    active = month <= months[:, None]
+    balance_before = np.where(active, balance_before, 0.0)
+    interest = balance_before * monthly_rate
+    payments = np.where(month <= grace_months[:, None], interest, payment)
+    payments = np.where(month == months[:, None], payments + final_principal[:, None], payments)
+    payments = np.where(active, payments, 0.0)
+    principal = payments - interest
+    return dict(zip(SCHEDULE_KEYS, (payments, interest, principal, balance_before - principal)))
+
+
+# לוח סילוקין של הלוואה בודדת, שמור במטמון לפי תנאי ההלוואה
+@memoize('loan_schedule')
+def loan_schedule(amount, annual_rate, months, grace_months=0, balloon=0.0):
+    """
+    Returns:
+        dict: מערך באורך months לכל מפתח ב-SCHEDULE_KEYS.
+    """
+
+    schedule = amortization_schedule(amount, annual_rate, months, grace_months, balloon)
+    return {key: values[0] for key, values in schedule.items()}
@@ -0,0 +1,210 @@
+import numpy as np
+
+from amortization import loan_payment_totals
+from irr_engine import annuity_irr
+from model_core import FIELD_INDEX, PARAM_KEYS, default_params
+
+# סדר העמודות הקבוע במטריצת התרחישים - עמודה אחת לכל פרמטר, כמו בשדות ParamRecord
+PARAM_INDEX = FIELD_INDEX
+
+# מפתחות התוצאות המספריות שמחושבות במעבר אחד על כל התרחישים
+RESULT_KEYS = (
+    'עלויות הקמה',
+    'פחת שנתי (%)',
+    'הכנסות שנתיות',
+    'הוצאות משתנות',
+    'רווח גולמי',
+    'הוצאות קבועות',
+    'תשלומי הלוואה',
+    'רווח לפני מס',
+    'נקודת איזון (מספר כרטיסים לשנה)',
+    'נקודת איזון (מספר כרטיסים ליום)',
+    'החזר על ההשקעה (ROI)',
+    'תקופת החזר השקעה (שנים)',
+)
+
+# מדד ה-IRR מחושב בנפרד (פתרון איטרטיבי), ולכן אינו חלק מ-RESULT_KEYS
+IRR_KEY = 'החזר פנימי (IRR)'
+
+SETUP_COST_KEYS = (
+    'עלות בנייה', 'עלות מערכות חשמל ותאורה', 'עלות מערכות מיזוג ואוורור',
+    'עלות מתקני משחק', 'עלות ציוד VR/AR', 'עלות ריהוט ואביזרים',
+    'עלות מערכות ניהול ובקרה', 'עלות מערכות קופות ותשלומים', 'עלות אתר אינטרנט',
+    'עלות אישורי בטיחות וכיבוי אש', 'עלות רישיונות עסק', 'עלות ייעוץ עסקי ופיננסי',
+    'הוצאות משפטיות'
+)
+
+MONTHLY_FIXED_KEYS = (
+    'שכר דירה חודשי', 'משכורת מנכ"ל', 'משכורת מנהלים (סה"כ)', 'משכורת צוות (סה"כ)',
+    'הוצאות חשמל חודשיות', 'הוצאות מים חודשיות'
+)
+
+
+# פונקציה להמרת רשימת מילוני פרמטרים למטריצת תרחישים
+def params_to_matrix(params_list):
+    """
+    ממיר רשימה של מילוני פרמטרים למטריצה בגודל (N, מספר הפרמטרים).
+
+    Args:
+        params_list (list): רשימת מילונים עם מפתחות כמו ב-default_params. מפתח חסר מקבל
+            את הערך מ-default_params.
+
+    Returns:
+        np.ndarray: מטריצת float64 בסדר העמודות של PARAM_KEYS.
+    """
+
+    try:
+        return np.array([[params[key] for key in PARAM_KEYS] for params in params_list], dtype=np.float64)
+    except KeyError:
+        return np.array([[params.get(key, default_params[key]) for key in PARAM_KEYS] for params in params_list],
+                        dtype=np.float64)
+
+
+# פונקציה להמרת מטריצת תרחישים חזרה לרשימת מילונים
+def matrix_to_params(matrix):
+    return [dict(zip(PARAM_KEYS, row)) for row in np.asarray(matrix, dtype=np.float64).tolist()]
+
+
+# פונקציה ליצירת מטריצה של N עותקים של תרחיש בסיס
+def repeat_params(params, n):
+    return np.tile(params_to_matrix([params]), (n, 1))
+
+
+# חלוקה בטוחה - 0 כאשר המכנה הוא 0, כמו בנתיב הסקלרי
+def _safe_divide(numerator, denominator):
+    numerator, denominator = np.broadcast_arrays(
+        np.asarray(numerator, dtype=np.float64), np.asarray(denominator, dtype=np.float64))
+    out = np.zeros(numerator.shape)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+# פונקציה לחישוב התוצאות על עמודות פרמטרים (מערכים שניתנים ל-broadcast)
+def calculate_results_arrays(columns):
+    """
+    מחשב את כל התוצאות המספריות של calculate_results במעבר וקטורי אחד.
+
+    סדר הפעולות זהה לנתיב הסקלרי, ולכן התוצאות זהות ביט-לביט.
+
+    Args:
+        columns (dict): מילון מפרמטר למערך (או סקלר) של ערכים. המערכים חייבים
+            להיות ניתנים ל-broadcast זה עם זה.
+
+    Returns:
+        dict: מילון מכל מפתח ב-RESULT_KEYS למערך תוצאות.
+    """
+
+    def col(key):
+        return np.asarray(columns[key], dtype=np.float64)
+
+    setup_costs = 0
+    for key in SETUP_COST_KEYS:
+        setup_costs = setup_costs + col(key)
+
+    annual_depreciation_percentage = col('שיעור פחת שנתי (%)')
+    annual_depreciation = setup_costs * (annual_depreciation_percentage / 100)
+
+    # הכנסות
+    visitors_regular = col('מספר מבקרים ביום רגיל')
+    visitors_holiday = col('מספר מבקרים ביום חופשה/חג')
+
+    income_regular_tickets = visitors_regular * col('מחיר כניסה ליום רגיל') * 191
+    income_regular_food = visitors_regular * col('רכישה ממוצעת במזון ביום רגיל') * 191
+    income_regular_merch = visitors_regular * col('רכישה ממוצעת במרצ\'נדייז ביום רגיל') * 191
+
+    income_holiday_tickets = visitors_holiday * col('מחיר כניסה ליום חופשה/חג') * 100
+    income_holiday_food = visitors_holiday * col('רכישה ממוצעת במזון ביום חופשה/חג') * 100
+    income_holiday_merch = visitors_holiday * col('רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג') * 100
+
+    income_events = col('מספר אירועים פרטיים בחודש') * col('מחיר לאירוע פרטי') * 12
+    income_workshops = col('מספר סדנאות בחודש') * col('מספר משתתפים בסדנה') * col('מחיר לסדנה') * 12
+
+    total_income = 0
+    for income in (income_regular_tickets, income_regular_food, income_regular_merch,
+                   income_holiday_tickets, income_holiday_food, income_holiday_merch,
+                   income_events, income_workshops):
+        total_income = total_income + income
+
+    # הוצאות משתנות
+    cost_of_merch = (income_regular_merch + income_holiday_merch) * 0.5
+    cost_of_food = (income_regular_food + income_holiday_food) * 0.4
+    cost_of_workshops = income_workshops * 0.5
+    cost_of_events = income_events * 0.4
+    total_variable_expenses = cost_of_merch + cost_of_food + cost_of_workshops + cost_of_events
+
+    gross_profit = total_income - total_variable_expenses
+
+    # הוצאות קבועות (כוללות פחת והון חוזר)
+    total_fixed_expenses = (
+        (col('שכר דירה חודשי') + col('משכורת מנכ"ל') + col('משכורת מנהלים (סה"כ)') +
+         col('משכורת צוות (סה"כ)') + col('הוצאות חשמל חודשיות') + col('הוצאות מים חודשיות')) * 12 +
+        col('ארנונה שנתית') + col('הוצאות נוספות שנתיות') + annual_depreciation + col('הון חוזר לתפעול ראשוני')
+    )
+
+    # תשלומי הלוואה
+    loan_duration_months = np.trunc(col('אורך מימון (שנים)')) * 12
+    total_loan_payments = loan_payment_totals(
+        col('תשלומי הלוואה שנתיים'), col('ריבית שנתית על הלוואה (%)') / 100, loan_duration_months)
+
+    profit_before_tax = gross_profit - total_fixed_expenses - total_loan_payments
+
+    # מחיר כניסה ממוצע ונקודות איזון
+    total_visitors = visitors_regular * 191 + visitors_holiday * 100
+    average_ticket_price = _safe_divide(total_income, total_visitors)
+    breakeven_total_tickets = _safe_divide(
+        total_variable_expenses + total_fixed_expenses + total_loan_payments, average_ticket_price)
+    breakeven_daily_tickets = breakeven_total_tickets / 300
+
+    roi = _safe_divide(profit_before_tax, setup_costs) * 100
+    payback_period = _safe_divide(setup_costs, profit_before_tax)
+
+    results = {
+        'עלויות הקמה': setup_costs,
+        'פחת שנתי (%)': annual_depreciation_percentage,
+        'הכנסות שנתיות': total_income,
+        'הוצאות משתנות': total_variable_expenses,
+        'רווח גולמי': gross_profit,
+        'הוצאות קבועות': total_fixed_expenses,
+        'תשלומי הלוואה': total_loan_payments,
+        'רווח לפני מס': profit_before_tax,
+        'נקודת איזון (מספר כרטיסים לשנה)': breakeven_total_tickets,
+        'נקודת איזון (מספר כרטיסים ליום)': breakeven_daily_tickets,
+        'החזר על ההשקעה (ROI)': roi,
+        'תקופת החזר השקעה (שנים)': payback_period,
+    }
+
+    shape = np.broadcast_shapes(*(np.shape(value) for value in results.values()))
+    return {key: value if np.shape(value) == shape else np.broadcast_to(value, shape)
+            for key, value in results.items()}
+
+
+# פונקציה לחישוב התוצאות על מטריצת תרחישים
+def calculate_results_batch(matrix):
+    """
+    מחשב את התוצאות הפיננסיות עבור N תרחישים במעבר אחד.
+
+    Args:
+        matrix (np.ndarray): מטריצה בגודל (N, len(PARAM_KEYS)) בסדר העמודות של PARAM_KEYS.
+
+    Returns:
+        dict: מילון מכל מפתח ב-RESULT_KEYS למערך באורך N.
+    """
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[1] != len(PARAM_KEYS):
+        raise ValueError(f"Expected a matrix of shape (N, {len(PARAM_KEYS)}), got {matrix.shape}")
+
+    columns = dict(zip(PARAM_KEYS, np.ascontiguousarray(matrix.T)))
+    return calculate_results_arrays(columns)
+
+
+# פונקציה לחישוב IRR (באחוזים) לכל תרחיש מתוך תוצאות המנוע הווקטורי
+def calculate_irr_arrays(results, loan_duration_years):
+    """
+    IRR של תזרים ההשקעה והרווח השנתי לאורך שנות המימון, כמו calculate_irr.
+
+    Returns:
+        np.ndarray: IRR באחוזים, NaN כאשר אין פתרון.
+    """
+
+    return annuity_irr(results['עלויות הקמה'], results['רווח לפני מס'], loan_duration_years)['rate'] * 100
@@ -0,0 +1,257 @@
+"""
+הרצת תרחישים במצב אצווה, ללא ממשק משתמש.
+
+דוגמה:
+    python batch_runner.py scenarios.csv results.csv --workers 8 --chunk-size 50000
+
+עמודות הקלט נקראות כמו המפתחות ב-default_params; פרמטר חסר נלקח מ-default_params
+(או מקובץ JSON שמועבר ב---base). עמודות שאינן פרמטרים (למשל מזהה תרחיש) מועתקות לפלט.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_engine import IRR_KEY, PARAM_KEYS, RESULT_KEYS, calculate_results_batch
+from irr_engine import annuity_irr
+from model_core import default_params
+
+DEFAULT_CHUNK_SIZE = 50_000
+SUPPORTED_FORMATS = ('csv', 'json', 'jsonl', 'parquet', 'xlsx')
+
+# converged / no_root / max_iterations - כדי להבחין בין IRR לא מוגדר לבין פתרון שלא התכנס
+IRR_STATUS_COLUMN = 'סטטוס IRR'
+
+# עמודת קלט אופציונלית עם שם לכל תרחיש, לשמירה במאגר התרחישים
+NAME_COLUMN = 'שם'
+
+
+# זיהוי פורמט הקובץ לפי הסיומת
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'ndjson':
+        extension = 'jsonl'
+    if extension not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported file format: {path!r} (expected one of {SUPPORTED_FORMATS})")
+    return extension
+
+
+# קריאת קובץ התרחישים במקטעים
+def read_scenarios(path, chunk_size=DEFAULT_CHUNK_SIZE, file_format=None):
+    import pandas as pd
+
+    file_format = file_format or detect_format(path)
+    if file_format == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif file_format == 'jsonl':
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    elif file_format == 'xlsx':
+        raise ValueError("Excel is supported as an output format only")
+    elif file_format == 'json':
+        # מערך JSON אינו ניתן לקריאה הדרגתית - נטען פעם אחת ומחולק למקטעים
+        with open(path, encoding='utf-8') as f:
+            frame = pd.DataFrame(json.load(f))
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+    else:
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+# מטריצת הפרמטרים של מקטע - עמודה מהקובץ, או ערך הבסיס לפרמטר שאין לו עמודה.
+# המקטע עצמו הוא DataFrame, כך ש-pandas כבר נטען בתהליך שמקבל אותו
+def chunk_matrix(frame, base_params):
+    import pandas as pd
+
+    matrix = np.empty((len(frame), len(PARAM_KEYS)))
+    for index, key in enumerate(PARAM_KEYS):
+        if key in frame.columns:
+            matrix[:, index] = pd.to_numeric(frame[key], errors='raise').to_numpy(dtype=np.float64)
+        else:
+            matrix[:, index] = base_params[key]
+    return matrix
+
+
+# חישוב מקטע תרחישים (רץ בתהליך נפרד)
+def evaluate_chunk(frame, base_params):
+    """
+    מחשב את תוצאות המודל לכל שורה במקטע.
+
+    Args:
+        frame (pd.DataFrame): שורות התרחישים.
+        base_params (dict): ערכים לפרמטרים שאין להם עמודה.
+
+    Returns:
+        pd.DataFrame: עמודות שאינן פרמטרים, ואחריהן עמודת תוצאה לכל מפתח ב-RESULT_KEYS,
+            IRR וסטטוס הפתרון שלו.
+    """
+
+    matrix = chunk_matrix(frame, base_params)
+    results = calculate_results_batch(matrix)
+    output = frame[[column for column in frame.columns if column not in PARAM_KEYS]].reset_index(drop=True)
+    for key in RESULT_KEYS:
+        output[key] = results[key]
+    solution = annuity_irr(
+        results['עלויות הקמה'], results['רווח לפני מס'], matrix[:, PARAM_KEYS.index('אורך מימון (שנים)')])
+    output[IRR_KEY] = solution['rate'] * 100
+    output[IRR_STATUS_COLUMN] = solution['status']
+    return output
+
+
+# רשומה לפלט JSON: ערך לא סופי (IRR או תקופת החזר לא מוגדרים) נכתב כ-null, כמו ב-to_json,
+# כי NaN ו-Infinity אינם JSON תקין
+def _json_record(record):
+    return {key: None if isinstance(value, float) and not math.isfinite(value) else value
+            for key, value in record.items()}
+
+
+# כותב פלט הדרגתי - כל מקטע נכתב מיד ונשכח
+class ResultWriter:
+    def __init__(self, path, file_format=None):
+        self.path = path
+        self.file_format = file_format or detect_format(path)
+        self.rows = 0
+        self._parquet_writer = None
+        self._workbook = None
+        self._sheet = None
+        self._json_started = False
+        self._file = None
+
+    def write(self, frame):
+        if self.file_format == 'csv':
+            frame.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        elif self.file_format == 'jsonl':
+            # 15 ספרות (המקסימום של to_json; ברירת המחדל היא 10)
+            text = frame.to_json(orient='records', lines=True, force_ascii=False, double_precision=15)
+            self._append_handle().write(text if text.endswith('\n') else text + '\n')
+        elif self.file_format == 'json':
+            handle = self._append_handle()
+            for record in frame.to_dict(orient='records'):
+                handle.write('[\n' if not self._json_started else ',\n')
+                handle.write(json.dumps(_json_record(record), ensure_ascii=False, default=float, allow_nan=False))
+                self._json_started = True
+        elif self.file_format == 'xlsx':
+            if self._workbook is None:
+                self._open_workbook()
+                self._sheet = self._workbook.add_sheet('תוצאות', frame.columns)
+            self._sheet.write_rows(frame.itertuples(index=False, name=None))
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        self.rows += len(frame)
+
+    def _append_handle(self):
+        if self._file is None:
+            self._file = open(self.path, 'a' if self.rows else 'w', encoding='utf-8')
+        return self._file
+
+    def _open_workbook(self):
+        from excel_export import StreamingWorkbook
+
+        self._workbook = StreamingWorkbook(self.path)
+
+    def close(self):
+        if self.file_format == 'json':
+            handle = self._append_handle()
+            handle.write('\n]\n' if self._json_started else '[]\n')
+        if self._file is not None:
+            self._file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self.file_format == 'xlsx':
+            if self._workbook is None:
+                self._open_workbook()
+            self._workbook.close()
+
+
+# הרצת קובץ תרחישים מלא
+def run_batch(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, n_workers=None, base_params=None,
+              input_format=None, output_format=None, store=None, branch=None, progress=None):
+    """
+    קורא תרחישים, מחשב אותם במקטעים על מאגר תהליכים וכותב את התוצאות בהדרגה.
+
+    לכל היותר 2 מקטעים לכל תהליך נמצאים בזיכרון בו-זמנית, והפלט נכתב לפי סדר הקלט.
+    אם הועבר store (ScenarioStore), כל מקטע נשמר גם במאגר התרחישים תחת הסניף branch.
+    progress, אם הועבר, נקרא אחרי כל מקטע שנכתב - progress(שורות שנכתבו, None).
+
+    Returns:
+        int: מספר השורות שנכתבו.
+    """
+
+    base_params = base_params or default_params
+    n_workers = n_workers or os.cpu_count() or 1
+    chunks = read_scenarios(input_path, chunk_size, input_format)
+    writer = ResultWriter(output_path, output_format)
+
+    def write(frame, output):
+        writer.write(output)
+        if store is not None:
+            names = frame[NAME_COLUMN].astype(str).tolist() if NAME_COLUMN in frame.columns else None
+            store.save_batch(chunk_matrix(frame, base_params), output, names=names, branch=branch)
+        if progress is not None:
+            progress(writer.rows, None)
+
+    try:
+        if n_workers == 1:
+            for frame in chunks:
+                write(frame, evaluate_chunk(frame, base_params))
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                pending = []
+                for frame in chunks:
+                    pending.append((frame, executor.submit(evaluate_chunk, frame, base_params)))
+                    if len(pending) >= 2 * n_workers:
+                        frame, future = pending.pop(0)
+                        write(frame, future.result())
+                for frame, future in pending:
+                    write(frame, future.result())
+    finally:
+        writer.close()
+    return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="הרצת תרחישי תוכנית עסקית במצב אצווה")
+    parser.add_argument('input', help="קובץ תרחישים (csv, json, jsonl, parquet)")
+    parser.add_argument('output', help="קובץ תוצאות (csv, json, jsonl, parquet, xlsx)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="מספר שורות לכל מקטע")
+    parser.add_argument('--workers', type=int, default=None, help="מספר תהליכים (ברירת מחדל: מספר הליבות)")
+    parser.add_argument('--base', help="קובץ JSON עם פרמטרי בסיס לעמודות חסרות")
+    parser.add_argument('--store', help="קובץ SQLite של מאגר התרחישים לשמירת התוצאות")
+    parser.add_argument('--branch', help="שם הסניף לתרחישים שנשמרים במאגר")
+    args = parser.parse_args(argv)
+
+    base_params = dict(default_params)
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            base_params.update(json.load(f))
+
+    store = None
+    if args.store:
+        from scenario_store import ScenarioStore
+
+        store = ScenarioStore(args.store)
+    try:
+        rows = run_batch(args.input, args.output, chunk_size=args.chunk_size, n_workers=args.workers,
+                         base_params=base_params, store=store, branch=args.branch)
+    finally:
+        if store is not None:
+            store.close()
+    print(f"Wrote {rows} scenarios to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
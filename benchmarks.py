@@ -0,0 +1,309 @@
+"""
+חבילת מדידות ביצועים למודל, לניתוחי הרגישות, לייצוא לאקסל ולבניית הגרפים.
+
+דוגמאות:
+    python benchmarks.py --output bench.json
+    python benchmarks.py --baseline bench.json --tolerance 0.25
+
+הפלט הוא JSON עם זמני ריצה לכל מדידה (חציון, מינימום וממוצע בשניות לקריאה).
+בהשוואה לקובץ בסיס, מדידה שהחציון שלה גדל ביותר מ-tolerance מסומנת כנסיגה
+וקוד היציאה הוא 1.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from batch_engine import calculate_results_batch, repeat_params
+from grid_engine import sweep_grid
+from irr_engine import annuity_irr, irr
+from model_core import default_params, calculate_irr, calculate_results
+from result_cache import result_cache
+
+DEFAULT_REPEAT = 7
+DEFAULT_TOLERANCE = 0.2
+GRID_SIZES = (10, 100, 1000)
+BATCH_SIZES = (10_000, 100_000)
+FORMAT_SIZE = 100_000
+
+# מודולים שתהליכי העבודה (אצווה, מונטה קרלו, סובול, אופטימיזציה) טוענים, וספריות
+# כבדות שאסור שייטענו איתם - הן נטענות רק בשימוש הראשון
+WORKER_MODULES = ('model_core', 'batch_engine', 'monte_carlo', 'grid_engine', 'global_sensitivity', 'optimizer',
+                  'portfolio', 'batch_runner')
+HEAVY_MODULES = ('pandas', 'plotly', 'xlsxwriter', 'streamlit', 'dash', 'numpy_financial', 'sqlite3')
+
+
+# מדידת זמן ריצה של פונקציה: number קריאות בכל חזרה, repeat חזרות
+def measure(func, repeat=DEFAULT_REPEAT, number=1, setup=None):
+    func()  # חימום
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'mean': statistics.fmean(timings),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def _single_evaluation(repeat):
+    return {'calculate_results': measure(lambda: calculate_results(default_params), repeat, number=1000)}
+
+
+def _batch_throughput(repeat):
+    benchmarks = {}
+    for n in BATCH_SIZES:
+        matrix = repeat_params(default_params, n)
+        matrix[:, 0] *= np.linspace(0.5, 1.5, n)
+        stats = measure(lambda: calculate_results_batch(matrix), repeat)
+        stats['rows_per_second'] = n / stats['median']
+        benchmarks[f'calculate_results_batch[{n}]'] = stats
+    return benchmarks
+
+
+def _sweep_throughput(repeat):
+    benchmarks = {}
+    for size in GRID_SIZES:
+        axes = [('מספר מבקרים ביום רגיל', np.linspace(50, 300, size)),
+                ('מחיר כניסה ליום רגיל', np.linspace(40, 120, size))]
+        stats = measure(lambda: sweep_grid(default_params, axes), repeat)
+        stats['cells_per_second'] = size * size / stats['median']
+        benchmarks[f'sweep_grid[{size}x{size}]'] = stats
+
+    # מפת חום אדפטיבית - חלון של 100x100 וקו נקודת האיזון ברזולוציה אפקטיבית של 1600
+    from adaptive_grid import adaptive_heatmap
+
+    def heatmap():
+        return adaptive_heatmap(default_params, 'מספר מבקרים ביום רגיל', 'מספר מבקרים ביום חופשה/חג',
+                                (0, 400), (0, 400))
+
+    stats = measure(heatmap, repeat, setup=result_cache.clear)
+    stats['evaluations'] = heatmap()['evaluations']
+    benchmarks['adaptive_heatmap[100x100, depth 4]'] = stats
+    return benchmarks
+
+
+def _irr_cost(repeat):
+    results = calculate_results(default_params)
+    n = BATCH_SIZES[-1]
+    setup = np.full(n, results['עלויות הקמה'])
+    profit = np.linspace(0.5, 1.5, n) * results['רווח לפני מס']
+    years = np.full(n, default_params['אורך מימון (שנים)'])
+    stats = measure(lambda: annuity_irr(setup, profit, years), repeat)
+    stats['rows_per_second'] = n / stats['median']
+
+    # תזרימים כלליים - רווח שונה בכל שנה, דרך הפותר הכללי
+    periods = int(default_params['אורך מימון (שנים)'])
+    cash_flows = np.empty((n, periods + 1))
+    cash_flows[:, 0] = -setup
+    cash_flows[:, 1:] = profit[:, None] * np.random.default_rng(0).uniform(0.5, 1.5, (n, periods))
+    general = measure(lambda: irr(cash_flows), repeat)
+    general['rows_per_second'] = n / general['median']
+    return {
+        'calculate_irr': measure(
+            lambda: calculate_irr(results['עלויות הקמה'], results['רווח לפני מס'], default_params['אורך מימון (שנים)']),
+            repeat, number=100),
+        f'annuity_irr[{n}]': stats,
+        f'irr[{n}x{periods + 1}]': general,
+    }
+
+
+# ריקון המטמונים לפני כל חזרה, כדי למדוד חישוב ובנייה מלאים ולא שליפה
+def _clear_caches():
+    from charts import figure_cache
+
+    result_cache.clear()
+    figure_cache.clear()
+
+
+def _sensitivity_callbacks(repeat):
+    from charts import update_advanced_sensitivity_graph, update_sensitivity_graph
+
+    store_data = {'params': dict(default_params)}
+    return {
+        'update_sensitivity_graph': measure(
+            lambda: update_sensitivity_graph('מספר מבקרים ביום רגיל', store_data), repeat, setup=_clear_caches),
+        'update_advanced_sensitivity_graph': measure(
+            lambda: update_advanced_sensitivity_graph('מספר מבקרים ביום רגיל', 'מחיר כניסה ליום רגיל', store_data),
+            repeat, setup=_clear_caches),
+    }
+
+
+# טעינת מודול בתהליך חדש - זמן ההפעלה של כל תהליך עבודה
+def _import_module(module):
+    code = (f"import sys; import {module}; "
+            f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+
+
+def _import_time(repeat):
+    benchmarks = {}
+    for module in WORKER_MODULES:
+        stats = measure(lambda: _import_module(module), repeat)
+        heavy = _import_module(module)
+        stats['heavy_modules'] = heavy.split(',') if heavy else []
+        benchmarks[f'import {module}'] = stats
+    return benchmarks
+
+
+def _number_formatting(repeat):
+    import locale
+
+    from number_format import CURRENCY_SUFFIX, format_numbers
+
+    values = np.random.default_rng(0).normal(0, 1e6, FORMAT_SIZE)
+    return {
+        f'format_numbers[{FORMAT_SIZE:,}]': measure(lambda: format_numbers(values, 2, CURRENCY_SUFFIX), repeat),
+        f'locale.format_string[{FORMAT_SIZE:,}]': measure(
+            lambda: [f"{locale.format_string('%.2f', value, grouping=True)}{CURRENCY_SUFFIX}" for value in values],
+            repeat),
+    }
+
+
+def _excel_export(repeat):
+    from excel_export import generate_excel
+
+    results = calculate_results(default_params)
+    stats = measure(lambda: generate_excel(results), repeat)
+    stats['bytes'] = len(generate_excel(results).read())
+    return {'generate_excel': stats}
+
+
+def _figure_building(repeat):
+    import charts
+
+    params = dict(default_params)
+    results = calculate_results(params)
+    builders = {
+        'build_waterfall_figure': lambda: charts.build_waterfall_figure(results),
+        'build_income_pie_figure': lambda: charts.build_income_pie_figure(results),
+        'build_expense_pie_figure': lambda: charts.build_expense_pie_figure(results),
+        'build_breakeven_figure': lambda: charts.build_breakeven_figure(params, results),
+        'build_cash_flow_figure': lambda: charts.build_cash_flow_figure(params),
+        'build_profit_margin_figure': lambda: charts.build_profit_margin_figure(results),
+        'update_tornado_graph': lambda: charts.update_tornado_graph({'params': params}),
+    }
+    return {name: measure(builder, repeat, setup=_clear_caches) for name, builder in builders.items()}
+
+
+# קבוצות המדידות. קבוצה שחסרה לה תלות (למשל plotly) מדווחת כ-skipped
+BENCHMARK_GROUPS = {
+    'imports': _import_time,
+    'single': _single_evaluation,
+    'batch': _batch_throughput,
+    'sweep': _sweep_throughput,
+    'irr': _irr_cost,
+    'sensitivity': _sensitivity_callbacks,
+    'formatting': _number_formatting,
+    'excel': _excel_export,
+    'figures': _figure_building,
+}
+
+
+# הרצת כל קבוצות המדידות (או חלקן)
+def run_benchmarks(groups=None, repeat=DEFAULT_REPEAT):
+    benchmarks = {}
+    skipped = {}
+    for group in groups or BENCHMARK_GROUPS:
+        try:
+            benchmarks.update(BENCHMARK_GROUPS[group](repeat))
+        except ImportError as e:
+            skipped[group] = str(e)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'repeat': repeat,
+        },
+        'benchmarks': benchmarks,
+        'skipped': skipped,
+    }
+
+
+# השוואת תוצאות למדידת בסיס שמורה
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns:
+        list: רשימת (מדידה, חציון בסיס, חציון נוכחי, יחס, נסיגה) לכל מדידה שמופיעה בשניהם.
+    """
+
+    comparison = []
+    for name, stats in report['benchmarks'].items():
+        base_stats = baseline.get('benchmarks', {}).get(name)
+        if not base_stats or 'median' not in stats or 'median' not in base_stats:
+            continue
+        ratio = stats['median'] / base_stats['median'] if base_stats['median'] else float('inf')
+        comparison.append((name, base_stats['median'], stats['median'], ratio, ratio > 1 + tolerance))
+    return comparison
+
+
+def _format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="מדידות ביצועים למחשבון התוכנית העסקית")
+    parser.add_argument('--output', help="קובץ JSON לשמירת התוצאות")
+    parser.add_argument('--baseline', help="קובץ JSON של מדידת בסיס להשוואה")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="האטה יחסית מותרת לפני סימון נסיגה (0.2 = 20%%)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="מספר חזרות לכל מדידה")
+    parser.add_argument('--group', action='append', choices=list(BENCHMARK_GROUPS),
+                        help="הרצת קבוצת מדידות מסוימת (ניתן לחזור על הדגל)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.group, args.repeat)
+    for name, stats in report['benchmarks'].items():
+        if 'median' in stats:
+            print(f"{name:50s} {_format_seconds(stats['median']):>12s}")
+    for group, reason in report['skipped'].items():
+        print(f"{group:50s} {'skipped':>12s}  ({reason})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = 0
+    print()
+    for name, base_median, median, ratio, regressed in compare_to_baseline(report, baseline, args.tolerance):
+        regressions += regressed
+        print(f"{name:50s} {_format_seconds(base_median):>12s} -> {_format_seconds(median):>12s}  "
+              f"x{ratio:.2f}{'  REGRESSION' if regressed else ''}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import numpy as np
+
+from amortization import SCHEDULE_KEYS, amortization_schedule
+from batch_engine import PARAM_INDEX, PARAM_KEYS, SETUP_COST_KEYS
+
+# פרופיל עונתיות ברירת מחדל: ימים רגילים וימי חופשה/חג בכל חודש (ינואר-דצמבר).
+# הסכומים השנתיים (191 ו-100) זהים להנחות של calculate_results.
+DEFAULT_REGULAR_DAYS_BY_MONTH = (20, 19, 20, 13, 20, 19, 8, 8, 15, 13, 20, 16)
+DEFAULT_HOLIDAY_DAYS_BY_MONTH = (4, 4, 6, 12, 5, 6, 17, 17, 8, 10, 4, 7)
+
+# פרופיל אחיד - אותן הנחות שנתיות של המודל, מחולקות שווה בין החודשים
+FLAT_REGULAR_DAYS_BY_MONTH = (191 / 12,) * 12
+FLAT_HOLIDAY_DAYS_BY_MONTH = (100 / 12,) * 12
+
+SALARY_KEYS = ('משכורת מנכ"ל', 'משכורת מנהלים (סה"כ)', 'משכורת צוות (סה"כ)')
+MONTHLY_COST_KEYS = ('שכר דירה חודשי', 'הוצאות חשמל חודשיות', 'הוצאות מים חודשיות')
+ANNUAL_COST_KEYS = ('ארנונה שנתית', 'הוצאות נוספות שנתיות')
+
+
+# פונקציה לתחזית תזרים מזומנים חודשית רב-שנתית
+def project_cash_flows(matrix, years=10, regular_days_by_month=DEFAULT_REGULAR_DAYS_BY_MONTH,
+                       holiday_days_by_month=DEFAULT_HOLIDAY_DAYS_BY_MONTH, ramp_up_months=0, ramp_up_start=1.0,
+                       visitor_growth=0.0, price_growth=0.0, salary_growth=0.0, cost_inflation=0.0,
+                       loan_rate=None, loan_grace_months=0, loan_balloon=0.0):
+    """
+    מחשב תחזית חודשית של הכנסות, הוצאות, החזרי הלוואה ותזרים עבור N תרחישים בבת אחת.
+
+    שיעורי הצמיחה שנתיים ומוחלים בתחילת כל שנת פעילות. הפחת אינו תזרימי ולכן
+    אינו נכלל; עלויות ההקמה וההון החוזר מוצאים בחודש 0 ותקבולי ההלוואה נכנסים בו.
+
+    Args:
+        matrix (np.ndarray): מטריצת תרחישים בגודל (N, len(PARAM_KEYS)).
+        years (int): אופק התחזית בשנים.
+        regular_days_by_month (sequence): מספר הימים הרגילים בכל חודש קלנדרי (12 ערכים).
+        holiday_days_by_month (sequence): מספר ימי החופשה/חג בכל חודש קלנדרי (12 ערכים).
+        ramp_up_months (int): מספר החודשים עד להגעה לתפוסה מלאה.
+        ramp_up_start (float): שיעור התפוסה בחודש הראשון (1.0 - ללא הרצה).
+        visitor_growth (float): צמיחה שנתית במספר המבקרים, האירועים והסדנאות.
+        price_growth (float): עלייה שנתית במחירים ובסלי הרכישה.
+        salary_growth (float): עלייה שנתית במשכורות.
+        cost_inflation (float): עלייה שנתית בשכר הדירה, בארנונה ובשאר ההוצאות הקבועות.
+        loan_rate (float): ריבית שנתית על ההלוואה (שבר עשרוני). None - לפי הפרמטר
+            'ריבית שנתית על הלוואה (%)' של כל תרחיש.
+        loan_grace_months (int): חודשים ראשונים שבהם משולמת על ההלוואה ריבית בלבד.
+        loan_balloon (float): יתרת קרן שנפרעת עם התשלום האחרון.
+
+    Returns:
+        dict: מערכים בגודל (N, years * 12) לכל סדרה חודשית, ובגודל (N,) עבור
+            'השקעה ראשונית' ו-'תקבולי הלוואה'.
+    """
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[1] != len(PARAM_KEYS):
+        raise ValueError(f"Expected a matrix of shape (N, {len(PARAM_KEYS)}), got {matrix.shape}")
+
+    def col(key):
+        return matrix[:, PARAM_INDEX[key]][:, None]
+
+    months = int(years) * 12
+    month_index = np.arange(months)
+    year_index = month_index // 12
+    regular_days = np.resize(np.asarray(regular_days_by_month, dtype=np.float64), months)
+    holiday_days = np.resize(np.asarray(holiday_days_by_month, dtype=np.float64), months)
+
+    # מקדמי הרצה וצמיחה לאורך הזמן
+    if ramp_up_months > 0:
+        ramp = np.minimum(1.0, ramp_up_start + (1 - ramp_up_start) * month_index / ramp_up_months)
+    else:
+        ramp = np.ones(months)
+    volume = ramp * (1 + visitor_growth) ** year_index
+    prices = (1 + price_growth) ** year_index
+    salaries = (1 + salary_growth) ** year_index
+    inflation = (1 + cost_inflation) ** year_index
+
+    visitors_regular = col('מספר מבקרים ביום רגיל') * regular_days * volume
+    visitors_holiday = col('מספר מבקרים ביום חופשה/חג') * holiday_days * volume
+
+    income_tickets = (visitors_regular * col('מחיר כניסה ליום רגיל') +
+                      visitors_holiday * col('מחיר כניסה ליום חופשה/חג')) * prices
+    income_food = (visitors_regular * col('רכישה ממוצעת במזון ביום רגיל') +
+                   visitors_holiday * col('רכישה ממוצעת במזון ביום חופשה/חג')) * prices
+    income_merch = (visitors_regular * col('רכישה ממוצעת במרצ\'נדייז ביום רגיל') +
+                    visitors_holiday * col('רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג')) * prices
+    income_events = col('מספר אירועים פרטיים בחודש') * col('מחיר לאירוע פרטי') * volume * prices
+    income_workshops = (col('מספר סדנאות בחודש') * col('מספר משתתפים בסדנה') * col('מחיר לסדנה') *
+                        volume * prices)
+    income = income_tickets + income_food + income_merch + income_events + income_workshops
+
+    # הוצאות משתנות - אותם שיעורי עלות כמו ב-calculate_variable_expenses
+    variable_expenses = income_merch * 0.5 + income_food * 0.4 + income_workshops * 0.5 + income_events * 0.4
+
+    salary_costs = sum(col(key) for key in SALARY_KEYS) * salaries
+    other_fixed_costs = (sum(col(key) for key in MONTHLY_COST_KEYS) +
+                         sum(col(key) for key in ANNUAL_COST_KEYS) / 12) * inflation
+    fixed_expenses = salary_costs + other_fixed_costs
+
+    loan_amount = matrix[:, PARAM_INDEX['תשלומי הלוואה שנתיים']]
+    loan_months = np.trunc(matrix[:, PARAM_INDEX['אורך מימון (שנים)']]) * 12
+    if loan_rate is None:
+        loan_rate = matrix[:, PARAM_INDEX['ריבית שנתית על הלוואה (%)']] / 100
+    schedule = amortization_schedule(loan_amount, loan_rate, loan_months, loan_grace_months, loan_balloon,
+                                     horizon=months)
+    loan_payments, interest, principal, loan_balance = (schedule[key] for key in SCHEDULE_KEYS)
+
+    operating_cash_flow = income - variable_expenses - fixed_expenses
+    net_cash_flow = operating_cash_flow - loan_payments
+
+    setup_costs = sum(matrix[:, PARAM_INDEX[key]] for key in SETUP_COST_KEYS)
+    initial_investment = setup_costs + matrix[:, PARAM_INDEX['הון חוזר לתפעול ראשוני']]
+    cumulative_cash_flow = (loan_amount - initial_investment)[:, None] + np.cumsum(net_cash_flow, axis=1)
+
+    return {
+        'השקעה ראשונית': initial_investment,
+        'תקבולי הלוואה': loan_amount,
+        'הכנסות': income,
+        'הוצאות משתנות': variable_expenses,
+        'הוצאות קבועות': fixed_expenses,
+        'תשלומי הלוואה': loan_payments,
+        'ריבית': interest,
+        'קרן': principal,
+        'יתרת הלוואה': loan_balance,
+        'תזרים תפעולי': operating_cash_flow,
+        'תזרים נטו': net_cash_flow,
+        'תזרים מצטבר': cumulative_cash_flow,
+    }
+
+
+# פונקציה לסיכום סדרה חודשית לסכומים שנתיים
+def annual_totals(monthly):
+    monthly = np.asarray(monthly)
+    return monthly.reshape(monthly.shape[0], -1, 12).sum(axis=2)
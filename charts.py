@@ -0,0 +1,295 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from adaptive_grid import DEFAULT_RESOLUTION, adaptive_heatmap
+from batch_engine import params_to_matrix
+from cash_flow_projection import annual_totals, project_cash_flows
+from grid_engine import sensitivity_range
+from instrumentation import instrumented
+from model_core import default_params, ParamRecord, calculate_results
+from model_graph import IncrementalModel
+from number_format import CURRENCY_SUFFIX, format_number, format_numbers
+from result_cache import ResultCache, memoize, shared_cache_dir
+from sensitivity import calculate_tornado
+
+# חישוב התוצאות דרך המטמון המשותף - תוכנית זהה לא מחושבת פעמיים
+cached_calculate_results = memoize('calculate_results')(calculate_results)
+
+# מטמון נפרד לגרפים. הגרף נשמר לפי hash של התוצאות ושל הקלטים של הגרף עצמו,
+# כך ששינוי בבחירה של גרף אחד לא בונה מחדש את האחרים. הגרפים מוחזרים ללא
+# העתקה - אין לשנות אותם אחרי הבנייה. כשמוגדרת תיקיית מטמון משותפת, הגרפים
+# נשמרים גם בה (בתת-תיקייה figures) ומשותפים לכל תהליכי השרת.
+FIGURE_CACHE_SIZE = 256
+figure_cache = ResultCache(maxsize=FIGURE_CACHE_SIZE, shared_dir=shared_cache_dir('figures'))
+
+
+def cached_figure(name):
+    return memoize(f'figures.{name}', cache=figure_cache, copy_result=False)
+
+
+# גרף מפל
+@instrumented('figures.build_waterfall_figure')
+@cached_figure('build_waterfall_figure')
+def build_waterfall_figure(results):
+    waterfall_fig = go.Figure(go.Waterfall(
+        name="",
+        orientation="v",
+        measure=["relative", "relative", "relative", "relative", "total"],
+        x=["הכנסות", "הוצאות משתנות", "הוצאות קבועות", "תשלומי הלוואה", "רווח לפני מס"],
+        textposition="outside",
+        text=format_numbers([
+            results['הכנסות שנתיות'],
+            -results['הוצאות משתנות'],
+            -results['הוצאות קבועות'],
+            -results['תשלומי הלוואה'],
+            results['רווח לפני מס']
+        ], 0, CURRENCY_SUFFIX).tolist(),
+        y=[
+            results['הכנסות שנתיות'],
+            -results['הוצאות משתנות'],
+            -results['הוצאות קבועות'],
+            -results['תשלומי הלוואה'],
+            results['רווח לפני מס']
+        ],
+        connector={"line": {"color": "rgb(63, 63, 63)"}},
+        increasing={"marker": {"color": "#007bff"}},
+        decreasing={"marker": {"color": "#dc3545"}},
+        totals={"marker": {"color": "#28a745"}},
+    ))
+    waterfall_fig.update_layout(
+        title="מפל הכנסות והוצאות",
+        xaxis_title="",
+        yaxis_title="ש״ח",
+        font=dict(size=14),
+        hovermode="x unified"
+    )
+    return waterfall_fig
+
+
+# גרף הכנסות לפי קטגוריות (גרף עוגה)
+@instrumented('figures.build_income_pie_figure')
+@cached_figure('build_income_pie_figure')
+def build_income_pie_figure(results):
+    income_df = pd.DataFrame(list(results['הכנסות לפי קטגוריות'].items()), columns=['קטגוריה', 'סכום'])
+    income_pie_fig = px.pie(income_df, values='סכום', names='קטגוריה', title='התפלגות ההכנסות')
+    income_pie_fig.update_traces(marker=dict(colors=['#007bff', '#28a745', '#dc3545', '#28a745', '#dc3545']))
+    income_pie_fig.update_layout(font=dict(size=14))
+    return income_pie_fig
+
+
+# גרף הוצאות לפי קטגוריות (גרף עוגה)
+@instrumented('figures.build_expense_pie_figure')
+@cached_figure('build_expense_pie_figure')
+def build_expense_pie_figure(results):
+    expense_df = pd.DataFrame(list(results['הוצאות לפי קטגוריות'].items()), columns=['קטגוריה', 'סכום'])
+    expense_pie_fig = px.pie(expense_df, values='סכום', names='קטגוריה', title='התפלגות ההוצאות')
+    expense_pie_fig.update_layout(font=dict(size=14))
+    return expense_pie_fig
+
+
+# גרף נקודת איזון
+@instrumented('figures.build_breakeven_figure')
+@cached_figure('build_breakeven_figure')
+def build_breakeven_figure(params, results):
+    breakeven_total_tickets = results['נקודת איזון (מספר כרטיסים לשנה)']
+    average_ticket_price = results['הכנסות שנתיות'] / (
+            params['מספר מבקרים ביום רגיל'] * 191 + params['מספר מבקרים ביום חופשה/חג'] * 100) if (
+            params['מספר מבקרים ביום רגיל'] * 191 + params['מספר מבקרים ביום חופשה/חג'] * 100) != 0 else 0
+
+    quantity = np.linspace(0, breakeven_total_tickets * 1.5, 100)
+    total_revenue = average_ticket_price * quantity
+    if breakeven_total_tickets != 0:
+        total_costs = (results['הוצאות משתנות'] + results['הוצאות קבועות'] + results['תשלומי הלוואה']) * quantity / breakeven_total_tickets
+    else:
+        total_costs = np.zeros_like(quantity)
+
+    breakeven_fig = go.Figure()
+    breakeven_fig.add_trace(go.Scatter(x=quantity, y=total_revenue, mode='lines', name='הכנסות', line=dict(color='#007bff')))
+    breakeven_fig.add_trace(go.Scatter(x=quantity, y=total_costs, mode='lines', name='הוצאות', line=dict(color='#dc3545')))
+    breakeven_fig.add_vline(x=breakeven_total_tickets, line_dash="dash", line_color="green",
+                            annotation_text=f"נקודת איזון: {format_number(breakeven_total_tickets, 0)} כרטיסים לשנה",
+                            annotation_position="top right")
+    breakeven_fig.update_layout(title='גרף נקודת איזון', xaxis_title='מספר כרטיסים לשנה', yaxis_title='ש״ח',
+                                font=dict(size=14))
+    return breakeven_fig
+
+
+# גרף זרם מזומנים (Cash Flow) - תחזית חודשית מסוכמת לשנים
+@instrumented('figures.build_cash_flow_figure')
+@cached_figure('build_cash_flow_figure')
+def build_cash_flow_figure(params, projection_years=10, **projection_options):
+    projection = project_cash_flows(params_to_matrix([params]), years=projection_years, **projection_options)
+    years = list(range(1, projection_years + 1))
+    cash_flow = [projection['תקבולי הלוואה'][0] - projection['השקעה ראשונית'][0]]  # השקעה התחלתית בניכוי הלוואה
+    cash_flow += annual_totals(projection['תזרים נטו'])[0].tolist()
+    cumulative_cash_flow = np.cumsum(cash_flow)
+
+    cash_flow_fig = go.Figure()
+    cash_flow_fig.add_trace(go.Bar(x=["השקעה"] + [f"שנה {year}" for year in years], y=cash_flow, name='תזרים מזומנים', marker=dict(color='#28a745')))
+    cash_flow_fig.add_trace(
+        go.Scatter(x=["השקעה"] + [f"שנה {year}" for year in years], y=cumulative_cash_flow, mode='lines+markers',
+                   name='תזרים מזומנים מצטבר', line=dict(color='#007bff')))
+    cash_flow_fig.update_layout(title='תזרים מזומנים', xaxis_title='שנים', yaxis_title='ש״ח', font=dict(size=14))
+    return cash_flow_fig
+
+
+# גרף תזרים מזומנים מאוחד של רשת סניפים (מתוך evaluate_portfolio)
+@instrumented('figures.build_portfolio_cash_flow_figure')
+def build_portfolio_cash_flow_figure(annual):
+    years = [f"שנה {year}" for year in annual.index]
+    portfolio_fig = go.Figure()
+    portfolio_fig.add_trace(go.Bar(x=years, y=annual['תזרים נטו'], name='תזרים נטו', marker=dict(color='#28a745')))
+    portfolio_fig.add_trace(go.Scatter(x=years, y=annual['תזרים מצטבר'], mode='lines+markers', name='תזרים מצטבר',
+                                       line=dict(color='#007bff')))
+    portfolio_fig.add_trace(go.Scatter(x=years, y=annual['סניפים פעילים'], mode='lines', name='סניפים פעילים',
+                                       yaxis='y2', line=dict(color='#ffc107', dash='dot')))
+    portfolio_fig.update_layout(title='תזרים מזומנים מאוחד', xaxis_title='שנים', yaxis_title='ש״ח',
+                                yaxis2=dict(title='סניפים', overlaying='y', side='right'), font=dict(size=14))
+    return portfolio_fig
+
+
+# גרף מדדי סובול (S1 ו-ST) של הפרמטרים המשפיעים ביותר על מדד
+@instrumented('figures.build_sobol_figure')
+def build_sobol_figure(indices, metric, top=15):
+    table = indices.head(top)
+    sobol_fig = go.Figure()
+    sobol_fig.add_trace(go.Bar(x=table.index, y=table['S1'], name='סדר ראשון (S1)', marker=dict(color='#007bff'),
+                               error_y=dict(type='data', array=table['S1_conf'])))
+    sobol_fig.add_trace(go.Bar(x=table.index, y=table['ST'], name='כולל (ST)', marker=dict(color='#ffc107'),
+                               error_y=dict(type='data', array=table['ST_conf'])))
+    sobol_fig.update_layout(title=f'רגישות גלובלית - {metric}', xaxis_title='פרמטר', yaxis_title='חלק מהשונות',
+                            barmode='group', font=dict(size=14))
+    return sobol_fig
+
+
+# גרף חזית פארטו - ערך צפוי מול סיכון (מתוך optimizer.pareto_front)
+@instrumented('figures.build_pareto_figure')
+def build_pareto_figure(candidates, objective):
+    feasible = candidates[candidates['feasible']]
+    front = feasible[feasible['pareto']].sort_values('std')
+    pareto_fig = go.Figure()
+    pareto_fig.add_trace(go.Scatter(x=feasible['std'], y=feasible['mean'], mode='markers', name='מועמדים',
+                                    marker=dict(color='#adb5bd', size=5)))
+    pareto_fig.add_trace(go.Scatter(x=front['std'], y=front['mean'], mode='lines+markers', name='חזית פארטו',
+                                    line=dict(color='#dc3545')))
+    pareto_fig.update_layout(title=f'{objective} - ערך צפוי מול סיכון', xaxis_title='סטיית תקן',
+                             yaxis_title='ערך צפוי', font=dict(size=14))
+    return pareto_fig
+
+
+# גרף שיעור רווחיות (Profit Margin)
+@instrumented('figures.build_profit_margin_figure')
+@cached_figure('build_profit_margin_figure')
+def build_profit_margin_figure(results):
+    profit_margin = (results['רווח לפני מס'] / results['הכנסות שנתיות']) * 100 if results['הכנסות שנתיות'] != 0 else 0
+    profit_margin_fig = go.Figure()
+    profit_margin_fig.add_trace(go.Indicator(
+        mode="gauge+number",
+        value=profit_margin,
+        title={'text': "שיעור רווחיות (%)"},
+        gauge={
+            'axis': {'range': [0, 100]},
+            'steps': [
+                {'range': [0, 20], 'color': "red"},
+                {'range': [20, 60], 'color': "yellow"},
+                {'range': [60, 100], 'color': "green"}
+            ],
+            'threshold': {'line': {'color': "black", 'width': 4}, 'thickness': 0.75, 'value': profit_margin}
+        }
+    ))
+    profit_margin_fig.update_layout(font=dict(size=14))
+    return profit_margin_fig
+
+
+# פונקציה לניתוח רגישות חד-פרמטרי
+@instrumented('perform_sensitivity_analysis')
+@memoize('perform_sensitivity_analysis')
+def perform_sensitivity_analysis(params, param, param_values):
+    return IncrementalModel(ParamRecord.from_dict(params)).sweep(param, param_values, 'רווח לפני מס')
+
+
+# קולבק לניתוח רגישות חד-פרמטרי
+@instrumented('figures.update_sensitivity_graph')
+@cached_figure('update_sensitivity_graph')
+def update_sensitivity_graph(param, store_data):
+    if not store_data or 'params' not in store_data:
+        return {}
+    params = store_data['params']
+    if param not in params:
+        return {}
+    # טווח שינוי של +/- 20%
+    base_value = params.get(param, default_params.get(param, 1))
+    param_values = sensitivity_range(base_value)
+    profits = perform_sensitivity_analysis(params, param, param_values)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=param_values, y=profits, mode='lines+markers', name='רווח לפני מס'))
+    fig.update_layout(
+        title=f'ניתוח רגישות - {param}',
+        xaxis_title=f"{param} (ש״ח)" if 'עלות' in param or 'מחיר' in param else param,
+        yaxis_title='רווח לפני מס (ש״ח)',
+        font=dict(size=14),
+        hovermode="x unified"
+    )
+    return fig
+
+
+# קולבק לניתוח רגישות מתקדם (הצלבה בין פרמטרים)
+@instrumented('figures.update_advanced_sensitivity_graph')
+@cached_figure('update_advanced_sensitivity_graph')
+def update_advanced_sensitivity_graph(param1, param2, store_data, x_range=None, y_range=None,
+                                      resolution=DEFAULT_RESOLUTION):
+    if not store_data or 'params' not in store_data:
+        return {}
+    params = store_data['params']
+    # הצלבה של פרמטר עם עצמו אינה רשת - אין מה להציג
+    if not param1 or not param2 or param1 not in params or param2 not in params or param1 == param2:
+        return {}
+    # חלון ברירת המחדל - טווח שינוי של +/- 20% לכל פרמטר. הגדלה מעבירה חלון קטן יותר
+    # ומחושבת מחדש באותה רזולוציה
+    if x_range is None:
+        x_values = sensitivity_range(params[param1])
+        x_range = (x_values[0], x_values[-1])
+    if y_range is None:
+        y_values = sensitivity_range(params[param2])
+        y_range = (y_values[0], y_values[-1])
+    heatmap = adaptive_heatmap(params, param1, param2, tuple(x_range), tuple(y_range), resolution=resolution)
+
+    fig = go.Figure()
+    fig.add_trace(go.Heatmap(x=heatmap['x'], y=heatmap['y'], z=heatmap['z'], colorscale='Viridis',
+                             colorbar=dict(title='רווח לפני מס (ש״ח)'),
+                             hovertemplate=f'{param1}: %{{x}}<br>{param2}: %{{y}}<br>'
+                                           'רווח: %{z:,.0f}<extra></extra>'))
+    if heatmap['contour_x']:
+        fig.add_trace(go.Scatter(x=heatmap['contour_x'], y=heatmap['contour_y'], mode='lines', name='נקודת איזון',
+                                 line=dict(color='white', width=2), hoverinfo='skip'))
+    fig.update_layout(title=f'ניתוח רגישות מתקדם - {param1} מול {param2}', xaxis_title=param1, yaxis_title=param2,
+                      font=dict(size=14), showlegend=False)
+    return fig
+
+
+# קולבק לתרשים טורנדו (שינוי של +/- 20% בכל פרמטר בנפרד)
+@instrumented('figures.update_tornado_graph')
+@cached_figure('update_tornado_graph')
+def update_tornado_graph(store_data):
+    if not store_data or 'params' not in store_data:
+        return {}
+    params = store_data['params']
+    base_profit = cached_calculate_results(params)['רווח לפני מס']
+    tornado = list(reversed(calculate_tornado(params)))  # הפרמטר המשפיע ביותר בראש התרשים
+    names = [key for key, _, _ in tornado]
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=names, x=[low - base_profit for _, low, _ in tornado], base=base_profit,
+                         orientation='h', name='ירידה של 20%', marker=dict(color='#dc3545')))
+    fig.add_trace(go.Bar(y=names, x=[high - base_profit for _, _, high in tornado], base=base_profit,
+                         orientation='h', name='עלייה של 20%', marker=dict(color='#28a745')))
+    fig.update_layout(
+        title='תרשים טורנדו - השפעת הפרמטרים על הרווח לפני מס',
+        xaxis_title='רווח לפני מס (ש״ח)',
+        barmode='overlay',
+        height=max(400, 22 * len(names)),
+        font=dict(size=14)
+    )
+    return fig
@@ -0,0 +1,193 @@
+"""
+שרת Dash לריבוי משתמשים - אותו מודל ואותם גרפים כמו באפליקציית Streamlit, ב-callbacks
+חסרי מצב שיכולים לרוץ בכמה תהליכים של gunicorn.
+
+דוגמאות:
+    python dash_app.py                                   # שרת פיתוח בתהליך אחד
+    gunicorn dash_app:server                             # לפי gunicorn.conf.py
+    GYMBOREE_WORKERS=8 gunicorn dash_app:server
+
+מצב התוכנית (הפרמטרים) נשמר בדפדפן ב-dcc.Store, כך שכל בקשה יכולה להגיע לכל
+תהליך. התוצאות והגרפים נשמרים במטמון בצד השרת לפי hash של הקלטים (ראו
+result_cache ו-charts.figure_cache). כשמוגדרת ב-GYMBOREE_CACHE_DIR תיקייה של
+משתמש השרת (ראו gunicorn.conf.py) המטמון משותף לכל התהליכים - תוכנית שחושבה
+בתהליך אחד לא מחושבת שוב בתהליך אחר.
+"""
+
+import os
+
+import dash_bootstrap_components as dbc
+import pandas as pd
+from dash import ALL, Dash, Input, Output, State, ctx, dcc, html
+
+from charts import (build_breakeven_figure, build_cash_flow_figure, build_expense_pie_figure,
+                    build_income_pie_figure, build_profit_margin_figure, build_waterfall_figure,
+                    cached_calculate_results, figure_cache, update_advanced_sensitivity_graph,
+                    update_sensitivity_graph, update_tornado_graph)
+from model_core import PARAM_GROUPS, PARAM_KEYS, default_params
+from number_format import CURRENCY_SUFFIX, PERCENT_SUFFIX, format_number, format_numbers
+from result_cache import result_cache
+
+# פורט שרת הפיתוח (ב-gunicorn הכתובת נקבעת ב-gunicorn.conf.py)
+DEFAULT_PORT = 8050
+
+# יחידות המדדים המרכזיים בטבלת התוצאות
+MAIN_METRIC_UNITS = {
+    'רווח לפני מס': CURRENCY_SUFFIX,
+    'נקודת איזון (מספר כרטיסים לשנה)': ' כרטיסים לשנה',
+    'נקודת איזון (מספר כרטיסים ליום)': ' כרטיסים ליום',
+    'החזר על ההשקעה (ROI)': PERCENT_SUFFIX,
+    'החזר פנימי (IRR)': PERCENT_SUFFIX,
+    'תקופת החזר השקעה (שנים)': ' שנים',
+}
+FINANCIAL_KEYS = ('הכנסות שנתיות', 'הוצאות משתנות', 'רווח גולמי', 'הוצאות קבועות', 'תשלומי הלוואה', 'רווח לפני מס')
+
+# הגרפים בטאב הגרפים: מזהה -> פונקציה שבונה את הגרף מהפרמטרים ומהתוצאות
+CHART_BUILDERS = {
+    'waterfall-graph': lambda params, results: build_waterfall_figure(results),
+    'income-pie-graph': lambda params, results: build_income_pie_figure(results),
+    'expense-pie-graph': lambda params, results: build_expense_pie_figure(results),
+    'breakeven-graph': lambda params, results: build_breakeven_figure(params, results),
+    'cash-flow-graph': lambda params, results: build_cash_flow_figure(params),
+    'profit-margin-graph': lambda params, results: build_profit_margin_figure(results),
+    'tornado-graph': lambda params, results: update_tornado_graph({'params': params}),
+}
+
+
+# שדה קלט לפרמטר. המזהה הוא המיקום של הפרמטר ב-PARAM_KEYS (שמות הפרמטרים כוללים גרשיים)
+def parameter_input(key):
+    return dbc.Row([
+        dbc.Label(key, width=7),
+        dbc.Col(dbc.Input(id={'type': 'param', 'index': PARAM_KEYS.index(key)}, type='number',
+                          value=default_params[key]), width=5),
+    ], className='mb-2')
+
+
+# פריסת הדף - נבנית מחדש לכל טעינה, כך שכל משתמש מתחיל מפרמטרי הבסיס
+def build_layout():
+    params = list(PARAM_KEYS)
+    return html.Div(dir='rtl', style={'textAlign': 'right'}, children=dbc.Container([
+        html.H1("מחשבון תוכנית עסקית לג'ימבורי יובל המבולבל", className='my-3'),
+        dcc.Store(id='plan-store', data={'params': dict(default_params)}),
+        dbc.Accordion([
+            dbc.AccordionItem([parameter_input(key) for key in keys], title=group)
+            for group, keys in PARAM_GROUPS.items()
+        ]),
+        dbc.Button("חשב", id='calculate', color='primary', className='my-3'),
+        dbc.Tabs([
+            dbc.Tab(html.Div(id='results-tables', className='mt-3'), label="תוצאות"),
+            dbc.Tab([dcc.Graph(id=graph_id) for graph_id in CHART_BUILDERS], label="גרפים"),
+            dbc.Tab([
+                dcc.Dropdown(id='sensitivity-param', options=params, value=params[0], className='mt-3'),
+                dcc.Graph(id='sensitivity-graph'),
+            ], label="ניתוח רגישות"),
+            dbc.Tab([
+                dbc.Row([
+                    dbc.Col(dcc.Dropdown(id='advanced-param1', options=params, value=params[0])),
+                    dbc.Col(dcc.Dropdown(id='advanced-param2', options=params, value=params[1])),
+                ], className='mt-3'),
+                dcc.Graph(id='advanced-sensitivity-graph'),
+            ], label="ניתוח רגישות מתקדם"),
+        ]),
+    ], fluid=True))
+
+
+# טבלה להצגה מרשימת שורות
+def _table(rows, columns):
+    return dbc.Table.from_dataframe(pd.DataFrame(rows, columns=columns), striped=True, bordered=True, hover=True)
+
+
+# טבלאות טאב התוצאות
+def results_tables(results):
+    main_metrics = [(key, format_number(results[key], suffix=unit, missing="N/A"))
+                    for key, unit in MAIN_METRIC_UNITS.items()]
+    financials = list(zip(FINANCIAL_KEYS, format_numbers([results[key] for key in FINANCIAL_KEYS],
+                                                         suffix=CURRENCY_SUFFIX)))
+    sections = [
+        ("מדדים עסקיים מרכזיים", main_metrics),
+        ("תוצאות כלכליות", financials),
+        ("הכנסות לפי קטגוריות", zip(results['הכנסות לפי קטגוריות'],
+                                   format_numbers(list(results['הכנסות לפי קטגוריות'].values()),
+                                                  suffix=CURRENCY_SUFFIX))),
+        ("הוצאות לפי קטגוריות", zip(results['הוצאות לפי קטגוריות'],
+                                   format_numbers(list(results['הוצאות לפי קטגוריות'].values()),
+                                                  suffix=CURRENCY_SUFFIX))),
+    ]
+    children = []
+    for title, rows in sections:
+        children += [html.H4(title), _table(list(rows), ['מדד', 'ערך'])]
+    return children
+
+
+# פרמטרי התוכנית מערכי שדות הקלט. שדה ריק או לא תקין - ערך הבסיס
+def read_params(values, ids):
+    params = dict(default_params)
+    for component_id, value in zip(ids, values):
+        if value is not None:
+            params[PARAM_KEYS[component_id['index']]] = value
+    return params
+
+
+# חלון ההגדלה מתוך relayoutData של הגרף. None בציר שלא הוגדל - טווח ברירת המחדל
+def zoom_window(relayout):
+    def axis_range(axis):
+        if f'{axis}.range[0]' in relayout:
+            return relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']
+        if f'{axis}.range' in relayout:
+            return tuple(relayout[f'{axis}.range'])
+        return None
+
+    return axis_range('xaxis'), axis_range('yaxis')
+
+
+app = Dash(__name__, title="מחשבון תוכנית עסקית", external_stylesheets=[dbc.themes.BOOTSTRAP])
+app.layout = build_layout
+
+# אפליקציית ה-WSGI ל-gunicorn
+server = app.server
+
+
+@app.callback(Output('plan-store', 'data'), Input('calculate', 'n_clicks'),
+              State({'type': 'param', 'index': ALL}, 'value'), State({'type': 'param', 'index': ALL}, 'id'),
+              prevent_initial_call=True)
+def update_plan(n_clicks, values, ids):
+    return {'params': read_params(values, ids)}
+
+
+@app.callback(Output('results-tables', 'children'), Input('plan-store', 'data'))
+def update_results_tables(store_data):
+    return results_tables(cached_calculate_results(store_data['params']))
+
+
+@app.callback([Output(graph_id, 'figure') for graph_id in CHART_BUILDERS], Input('plan-store', 'data'))
+def update_charts(store_data):
+    params = store_data['params']
+    results = cached_calculate_results(params)
+    return [build(params, results) for build in CHART_BUILDERS.values()]
+
+
+@app.callback(Output('sensitivity-graph', 'figure'), Input('sensitivity-param', 'value'),
+              Input('plan-store', 'data'))
+def update_sensitivity(param, store_data):
+    return update_sensitivity_graph(param, store_data)
+
+
+@app.callback(Output('advanced-sensitivity-graph', 'figure'), Input('advanced-param1', 'value'),
+              Input('advanced-param2', 'value'), Input('plan-store', 'data'),
+              Input('advanced-sensitivity-graph', 'relayoutData'))
+def update_advanced_sensitivity(param1, param2, store_data, relayout):
+    # הגדלה בגרף מחשבת מחדש את החלון החדש; החלפת פרמטר או תוכנית חוזרת לטווח ברירת המחדל
+    x_range = y_range = None
+    if ctx.triggered_id == 'advanced-sensitivity-graph' and relayout:
+        x_range, y_range = zoom_window(relayout)
+    return update_advanced_sensitivity_graph(param1, param2, store_data, x_range, y_range)
+
+
+# מוני המטמון של התהליך - לבדיקה שהבקשות מתחלקות בין התהליכים ושהמטמון המשותף נפגע
+@server.route('/cache-stats')
+def cache_stats():
+    return {'pid': os.getpid(), 'result_cache': result_cache.stats(), 'figure_cache': figure_cache.stats()}
+
+
+if __name__ == '__main__':
+    app.run(debug=False, port=int(os.environ.get('PORT', DEFAULT_PORT)))
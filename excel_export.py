@@ -0,0 +1,212 @@
+import csv
+import os
+import tempfile
+
+import numpy as np
+import xlsxwriter
+
+from instrumentation import instrumented
+
+# מספר השורות המקסימלי בגיליון אקסל (כולל שורת הכותרת)
+EXCEL_MAX_ROWS = 1_048_576
+
+# מספר השורות שמומרות מ-NumPy לרשימות פייתון בכל פעם
+DEFAULT_CHUNK_SIZE = 50_000
+
+# קבצים קטנים מזה נשמרים בזיכרון, גדולים יותר עוברים לקובץ זמני בדיסק
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# constant_memory - כל שורה נכתבת לקובץ זמני ברגע שעוברים לשורה הבאה, כך
+# שהזיכרון אינו תלוי במספר השורות. NaN/inf (למשל IRR לא מוגדר) נכתבים כשגיאות אקסל.
+WORKBOOK_OPTIONS = {'constant_memory': True, 'nan_inf_to_errors': True}
+
+SUPPORTED_FORMATS = ('xlsx', 'csv', 'parquet')
+
+
+# מקורות שורות - גנרטורים שמייצרים שורות במקטעים ולא מחזיקים טבלה שלמה
+def iter_array_rows(columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Args:
+        columns (sequence): מערכים באותו אורך, אחד לכל עמודה.
+
+    Yields:
+        tuple: שורה אחת.
+    """
+
+    arrays = [np.asarray(column) for column in columns]
+    n = len(arrays[0]) if arrays else 0
+    for start in range(0, n, chunk_size):
+        yield from zip(*(array[start:start + chunk_size].tolist() for array in arrays))
+
+
+def iter_grid_rows(grid, axis_labels, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    פורש רשת רגישות (תוצאת sweep_grid) לשורות: ערך לכל ציר ואחריו ערך המדד.
+    """
+
+    grid = np.asarray(grid)
+    flat = grid.reshape(-1)
+    for start in range(0, flat.size, chunk_size):
+        stop = min(start + chunk_size, flat.size)
+        indices = np.unravel_index(np.arange(start, stop), grid.shape)
+        columns = [values[index] for (_, values), index in zip(axis_labels, indices)] + [flat[start:stop]]
+        yield from zip(*(column.tolist() for column in columns))
+
+
+def grid_header(axis_labels, output):
+    return [param for param, _ in axis_labels] + [output]
+
+
+# סדרות חודשיות של project_cash_flows לטבלה: חודש ואחריו עמודה לכל סדרה
+def projection_header(projection):
+    return ['חודש'] + [key for key, value in projection.items() if np.ndim(value) == 2]
+
+
+def iter_projection_rows(projection, scenario=0):
+    series = [value[scenario] for value in projection.values() if np.ndim(value) == 2]
+    months = np.arange(1, len(series[0]) + 1)
+    return iter_array_rows([months] + series)
+
+
+# גיליון שנכתב שורה אחר שורה. כשמגיעים למגבלת השורות של אקסל, ממשיכים בגיליון המשך
+class SheetWriter:
+    def __init__(self, workbook, name, header):
+        self.workbook = workbook
+        self.name = name
+        self.header = list(header)
+        self.rows = 0
+        self._part = 0
+        self._new_worksheet()
+
+    def _new_worksheet(self):
+        self._part += 1
+        name = self.name if self._part == 1 else f"{self.name[:25]} ({self._part})"
+        self._worksheet = self.workbook.add_worksheet(name)
+        self._worksheet.write_row(0, 0, self.header)
+        self._row = 1
+
+    def write_rows(self, rows):
+        worksheet, row = self._worksheet, self._row
+        for values in rows:
+            if row == EXCEL_MAX_ROWS:
+                self._new_worksheet()
+                worksheet, row = self._worksheet, self._row
+            worksheet.write_row(row, 0, values)
+            row += 1
+            self.rows += 1
+        self._row = row
+
+
+# חוברת אקסל שנכתבת בזיכרון קבוע
+class StreamingWorkbook:
+    def __init__(self, target):
+        self.workbook = xlsxwriter.Workbook(target, WORKBOOK_OPTIONS)
+
+    def add_sheet(self, name, header):
+        return SheetWriter(self.workbook, name, header)
+
+    def write_sheet(self, name, header, rows):
+        sheet = self.add_sheet(name, header)
+        sheet.write_rows(rows)
+        return sheet.rows
+
+    def close(self):
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# כתיבת טבלה גדולה לקובץ - xlsx, או CSV/Parquet לטבלאות שחורגות מנוחות אקסל
+def export_table(path, header, rows, file_format=None, sheet_name='נתונים', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Args:
+        path (str): קובץ היעד. הפורמט נקבע לפי הסיומת אם file_format לא הועבר.
+        header (sequence): שמות העמודות.
+        rows (iterable): שורות (למשל מ-iter_grid_rows או iter_array_rows).
+
+    Returns:
+        int: מספר השורות שנכתבו.
+    """
+
+    file_format = file_format or os.path.splitext(path)[1].lower().lstrip('.')
+    if file_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format!r} (expected one of {SUPPORTED_FORMATS})")
+
+    if file_format == 'xlsx':
+        with StreamingWorkbook(path) as workbook:
+            return workbook.write_sheet(sheet_name, header, rows)
+
+    if file_format == 'csv':
+        count = 0
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    count = 0
+    parquet_writer = None
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk_size:
+                parquet_writer = _write_parquet_batch(pa, pq, parquet_writer, path, header, batch)
+                count += len(batch)
+                batch = []
+        if batch or parquet_writer is None:
+            parquet_writer = _write_parquet_batch(pa, pq, parquet_writer, path, header, batch)
+            count += len(batch)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    return count
+
+
+def _write_parquet_batch(pa, pq, parquet_writer, path, header, batch):
+    table = pa.Table.from_arrays([pa.array(column) for column in zip(*batch)] if batch else
+                                 [pa.array([], type=pa.float64()) for _ in header], names=list(header))
+    if parquet_writer is None:
+        parquet_writer = pq.ParquetWriter(path, table.schema)
+    parquet_writer.write_table(table)
+    return parquet_writer
+
+
+# פונקציה לייצוא תוצאות לאקסל
+@instrumented('generate_excel')
+def generate_excel(results, extra_sheets=()):
+    """
+    כותב את גיליונות הסיכום ואחריהם גיליונות נוספים (רשתות רגישות, תחזית חודשית
+    וכו') במצב constant_memory.
+
+    Args:
+        results (dict): תוצאות calculate_results.
+        extra_sheets (iterable): שלשות (שם גיליון, כותרות, שורות). השורות נצרכות
+            בהדרגה ואינן נשמרות בזיכרון.
+
+    Returns:
+        file: קובץ זמני (בזיכרון עד SPOOL_MAX_SIZE, אחר כך בדיסק) שממוקם בתחילתו.
+    """
+
+    if not results:
+        return None
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with StreamingWorkbook(output) as workbook:
+        workbook.write_sheet('תוצאות כלליות', ['מדד', 'ערך'], (
+            (key, value) for key, value in results.items() if not isinstance(value, dict)))
+        workbook.write_sheet('הכנסות לפי קטגוריות', ['קטגוריה', 'סכום'], results['הכנסות לפי קטגוריות'].items())
+        workbook.write_sheet('הוצאות לפי קטגוריות', ['קטגוריה', 'סכום'], results['הוצאות לפי קטגוריות'].items())
+        for name, header, rows in extra_sheets:
+            workbook.write_sheet(name, header, rows)
+    output.seek(0)
+    return output
@@ -0,0 +1,258 @@
+import os
+
+import numpy as np
+
+from batch_engine import PARAM_INDEX, PARAM_KEYS, calculate_results_batch, params_to_matrix
+from instrumentation import instrumented
+from jobs import process_pool
+
+# המדדים שעבורם מחושבים מדדי סובול
+SOBOL_METRICS = ('רווח לפני מס', 'החזר על ההשקעה (ROI)', 'תקופת החזר השקעה (שנים)')
+
+# טווח ברירת המחדל לכל פרמטר - +/- 20% סביב ערך הבסיס, כמו בניתוחי הרגישות האחרים
+DEFAULT_SPREAD = 0.2
+
+# מספר שורות הבסיס (A/B) בכל מקטע. כל שורה היא len(params) + 2 הערכות של המודל
+DEFAULT_CHUNK_SIZE = 4096
+
+# סדרת סובול: מספר הביטים בכל נקודה, וזרע קבוע למספרי הכיוון ההתחלתיים
+SOBOL_BITS = 32
+SOBOL_DIRECTION_SEED = 20_240_521
+
+
+# כפל פולינומים מעל GF(2) מודולו פולינום (ביטים של int)
+def _multiply_mod(a, b, modulus, degree):
+    product = 0
+    while b:
+        if b & 1:
+            product ^= a
+        b >>= 1
+        a <<= 1
+        if a >> degree & 1:
+            a ^= modulus
+    return product
+
+
+def _power_mod(exponent, modulus, degree):
+    result, base = 1, 2  # הפולינום x
+    while exponent:
+        if exponent & 1:
+            result = _multiply_mod(result, base, modulus, degree)
+        base = _multiply_mod(base, base, modulus, degree)
+        exponent >>= 1
+    return result
+
+
+def _prime_factors(n):
+    factors, divisor = set(), 2
+    while divisor * divisor <= n:
+        while n % divisor == 0:
+            factors.add(divisor)
+            n //= divisor
+        divisor += 1
+    if n > 1:
+        factors.add(n)
+    return factors
+
+
+# פולינומים פרימיטיביים מעל GF(2), לפי סדר הדרגה - פולינום אחד לכל ממד בסדרה
+def _primitive_polynomials(count):
+    polynomials, degree = [], 1
+    while len(polynomials) < count:
+        order = (1 << degree) - 1
+        factors = _prime_factors(order)
+        for middle in range(1 << (degree - 1)):
+            polynomial = 1 << degree | middle << 1 | 1
+            if _power_mod(order, polynomial, degree) == 1 and \
+                    all(_power_mod(order // factor, polynomial, degree) != 1 for factor in factors):
+                polynomials.append((degree, polynomial))
+                if len(polynomials) == count:
+                    break
+        degree += 1
+    return polynomials
+
+
+# פונקציה לחישוב מספרי הכיוון של סדרת סובול
+def sobol_directions(dimensions):
+    """
+    מספרי הכיוון של סדרת סובול ב-dimensions ממדים. הממד הראשון הוא סדרת ואן דר
+    קורפוט; כל ממד נוסף מבוסס על פולינום פרימיטיבי משלו, עם מספרי כיוון
+    התחלתיים אי-זוגיים שנבחרים מזרע קבוע (אותה סדרה בכל הרצה).
+
+    Returns:
+        np.ndarray: מערך uint64 בגודל (dimensions, SOBOL_BITS).
+    """
+
+    rng = np.random.default_rng(SOBOL_DIRECTION_SEED)
+    directions = np.empty((dimensions, SOBOL_BITS), dtype=np.uint64)
+    directions[0] = [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+    for dimension, (degree, polynomial) in enumerate(_primitive_polynomials(dimensions - 1), start=1):
+        m = [2 * int(rng.integers(0, 1 << k)) + 1 for k in range(min(degree, SOBOL_BITS))]
+        for k in range(degree, SOBOL_BITS):
+            value = m[k - degree] ^ m[k - degree] << degree
+            for j in range(1, degree):
+                if polynomial >> (degree - j) & 1:
+                    value ^= m[k - j] << j
+            m.append(value)
+        directions[dimension] = [m[k] << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+    return directions
+
+
+# פונקציה ליצירת נקודות סובול לפי אינדקסים (בכל סדר ובכל מקטע)
+def sobol_points(indices, directions, shift=None):
+    """
+    Args:
+        indices (np.ndarray): אינדקסי הנקודות בסדרה.
+        directions (np.ndarray): מספרי הכיוון (ראו sobol_directions).
+        shift (np.ndarray): הזזה דיגיטלית (XOR) אופציונלית לכל ממד - סדרה אקראית
+            שנשמרת בה התכונות של סובול.
+
+    Returns:
+        np.ndarray: נקודות בגודל (len(indices), ממדים) בתוך (0, 1).
+    """
+
+    indices = np.asarray(indices, dtype=np.uint64)
+    gray = indices ^ (indices >> np.uint64(1))
+    points = np.zeros((len(indices), directions.shape[0]), dtype=np.uint64)
+    for bit in range(SOBOL_BITS):
+        selected = (gray >> np.uint64(bit)) & np.uint64(1) == 1
+        points[selected] ^= directions[:, bit]
+    if shift is not None:
+        points ^= shift
+    return (points.astype(np.float64) + 0.5) / 2.0 ** SOBOL_BITS
+
+
+# פונקציה לבניית טווחי הפרמטרים לניתוח
+def parameter_bounds(base_params, params=None, spread=DEFAULT_SPREAD, bounds=None):
+    """
+    Args:
+        base_params (dict): פרמטרי הבסיס.
+        params (sequence): הפרמטרים המשתנים. None - כל הפרמטרים שערך הבסיס שלהם אינו 0.
+        spread (float): הטווח היחסי סביב ערך הבסיס.
+        bounds (dict): טווחים מפורשים, פרמטר -> (מינימום, מקסימום). גוברים על spread.
+
+    Returns:
+        dict: פרמטר -> (מינימום, מקסימום), בסדר PARAM_KEYS.
+    """
+
+    bounds = dict(bounds or {})
+    if params is None:
+        params = [key for key in PARAM_KEYS if key in bounds or base_params[key] != 0]
+    unknown = [key for key in list(params) + list(bounds) if key not in PARAM_INDEX]
+    if unknown:
+        raise ValueError(f"Unknown parameters: {unknown}")
+    ranges = {}
+    for key in PARAM_KEYS:
+        if key in bounds:
+            ranges[key] = tuple(float(value) for value in bounds[key])
+        elif key in params:
+            low, high = base_params[key] * (1 - spread), base_params[key] * (1 + spread)
+            ranges[key] = (min(low, high), max(low, high))
+    return ranges
+
+
+# עבודת מקטע אחד - מטריצות A, B ו-AB_i ומדדי המודל עליהן (רצה בתהליך נפרד)
+def _evaluate_chunk(base_row, columns, lows, highs, directions, shift, start, stop, metrics):
+    n_params = len(columns)
+    points = sobol_points(np.arange(start, stop), directions, shift)
+    a = lows + points[:, :n_params] * (highs - lows)
+    b = lows + points[:, n_params:] * (highs - lows)
+
+    # שורות A, אחריהן B, ואחריהן AB_i לכל פרמטר i (A עם עמודה i מתוך B)
+    size = stop - start
+    matrix = np.tile(base_row, ((n_params + 2) * size, 1))
+    matrix[:size, columns] = a
+    matrix[size:2 * size, columns] = b
+    for i, column in enumerate(columns):
+        block = matrix[(i + 2) * size:(i + 3) * size]
+        block[:, columns] = a
+        block[:, column] = b[:, i]
+
+    results = calculate_results_batch(matrix)
+    return {metric: results[metric].reshape(n_params + 2, size) for metric in metrics}
+
+
+# אומדי סלטלי (S1) וג'נסן (ST) על ערכי המודל, עבור השורות rows
+def _estimate(values, rows=slice(None)):
+    f_a, f_b, f_ab = values[0, rows], values[1, rows], values[2:, rows]
+    variance = np.var(np.concatenate([f_a, f_b]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        first_order = np.mean(f_b * (f_ab - f_a), axis=1) / variance
+        total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance
+    return first_order, total
+
+
+# פונקציה לחישוב מדדי סובול (רגישות גלובלית מבוססת שונות)
+@instrumented('global_sensitivity.sobol_indices')
+def sobol_indices(base_params, n_samples=8192, params=None, spread=DEFAULT_SPREAD, bounds=None,
+                  metrics=SOBOL_METRICS, seed=0, n_bootstrap=100, chunk_size=DEFAULT_CHUNK_SIZE, n_workers=None,
+                  progress=None):
+    """
+    מחשב מדדי סובול מסדר ראשון (S1) וכוללים (ST) לכל פרמטר, על פני כל מרחב
+    הפרמטרים בבת אחת (ולא פרמטר אחד או שניים סביב נקודת הבסיס).
+
+    הדגימה היא בסדרת סובול מוזזת (quasi-random), בשיטת סלטלי: N(P + 2) הערכות
+    של המודל עבור P פרמטרים. S1 הוא חלק השונות שנובע מהפרמטר לבדו, ו-ST כולל גם
+    את האינטראקציות שלו עם פרמטרים אחרים. ההערכות מחושבות במקטעים במנוע הווקטורי,
+    בתהליכים מקבילים, והתוצאה זהה לכל מספר תהליכים.
+
+    Args:
+        base_params (dict): פרמטרי הבסיס. פרמטר שאינו משתנה נשאר בערך הבסיס.
+        n_samples (int): N - מספר שורות הבסיס. חזקה של 2 מומלצת.
+        params, spread, bounds: הפרמטרים המשתנים והטווחים שלהם (ראו parameter_bounds).
+            ההתפלגות אחידה בכל טווח.
+        metrics (sequence): המדדים לניתוח.
+        seed (int): זרע להזזה הדיגיטלית ולאתחול ה-bootstrap.
+        n_bootstrap (int): מספר דגימות ה-bootstrap לרווחי הסמך (0 - ללא).
+        chunk_size (int): מספר שורות הבסיס לכל מקטע.
+        n_workers (int): מספר התהליכים. 1 מריץ בתהליך הנוכחי; None - מספר הליבות.
+        progress (callable): נקרא אחרי כל מקטע - progress(מקטעים שהסתיימו, סך המקטעים).
+
+    Returns:
+        dict: מדד -> DataFrame עם שורה לכל פרמטר (ממוינת לפי ST) ועמודות S1, ST
+            ורווח סמך של 95% לכל אחד (S1_conf, ST_conf).
+    """
+
+    ranges = parameter_bounds(base_params, params, spread, bounds)
+    if not ranges:
+        raise ValueError("No parameters to analyse")
+    keys = list(ranges)
+    columns = np.array([PARAM_INDEX[key] for key in keys])
+    lows = np.array([ranges[key][0] for key in keys])
+    highs = np.array([ranges[key][1] for key in keys])
+    base_row = params_to_matrix([base_params])[0]
+
+    rng = np.random.default_rng(seed)
+    directions = sobol_directions(2 * len(keys))
+    shift = rng.integers(0, 1 << SOBOL_BITS, size=2 * len(keys), dtype=np.uint64)
+
+    n_samples = int(n_samples)
+    bounds_list = [(start, min(start + chunk_size, n_samples)) for start in range(0, n_samples, chunk_size)]
+    jobs = [(base_row, columns, lows, highs, directions, shift, start, stop, metrics) for start, stop in bounds_list]
+    n_workers = n_workers or os.cpu_count() or 1
+    partials = []
+    executor = process_pool(n_workers) if n_workers > 1 and len(jobs) > 1 else None
+    try:
+        chunks = executor.map(_evaluate_chunk, *zip(*jobs)) if executor else (_evaluate_chunk(*job) for job in jobs)
+        for partial in chunks:
+            partials.append(partial)
+            if progress is not None:
+                progress(len(partials), len(jobs))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    import pandas as pd
+
+    indices = {}
+    for metric in metrics:
+        values = np.concatenate([partial[metric] for partial in partials], axis=1)
+        first_order, total = _estimate(values)
+        table = pd.DataFrame({'S1': first_order, 'S1_conf': np.nan, 'ST': total, 'ST_conf': np.nan}, index=keys)
+        if n_bootstrap:
+            samples = [_estimate(values, rng.integers(0, n_samples, n_samples)) for _ in range(n_bootstrap)]
+            table['S1_conf'] = 1.96 * np.std([sample[0] for sample in samples], axis=0)
+            table['ST_conf'] = 1.96 * np.std([sample[1] for sample in samples], axis=0)
+        table.index.name = 'פרמטר'
+        indices[metric] = table.sort_values('ST', ascending=False)
+    return indices
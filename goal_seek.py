@@ -0,0 +1,127 @@
+import numpy as np
+
+from batch_engine import PARAM_INDEX, PARAM_KEYS, calculate_results_arrays, params_to_matrix
+
+# מצבי סיום לכל תרחיש
+STATUS_CONVERGED = 'converged'
+STATUS_NO_BRACKET = 'no_bracket'
+STATUS_MAX_ITERATIONS = 'max_iterations'
+STATUS_DISCONTINUITY = 'discontinuity'  # הטווח התכווץ לנקודה שבה המדד קופץ מעל היעד (למשל אורך מימון)
+
+# מספר ההכפלות המקסימלי של הגבול העליון בחיפוש טווח אוטומטי
+MAX_BRACKET_EXPANSIONS = 40
+
+
+# פונקציה למציאת ערך פרמטר שמביא מדד ליעד (Goal Seek) עבור מערך תרחישים
+def goal_seek(base, param, target, output='רווח לפני מס', bounds=None, tol=1e-6, max_iterations=100):
+    """
+    פותר עבור param כך ש-output יגיע ל-target, בכל התרחישים במקביל.
+
+    השיטה היא Illinois (regula falsi מתוקנת) על טווח סגור - מתכנסת בצעד אחד או
+    שניים כשהמדד ליניארי בפרמטר, ונשארת בטוחה כשאינו. ללא bounds הטווח מתחיל
+    ב-[0, max(2|x|, 1)] והגבול העליון מוכפל עד שנמצא שינוי סימן.
+
+    Args:
+        base (dict | np.ndarray): מילון פרמטרים יחיד או מטריצת תרחישים (N, len(PARAM_KEYS)).
+        param (str): הפרמטר לפתרון.
+        target (float | np.ndarray): ערך היעד של המדד (סקלר או מערך באורך N).
+        output (str): מפתח המדד (מתוך RESULT_KEYS).
+        bounds (tuple): (גבול תחתון, גבול עליון) - סקלרים או מערכים באורך N.
+        tol (float): סבילות יחסית על המדד ועל רוחב הטווח.
+        max_iterations (int): מספר האיטרציות המקסימלי.
+
+    Returns:
+        dict: 'value' (NaN כשאין פתרון), 'residual', 'converged', 'status' ו-'iterations'
+            - מערכים באורך N.
+    """
+
+    matrix = params_to_matrix([base]) if isinstance(base, dict) else np.asarray(base, dtype=np.float64)
+    if param not in PARAM_INDEX:
+        raise ValueError(f"Unknown parameter: {param!r}")
+
+    columns = dict(zip(PARAM_KEYS, matrix.T))
+    n = matrix.shape[0]
+    target = np.broadcast_to(np.asarray(target, dtype=np.float64), (n,))
+
+    # המרחק מהיעד לכל התרחישים, או רק לשורות rows (מערך אינדקסים)
+    def residual(values, rows=None):
+        subset = columns if rows is None else {key: column[rows] for key, column in columns.items()}
+        subset[param] = values
+        size = n if rows is None else len(rows)
+        return np.broadcast_to(calculate_results_arrays(subset)[output], (size,)) - \
+            (target if rows is None else target[rows])
+
+    current = matrix[:, PARAM_INDEX[param]]
+    if bounds is None:
+        low = np.zeros(n)
+        high = np.maximum(2 * np.abs(current), 1.0)
+        f_low, f_high = residual(low), residual(high)
+        # מרחיבים רק שורות בלי שינוי סימן (ובלי פתרון מדויק באחד הקצוות), ומחשבים רק אותן
+        for _ in range(MAX_BRACKET_EXPANSIONS):
+            unbracketed = np.flatnonzero((np.sign(f_low) == np.sign(f_high)) & (f_low != 0) & (f_high != 0))
+            if not len(unbracketed):
+                break
+            high[unbracketed] *= 2
+            f_high[unbracketed] = residual(high[unbracketed], unbracketed)
+    else:
+        low = np.broadcast_to(np.asarray(bounds[0], dtype=np.float64), (n,)).copy()
+        high = np.broadcast_to(np.asarray(bounds[1], dtype=np.float64), (n,)).copy()
+        f_low, f_high = residual(low), residual(high)
+
+    # הסבילות על המדד יחסית לגודל היעד ולטווח הערכים של המדד בקצוות
+    scale = np.maximum.reduce([np.abs(target), np.abs(f_low), np.abs(f_high), np.ones(n)])
+    bracketed = (np.sign(f_low) != np.sign(f_high)) | (f_low == 0) | (f_high == 0)
+    value = np.where(np.abs(f_low) <= np.abs(f_high), low, high)
+    f_value = np.where(np.abs(f_low) <= np.abs(f_high), f_low, f_high)
+    done = ~bracketed | (np.abs(f_value) <= tol * scale)
+    last_side = np.zeros(n, dtype=np.int8)
+
+    iterations = np.zeros(n, dtype=np.int64)
+    for _ in range(max_iterations):
+        # רק התרחישים שעוד לא הסתיימו מחושבים - תרחיש שהתכנס (או שאין לו טווח) לא עולה דבר
+        rows = np.flatnonzero(~done)
+        if not len(rows):
+            break
+        iterations[rows] += 1
+        row_low, row_high, row_f_low, row_f_high = low[rows], high[rows], f_low[rows], f_high[rows]
+
+        # נקודת regula falsi, עם נפילה לחציה אם היא יוצאת מהטווח
+        with np.errstate(divide='ignore', invalid='ignore'):
+            candidate = row_high - row_f_high * (row_high - row_low) / (row_f_high - row_f_low)
+        outside = ~np.isfinite(candidate) | (candidate <= np.minimum(row_low, row_high)) | \
+            (candidate >= np.maximum(row_low, row_high))
+        candidate = np.where(outside, (row_low + row_high) / 2, candidate)
+
+        f_candidate = residual(candidate, rows)
+        value[rows] = candidate
+        f_value[rows] = f_candidate
+
+        # עדכון הטווח; בשיטת Illinois חוצים את ערך הקצה שנשאר פעמיים ברצף
+        replace_high = np.sign(f_candidate) == np.sign(row_f_high)
+        replace_low = ~replace_high
+        side = last_side[rows]
+        row_f_low = np.where(replace_high & (side == 1), row_f_low / 2, row_f_low)
+        row_f_high = np.where(replace_low & (side == -1), row_f_high / 2, row_f_high)
+        high[rows] = np.where(replace_high, candidate, row_high)
+        f_high[rows] = np.where(replace_high, f_candidate, row_f_high)
+        low[rows] = np.where(replace_low, candidate, row_low)
+        f_low[rows] = np.where(replace_low, f_candidate, row_f_low)
+        last_side[rows] = np.where(replace_high, 1, -1)
+
+        collapsed = np.abs(high[rows] - low[rows]) <= tol * np.maximum(np.abs(candidate), 1.0)
+        done[rows] = (np.abs(f_candidate) <= tol * scale[rows]) | collapsed
+
+    converged = bracketed & (np.abs(f_value) <= tol * scale)
+    collapsed = np.abs(high - low) <= tol * np.maximum(np.abs(value), 1.0)
+    status = np.select(
+        [~bracketed, converged, collapsed],
+        [STATUS_NO_BRACKET, STATUS_CONVERGED, STATUS_DISCONTINUITY],
+        default=STATUS_MAX_ITERATIONS
+    )
+    return {
+        'value': np.where(bracketed, value, np.nan),
+        'residual': f_value,
+        'converged': converged,
+        'status': status,
+        'iterations': iterations,
+    }
@@ -0,0 +1,66 @@
+import numpy as np
+
+from batch_engine import IRR_KEY, calculate_irr_arrays, calculate_results_arrays
+
+# מספר התאים המקסימלי שמחושב בבת אחת - שומר על זיכרון חסום גם ברשתות ענק
+DEFAULT_CHUNK_SIZE = 250_000
+
+
+# פונקציה ליצירת טווח ערכים של +/- אחוז סביב ערך בסיס
+def sensitivity_range(base_value, points=10, spread=0.2):
+    if base_value == 0:
+        return np.array([0])
+    return np.linspace(base_value * (1 - spread), base_value * (1 + spread), points)
+
+
+# פונקציה לסריקת רשת N-ממדית של פרמטרים
+def sweep_grid(base_params, axes, output='רווח לפני מס', chunk_size=DEFAULT_CHUNK_SIZE, out=None, progress=None):
+    """
+    מחשב תוצאה אחת של המודל על כל הצירופים של ערכי הצירים.
+
+    החישוב מתבצע במקטעים של chunk_size תאים, כך שרשת של 10^7 תאים רצה
+    בזיכרון חסום (מלבד מערך התוצאה עצמו, שאפשר להעביר גם כ-np.memmap).
+
+    Args:
+        base_params (dict): פרמטרי הבסיס לכל הפרמטרים שאינם צירים.
+        axes (dict | list): מיפוי פרמטר -> ערכים, או רשימת זוגות (פרמטר, ערכים).
+            אם אותו פרמטר מופיע פעמיים, הציר המאוחר גובר.
+        output (str): מפתח התוצאה (מתוך RESULT_KEYS, או IRR_KEY) לחישוב.
+        chunk_size (int): מספר התאים המקסימלי לכל מקטע.
+        out (np.ndarray): מערך יעד אופציונלי בצורת הרשת.
+        progress (callable): נקרא אחרי כל מקטע - progress(תאים שחושבו, סך התאים, partial=out).
+
+    Returns:
+        tuple: (מערך התוצאות בצורת הרשת, רשימת תוויות צירים [(פרמטר, ערכים)]).
+    """
+
+    axis_items = list(axes.items()) if isinstance(axes, dict) else list(axes)
+    axis_labels = [(param, np.asarray(values, dtype=np.float64).ravel()) for param, values in axis_items]
+    shape = tuple(len(values) for _, values in axis_labels)
+
+    if out is None:
+        out = np.empty(shape, dtype=np.float64)
+    elif out.shape != shape or not out.flags.c_contiguous:
+        raise ValueError(f"Output array must be C-contiguous with shape {shape}, got {out.shape}")
+
+    total_cells = out.size
+    if total_cells == 0:
+        return out, axis_labels
+
+    flat_out = out.reshape(-1)
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, total_cells, chunk_size):
+        stop = min(start + chunk_size, total_cells)
+        indices = np.unravel_index(np.arange(start, stop), shape)
+        columns = dict(base_params)
+        for (param, values), index in zip(axis_labels, indices):
+            columns[param] = values[index]
+        results = calculate_results_arrays(columns)
+        if output == IRR_KEY:
+            flat_out[start:stop] = calculate_irr_arrays(results, columns['אורך מימון (שנים)'])
+        else:
+            flat_out[start:stop] = results[output]
+        if progress is not None:
+            progress(stop, total_cells, partial=out)
+
+    return out, axis_labels
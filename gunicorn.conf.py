@@ -0,0 +1,30 @@
+"""
+הגדרות gunicorn לשרת ה-Dash (נטענות אוטומטית מהתיקייה הנוכחית):
+
+    gunicorn dash_app:server
+
+כל ההגדרות ניתנות לשינוי במשתני סביבה או בשורת הפקודה של gunicorn.
+"""
+
+import multiprocessing
+import os
+
+# כתובת השרת (PORT - כמו בפלטפורמות אירוח)
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+
+# תהליך לכל ליבה: החישובים וקטוריים ותופסים ליבה שלמה, כך שתהליכים נוספים רק מתחרים עליה.
+# threads בכל תהליך משרתים בקשות קלות (קריאות מהמטמון) בזמן שחישוב ארוך רץ
+workers = int(os.environ.get('GYMBOREE_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GYMBOREE_THREADS', 4))
+
+# ניתוחי רגישות על רשתות גדולות עלולים לקחת יותר מברירת המחדל (30 שניות)
+timeout = 120
+
+# המודל, NumPy ו-Dash נטענים פעם אחת בתהליך הראשי ומשותפים לתהליכים שנוצרים ממנו
+preload_app = True
+
+# מטמון משותף לכל התהליכים: GYMBOREE_CACHE_DIR (result_cache.CACHE_DIR_ENV) צריך להצביע על
+# תיקייה של משתמש השרת בלבד, למשל /var/cache/gymboree - היא נוצרת במצב 0700, ותיקייה של
+# משתמש אחר או שאחרים יכולים לגשת אליה נדחית. אין ברירת מחדל: בלי המשתנה כל תהליך
+# משתמש במטמון בזיכרון בלבד
@@ -0,0 +1,140 @@
+import contextlib
+import contextvars
+import functools
+import json
+import threading
+import time
+
+# המדידה הפעילה בהקשר הנוכחי. לכל סשן של Streamlit יש thread משלו, ולכן
+# הרצות מקבילות של משתמשים שונים לא מתערבבות.
+_active_profiler = contextvars.ContextVar('active_profiler', default=None)
+
+
+def _empty_stage():
+    return {'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'cache_hits': 0, 'cache_misses': 0}
+
+
+# אוסף זמני ריצה, מספר קריאות ופגיעות מטמון לכל שלב
+class Profiler:
+    """
+    זמני השלבים כוללים את השלבים המקוננים בתוכם (למשל calculate_results בתוך
+    ניתוח רגישות), ולכן אין לסכם אותם לזמן כולל.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def _stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = _empty_stage()
+        return self.stages[name]
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._stage(name)
+            stats['calls'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def record_cache(self, name, hit):
+        with self._lock:
+            self._stage(name)['cache_hits' if hit else 'cache_misses'] += 1
+
+    def merge(self, other):
+        with self._lock:
+            for name, other_stats in other.stages.items():
+                stats = self._stage(name)
+                for field in ('calls', 'total_seconds', 'cache_hits', 'cache_misses'):
+                    stats[field] += other_stats[field]
+                stats['max_seconds'] = max(stats['max_seconds'], other_stats['max_seconds'])
+
+    def to_dict(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self.stages.items()}
+
+    def to_rows(self):
+        """
+        Returns:
+            list: שורה לכל שלב, ממוינות לפי הזמן הכולל (הגדול ראשון).
+        """
+
+        rows = []
+        for name, stats in self.to_dict().items():
+            lookups = stats['cache_hits'] + stats['cache_misses']
+            rows.append({
+                'שלב': name,
+                'קריאות': stats['calls'],
+                'זמן כולל (ms)': stats['total_seconds'] * 1000,
+                'ממוצע לקריאה (ms)': stats['total_seconds'] * 1000 / stats['calls'] if stats['calls'] else 0.0,
+                'מקסימום (ms)': stats['max_seconds'] * 1000,
+                'פגיעות מטמון': stats['cache_hits'],
+                'שיעור פגיעה': stats['cache_hits'] / lookups if lookups else None,
+            })
+        rows.sort(key=lambda row: row['זמן כולל (ms)'], reverse=True)
+        return rows
+
+
+# הפעלת מדידה בהקשר הנוכחי
+@contextlib.contextmanager
+def profiling(profiler=None):
+    profiler = profiler if profiler is not None else Profiler()
+    token = _active_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active_profiler.reset(token)
+
+
+def active_profiler():
+    return _active_profiler.get()
+
+
+# מדידת שלב. כשאין מדידה פעילה - ללא תקורה מעבר לבדיקת ההקשר
+@contextlib.contextmanager
+def stage(name):
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record(name, time.perf_counter() - start)
+
+
+# דקורטור למדידת כל קריאה לפונקציה כשלב
+def instrumented(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active_profiler.get()
+            if profiler is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+# רישום פגיעה/החטאה במטמון עבור שלב
+def record_cache_lookup(name, hit):
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        profiler.record_cache(name, hit)
+
+
+# ייצוא מדידות ל-JSON
+def export_json(rerun, session, history=()):
+    return json.dumps({
+        'rerun': rerun.to_dict(),
+        'session': session.to_dict(),
+        'history': [{'started_at': profiler.started_at, 'stages': profiler.to_dict()} for profiler in history],
+    }, ensure_ascii=False, indent=2)
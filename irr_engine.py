@@ -0,0 +1,314 @@
+import math
+
+import numpy as np
+
+# מצבי סיום לכל שורה
+STATUS_CONVERGED = 'converged'
+STATUS_NO_ROOT = 'no_root'
+STATUS_MAX_ITERATIONS = 'max_iterations'
+
+# שיעורים לחיפוש טווח התחלתי לתזרים כללי. כמו npf.irr, כשיש כמה שורשים נבחר
+# הקרוב ביותר ל-0. זוג שורשים שקרובים זה לזה יותר מהמרווח בין הנקודות (תזרים
+# לא קונבנציונלי עם כמה החלפות סימן) אינו משנה סימן ועלול להתפספס.
+BRACKET_RATES = np.concatenate([
+    [-1 + 1e-9, -0.9999, -0.999, -0.99],
+    np.round(np.arange(-0.95, 1.0001, 0.05), 2),
+    [1.5, 2.0, 3.0, 5.0, 10.0, 100.0, 1000.0],
+])
+
+# גבול תחתון לשיעור בתזרים אנונה (השיעור חייב להיות גדול מ-100%-)
+ANNUITY_LOWER_RATE = -1 + 1e-9
+
+# NPV קטן מזה (יחסית לסכום התזרימים בערך מוחלט) נחשב שורש מדויק. התכנסות
+# רגילה נקבעת לפי גודל הצעד, כי בשיעורים גבוהים ה-NPV כמעט שטוח
+_ROOT_TOLERANCE = 1e-14
+
+# מתחת לערך זה מקדם האנונה מחושב לפי הקירוב r -> 0, למניעת ביטול נומרי
+_SMALL_RATE = 1e-8
+
+
+# ערך נוכחי נקי של מערך תזרימים (התזרים הראשון בזמן 0, כמו npf.npv)
+def npv(rate, cash_flows):
+    """
+    Args:
+        rate (float | np.ndarray): שיעור היוון לכל שורה.
+        cash_flows (np.ndarray): מטריצה בגודל (N, T) או וקטור באורך T.
+
+    Returns:
+        np.ndarray: NPV לכל שורה.
+    """
+
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+    rate = np.broadcast_to(np.asarray(rate, dtype=np.float64), (cash_flows.shape[0],))
+    periods = np.arange(cash_flows.shape[1])
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        return (cash_flows * (1 + rate)[:, None] ** (-periods)).sum(axis=1)
+
+
+def _npv_and_derivative(rate, cash_flows, periods):
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        discount = (1 + rate)[:, None] ** (-periods)
+        value = (cash_flows * discount).sum(axis=1)
+        derivative = -(cash_flows * periods * discount).sum(axis=1) / (1 + rate)
+    return value, derivative
+
+
+# ניוטון וקטורי בתוך טווח סגור: צעד ניוטון כשהוא נשאר בטווח וקטן לפחות פי 2
+# מהצעד שלפניו, אחרת חציה (כמו rtsafe). בלי התנאי השני ניוטון זוחל ליד 100%-,
+# שם ה-NPV תלול מאוד. בכל איטרציה מחושבות רק השורות שעדיין לא התכנסו.
+def _bracketed_newton(function, low, high, f_low, f_high, scale, tol, max_iterations, guess=None):
+    """
+    Args:
+        function (callable): function(rate, rows) -> (NPV, נגזרת) עבור השורות rows.
+    """
+
+    n = low.shape[0]
+    lower, upper = np.minimum(low, high), np.maximum(low, high)
+    if guess is None:
+        rate = np.where(np.abs(f_low) <= np.abs(f_high), low, high)
+    else:
+        rate = np.where((guess > lower) & (guess < upper), guess, (low + high) / 2)
+    previous_step = upper - lower
+
+    result = rate.copy()
+    converged = np.zeros(n, dtype=bool)
+    iterations = np.zeros(n, dtype=np.int64)
+    rows = np.arange(n)
+
+    for iteration in range(1, max_iterations + 1):
+        if rows.size == 0:
+            break
+        iterations[rows] = iteration
+
+        value, derivative = function(rate, rows)
+        on_root = np.abs(value) <= _ROOT_TOLERANCE * scale
+
+        # עדכון הטווח לפי סימן ה-NPV בנקודה הנוכחית
+        same_as_low = np.sign(value) == np.sign(f_low)
+        low = np.where(same_as_low, rate, low)
+        f_low = np.where(same_as_low, value, f_low)
+        high = np.where(same_as_low, high, rate)
+        f_high = np.where(same_as_low, f_high, value)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            candidate = rate - value / derivative
+        lower, upper = np.minimum(low, high), np.maximum(low, high)
+        slow = 2 * np.abs(candidate - rate) > previous_step
+        outside = ~np.isfinite(candidate) | (candidate <= lower) | (candidate >= upper)
+        candidate = np.where(outside | slow, (low + high) / 2, candidate)
+        previous_step = np.abs(candidate - rate)
+
+        step_small = previous_step <= tol * (1 + np.abs(rate))
+        collapsed = (upper - lower) <= tol * (1 + np.abs(rate))
+        rate = np.where(on_root, rate, candidate)
+        done = on_root | step_small | collapsed
+        result[rows] = rate
+        converged[rows] = done
+
+        keep = ~done
+        rows = rows[keep]
+        rate, low, high, f_low, f_high, scale, previous_step = (
+            rate[keep], low[keep], high[keep], f_low[keep], f_high[keep], scale[keep], previous_step[keep])
+
+    status = np.where(converged, STATUS_CONVERGED, STATUS_MAX_ITERATIONS)
+    return result, converged, status, iterations
+
+
+# פיזור תוצאות הפתרון (שחושבו רק לשורות שיש להן טווח עם שורש) לכל השורות
+def _solution(found, rate, converged, status, iterations):
+    n = found.shape[0]
+    solution = {
+        'rate': np.full(n, np.nan),
+        'converged': np.zeros(n, dtype=bool),
+        'status': np.full(n, STATUS_MAX_ITERATIONS),
+        'iterations': np.zeros(n, dtype=np.int64),
+    }
+    solution['status'][~found] = STATUS_NO_ROOT
+    solution['rate'][found] = np.where(converged, rate, np.nan)
+    solution['converged'][found] = converged
+    solution['status'][found] = status
+    solution['iterations'][found] = iterations
+    return solution
+
+
+# IRR למערך של וקטורי תזרים
+def irr(cash_flows, tol=1e-10, max_iterations=100):
+    """
+    פותר IRR לכל שורה במטריצת תזרימים בבת אחת.
+
+    בכל צד של 0 נבחר מתוך BRACKET_RATES הטווח עם שינוי סימן הקרוב ביותר ל-0,
+    ובתוכו ניוטון עם נפילה לחציה. כמו npf.irr, מבין השורשים נבחר זה עם הערך
+    המוחלט הקטן ביותר, ובשוויון - החיובי. שורות באורכים שונים ניתן לרפד באפסים בסוף.
+
+    Args:
+        cash_flows (np.ndarray): מטריצה בגודל (N, T) או וקטור באורך T; התזרים הראשון בזמן 0.
+        tol (float): סבילות יחסית על השיעור.
+        max_iterations (int): מספר האיטרציות המקסימלי.
+
+    Returns:
+        dict: 'rate' (שיעור עשרוני, NaN כשאין פתרון), 'converged', 'status' ו-'iterations'
+            - מערכים באורך N.
+    """
+
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=np.float64))
+    n = cash_flows.shape[0]
+    periods = np.arange(cash_flows.shape[1])
+    scale = np.maximum(np.abs(cash_flows).sum(axis=1), 1.0)
+
+    # NPV בכל נקודות הטווח ובחירת הטווח עם שינוי הסימן הקרוב ל-0
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        values = (cash_flows[:, None, :] * (1 + BRACKET_RATES)[None, :, None] ** (-periods)).sum(axis=2)
+    sign_change = (np.sign(values[:, :-1]) * np.sign(values[:, 1:]) <= 0) & np.isfinite(values[:, :-1]) & \
+        np.isfinite(values[:, 1:])
+    lower_rates, upper_rates = BRACKET_RATES[:-1], BRACKET_RATES[1:]
+    distance = np.where((lower_rates <= 0) & (upper_rates >= 0), 0.0,
+                        np.minimum(np.abs(lower_rates), np.abs(upper_rates)))
+    distance = np.where(sign_change, distance, np.inf)
+
+    # הטווח הקרוב ל-0 מכל צד (0 היא נקודה ב-BRACKET_RATES, כך ששום טווח אינו בשני הצדדים).
+    # המרחק של הטווח מ-0 אינו קובע איזה שורש קרוב יותר, ולכן שני הטווחים נפתרים
+    rows, index = [], []
+    for side in (lower_rates < 0, upper_rates > 0):
+        side_distance = np.where(side, distance, np.inf)
+        side_index = np.argmin(side_distance, axis=1)
+        side_rows = np.flatnonzero(np.isfinite(side_distance[np.arange(n), side_index]))
+        rows.append(side_rows)
+        index.append(side_index[side_rows])
+    negative_rows, positive_rows = rows
+    rows, index = np.concatenate(rows), np.concatenate(index)
+    candidates = cash_flows[rows]
+
+    def function(rate, subset):
+        return _npv_and_derivative(rate, candidates[subset], periods)
+
+    rate, converged, status, iterations = _bracketed_newton(
+        function, lower_rates[index], upper_rates[index], values[rows, index], values[rows, index + 1],
+        scale[rows], tol, max_iterations)
+
+    # בחירת השורש לכל שורה: שורש שהתכנס עם |rate| קטן, ובשוויון (עד לסבילות) השורש החיובי
+    magnitude = np.where(converged, np.abs(rate), np.inf)
+    chosen = np.full(n, -1)
+    chosen[negative_rows] = np.arange(len(negative_rows))
+    positive = len(negative_rows) + np.arange(len(positive_rows))
+    rival = magnitude[chosen[positive_rows]]
+    better = (chosen[positive_rows] < 0) | (magnitude[positive] <= rival + tol * (1 + rival))
+    chosen[positive_rows[better]] = positive[better]
+
+    found = chosen >= 0
+    chosen = chosen[found]
+    return _solution(found, rate[chosen], converged[chosen], status[chosen], iterations[chosen])
+
+
+# מקדם אנונה (1 - (1+r)^-n) / r ונגזרתו לפי r
+def _annuity_factor(rate, years):
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        discount = (1 + rate) ** (-years)
+        small = np.abs(rate) < _SMALL_RATE
+        safe_rate = np.where(small, 1.0, rate)
+        factor = np.where(small, years, (1 - discount) / safe_rate)
+        derivative = np.where(small, -years * (years + 1) / 2,
+                              (years * discount / (1 + safe_rate) * safe_rate - (1 - discount)) / safe_rate ** 2)
+    return factor, derivative
+
+
+# IRR של תזרים אנונה: השקעה בזמן 0 ורווח קבוע בכל אחת מ-years השנים
+def annuity_irr(setup_costs, profit_before_tax, years, tol=1e-10, max_iterations=100):
+    """
+    פותר את ה-IRR של [-setup_costs] + [profit_before_tax] * years, וקטורית.
+
+    ה-NPV מחושב בנוסחה סגורה ולכן עלות השורה אינה תלויה במספר השנים. לתזרים
+    כזה יש שורש יחיד מעל 100%- בדיוק כאשר ההשקעה והרווח חיוביים.
+
+    Args:
+        setup_costs, profit_before_tax, years: סקלרים או מערכים שניתנים ל-broadcast.
+
+    Returns:
+        dict: 'rate' (שיעור עשרוני), 'converged', 'status' ו-'iterations'. עבור
+            קלט סקלרי - ערכים סקלריים.
+    """
+
+    if np.ndim(setup_costs) == 0 and np.ndim(profit_before_tax) == 0 and np.ndim(years) == 0:
+        return _annuity_irr_scalar(float(setup_costs), float(profit_before_tax), math.trunc(years), tol,
+                                   max_iterations)
+
+    setup_costs, profit_before_tax, years = np.broadcast_arrays(
+        np.asarray(setup_costs, dtype=np.float64),
+        np.asarray(profit_before_tax, dtype=np.float64),
+        np.trunc(np.asarray(years, dtype=np.float64)))
+    shape = setup_costs.shape
+    found = ((setup_costs > 0) & (profit_before_tax > 0) & (years >= 1)).ravel()
+    setup_costs, profit_before_tax, years = setup_costs.ravel()[found], profit_before_tax.ravel()[found], \
+        years.ravel()[found]
+
+    def function(rate, subset=slice(None)):
+        factor, derivative = _annuity_factor(rate, years[subset])
+        return profit_before_tax[subset] * factor - setup_costs[subset], profit_before_tax[subset] * derivative
+
+    # ה-NPV יורד בשיעור; מגדילים את הגבול העליון עד שה-NPV שלילי
+    low = np.full(setup_costs.shape, ANNUITY_LOWER_RATE)
+    high = np.ones(setup_costs.shape)
+    f_low, _ = function(low)
+    f_high, _ = function(high)
+    for _ in range(64):
+        expand = f_high > 0
+        if not expand.any():
+            break
+        high = np.where(expand, high * 4, high)
+        f_high, _ = function(high)
+
+    # נקודת התחלה: שיעור התשואה של אנונה אינסופית (רווח / השקעה)
+    guess = profit_before_tax / setup_costs
+    scale = np.maximum(setup_costs + profit_before_tax * years, 1.0)
+    rate, converged, status, iterations = _bracketed_newton(
+        function, low, high, f_low, f_high, scale, tol, max_iterations, guess)
+    solution = _solution(found, rate, converged, status, iterations)
+    return {key: value.reshape(shape) for key, value in solution.items()}
+
+
+# אותו אלגוריתם לקלט סקלרי, בפייתון טהור - חוסך את תקורת NumPy בקריאה בודדת
+def _annuity_irr_scalar(setup_costs, profit_before_tax, years, tol, max_iterations):
+    def function(rate):
+        if abs(rate) < _SMALL_RATE:
+            return profit_before_tax * years - setup_costs, -profit_before_tax * years * (years + 1) / 2
+        discount = (1 + rate) ** (-years)
+        factor = (1 - discount) / rate
+        derivative = (years * discount / (1 + rate) * rate - (1 - discount)) / rate ** 2
+        return profit_before_tax * factor - setup_costs, profit_before_tax * derivative
+
+    def no_root():
+        return {'rate': math.nan, 'converged': False, 'status': STATUS_NO_ROOT, 'iterations': 0}
+
+    if not (setup_costs > 0 and profit_before_tax > 0 and years >= 1):
+        return no_root()
+
+    low, high = ANNUITY_LOWER_RATE, 1.0
+    f_low, f_high = function(low)[0], function(high)[0]
+    for _ in range(64):
+        if f_high <= 0:
+            break
+        high *= 4
+        f_high = function(high)[0]
+    if f_low < 0 or f_high > 0:
+        return no_root()
+
+    scale = max(abs(setup_costs) + abs(profit_before_tax) * years, 1.0)
+    rate = profit_before_tax / setup_costs
+    if not low < rate < high:
+        rate = (low + high) / 2
+    previous_step = high - low
+    for iteration in range(1, max_iterations + 1):
+        value, derivative = function(rate)
+        if abs(value) <= _ROOT_TOLERANCE * scale:
+            return {'rate': rate, 'converged': True, 'status': STATUS_CONVERGED, 'iterations': iteration}
+        if (value > 0) == (f_low > 0):
+            low, f_low = rate, value
+        else:
+            high, f_high = rate, value
+        candidate = rate - value / derivative if derivative != 0 else math.nan
+        if 2 * abs(candidate - rate) > previous_step or not (min(low, high) < candidate < max(low, high)):
+            candidate = (low + high) / 2
+        previous_step = abs(candidate - rate)
+        if abs(candidate - rate) <= tol * (1 + abs(rate)) or abs(high - low) <= tol * (1 + abs(rate)):
+            return {'rate': candidate, 'converged': True, 'status': STATUS_CONVERGED, 'iterations': iteration}
+        rate = candidate
+    return {'rate': math.nan, 'converged': False, 'status': STATUS_MAX_ITERATIONS, 'iterations': max_iterations}
@@ -0,0 +1,208 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# מצבי עבודה
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+FINAL_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+# מספר העבודות שרצות בו-זמנית בתהליך (משתנה סביבה), ומספר העבודות שהסתיימו שנשמרות
+MAX_JOBS_ENV = 'GYMBOREE_MAX_JOBS'
+DEFAULT_MAX_JOBS = 2
+FINISHED_JOBS_KEPT = 64
+
+# העבודה האחרונה של כל key (סשן + סוג ניתוח) נשמרת אחרי שהסתיימה, כדי שהממשק יציג את
+# התוצאה - עד FINISHED_JOB_TTL שניות, ולכל היותר FINISHED_KEYS_KEPT עבודות כאלה
+FINISHED_JOB_TTL = 3600
+FINISHED_KEYS_KEPT = 256
+
+
+# מאגר תהליכים לחישוב מקבילי. התהליכים נוצרים ב-spawn ולא ב-fork: fork מתוך תהליך עם
+# threads (שרת Streamlit, threads של עבודות) מעתיק נעילות שאולי תפוסות ועלול להיתקע
+def process_pool(max_workers):
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+# נזרקת מתוך דיווח ההתקדמות כשהעבודה בוטלה - הפונקציה מפסיקה בנקודת הדיווח הבאה
+class JobCancelled(Exception):
+    pass
+
+
+# עבודה אחת ברקע: מצב, התקדמות, תוצאה חלקית ותוצאה סופית
+class Job:
+    """
+    הפונקציה שרצה בעבודה מקבלת את report כפרמטר progress, וקוראת לו אחרי כל
+    מקטע: report(done, total, partial=None). הקריאה מעדכנת את ההתקדמות ואת
+    התוצאה החלקית, וזורקת JobCancelled אם העבודה בוטלה - כך הביטול מתבצע
+    בין מקטעים ולא באמצע חישוב.
+    """
+
+    def __init__(self, job_id, name, key=None):
+        self.id = job_id
+        self.name = name
+        self.key = key
+        self.status = STATUS_PENDING
+        self.done_units = 0
+        self.total_units = None
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_requested = threading.Event()
+        self._finished = threading.Event()
+
+    # שיעור ההתקדמות (0-1), או None כשמספר המקטעים הכולל אינו ידוע
+    @property
+    def progress(self):
+        if self.status == STATUS_DONE:
+            return 1.0
+        if not self.total_units:
+            return None
+        return min(self.done_units / self.total_units, 1.0)
+
+    @property
+    def finished(self):
+        return self.status in FINAL_STATUSES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_requested.is_set()
+
+    def report(self, done, total=None, partial=None):
+        self.done_units, self.total_units = done, total
+        if partial is not None:
+            self.partial = partial
+        if self._cancel_requested.is_set():
+            raise JobCancelled(self.id)
+
+    def cancel(self):
+        self._cancel_requested.set()
+
+    # המתנה לסיום. מחזירה את התוצאה, או זורקת את השגיאה / JobCancelled
+    def wait(self, timeout=None):
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"Job {self.id} is still {self.status}")
+        if self.status == STATUS_FAILED:
+            raise self.error
+        if self.status == STATUS_CANCELLED:
+            raise JobCancelled(self.id)
+        return self.result
+
+    def _run(self, func, args, kwargs):
+        if self._cancel_requested.is_set():
+            self._finish(STATUS_CANCELLED)
+            return
+        self.status = STATUS_RUNNING
+        self.started_at = time.time()
+        try:
+            self.result = func(*args, progress=self.report, **kwargs)
+        except JobCancelled:
+            self._finish(STATUS_CANCELLED)
+        except Exception as e:
+            self.error = e
+            self._finish(STATUS_FAILED)
+        else:
+            self._finish(STATUS_DONE)
+
+    def _finish(self, status):
+        self.status = status
+        self.finished_at = time.time()
+        self._finished.set()
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.name!r}, {self.status})"
+
+
+# מאגר עבודות ברקע, משותף לכל הסשנים בתהליך
+class JobManager:
+    """
+    העבודות רצות על מאגר threads, כך שהתוצאה החלקית וההתקדמות זמינות ישירות
+    לממשק. החישובים עצמם וקטוריים (NumPy משחרר את ה-GIL) או מפוצלים לתהליכים
+    בתוך הפונקציה (למשל n_workers של run_monte_carlo). worker_processes הוא
+    מספר התהליכים לכל עבודה, כך שכל העבודות יחד לא עוברות את מספר הליבות.
+
+    לכל עבודה אפשר לתת key (למשל סשן + סוג הניתוח): עבודה חדשה עם אותו key
+    מבטלת את הקודמת, כך ששינוי קלטים לא מצבר ריצות מלאות בתור.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or int(os.environ.get(MAX_JOBS_ENV, DEFAULT_MAX_JOBS))
+        self.worker_processes = max(1, (os.cpu_count() or 1) // self.max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._by_key = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    # הגשת עבודה. func חייבת לקבל פרמטר progress (ראו Job)
+    def submit(self, func, *args, name=None, key=None, **kwargs):
+        with self._lock:
+            job = Job(next(self._ids), name or getattr(func, '__name__', 'job'), key)
+            if key is not None:
+                previous = self._by_key.get(key)
+                if previous is not None and not previous.finished:
+                    previous.cancel()
+                self._by_key[key] = job
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(job._run, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # העבודה האחרונה שהוגשה עם key
+    def latest(self, key):
+        with self._lock:
+            return self._by_key.get(key)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self):
+        jobs = self.jobs()
+        return {status: sum(job.status == status for job in jobs)
+                for status in (STATUS_PENDING, STATUS_RUNNING) + FINAL_STATUSES}
+
+    # שמירת FINISHED_JOBS_KEPT העבודות האחרונות שהסתיימו. העבודה האחרונה לכל key נשמרת עד
+    # FINISHED_JOB_TTL, ומעבר ל-FINISHED_KEYS_KEPT נמחקות הישנות ביותר (למשל של סשנים שנסגרו)
+    def _prune(self):
+        now = time.time()
+        latest = sorted((job for job in self._by_key.values() if job.finished), key=lambda job: job.finished_at)
+        excess = len(latest) - FINISHED_KEYS_KEPT
+        for index, job in enumerate(latest):
+            if index < excess or now - job.finished_at > FINISHED_JOB_TTL:
+                del self._by_key[job.key]
+                self._jobs.pop(job.id, None)
+
+        finished = [job for job in self._jobs.values()
+                    if job.finished and self._by_key.get(job.key) is not job]
+        for job in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job.id]
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job in self.jobs():
+                job.cancel()
+        self._executor.shutdown(wait=True)
+
+
+# המאגר המשותף של התהליך
+job_manager = JobManager()
@@ -0,0 +1,372 @@
+from collections import namedtuple
+from operator import itemgetter
+
+
+from amortization import DEFAULT_ANNUAL_RATE, total_loan_payments
+from instrumentation import instrumented
+from irr_engine import annuity_irr
+
+# פרמטרים ראשוניים
+default_params = {
+    # עלויות הקמה
+    'עלות בנייה': 900_000,
+    'עלות מערכות חשמל ותאורה': 300_000,
+    'עלות מערכות מיזוג ואוורור': 250_000,
+    'עלות מתקני משחק': 900_000,
+    'עלות ציוד VR/AR': 300_000,
+    'עלות ריהוט ואביזרים': 150_000,
+    'עלות מערכות ניהול ובקרה': 150_000,
+    'עלות מערכות קופות ותשלומים': 100_000,
+    'עלות אתר אינטרנט': 50_000,
+    'עלות אישורי בטיחות וכיבוי אש': 100_000,
+    'עלות רישיונות עסק': 50_000,
+    'עלות ייעוץ עסקי ופיננסי': 50_000,
+    'הוצאות משפטיות': 50_000,
+    'הון חוזר לתפעול ראשוני': 500_000,
+
+    # פרמטרים תפעוליים
+    'מחיר כניסה ליום רגיל': 50,
+    'מספר מבקרים ביום רגיל': 300,
+    'מחיר כניסה ליום חופשה/חג': 50,
+    'מספר מבקרים ביום חופשה/חג': 1_200,
+    'רכישה ממוצעת במזון ביום רגיל': 20,
+    'רכישה ממוצעת במזון ביום חופשה/חג': 25,
+    'רכישה ממוצעת במרצ\'נדייז ביום רגיל': 15,
+    'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג': 20,
+    'מספר אירועים פרטיים בחודש': 20,
+    'מחיר לאירוע פרטי': 2_000,
+    'מספר סדנאות בחודש': 5,
+    'מספר משתתפים בסדנה': 15,
+    'מחיר לסדנה': 100,
+
+    # הוצאות קבועות
+    'שכר דירה חודשי': 150_000,
+    'משכורת מנכ"ל': 20_000,
+    'משכורת מנהלים (סה"כ)': 60_000,
+    'משכורת צוות (סה"כ)': 140_000,
+    'ארנונה שנתית': 360_000,
+    'הוצאות חשמל חודשיות': 25_000,
+    'הוצאות מים חודשיות': 5_000,
+    'הוצאות נוספות שנתיות': 236_000,
+    'תשלומי הלוואה שנתיים': 975_000,
+
+    # פרמטרים נוספים
+    'שיעור פחת שנתי (%)': 2,
+    'אורך מימון (שנים)': 5,
+    'ריבית שנתית על הלוואה (%)': DEFAULT_ANNUAL_RATE
+}
+
+# שמות שדות באנגלית לכל פרמטר, בסדר של default_params
+PARAM_FIELDS = (
+    ('construction_cost', 'עלות בנייה'),
+    ('electrical_cost', 'עלות מערכות חשמל ותאורה'),
+    ('hvac_cost', 'עלות מערכות מיזוג ואוורור'),
+    ('play_equipment_cost', 'עלות מתקני משחק'),
+    ('vr_ar_cost', 'עלות ציוד VR/AR'),
+    ('furniture_cost', 'עלות ריהוט ואביזרים'),
+    ('management_systems_cost', 'עלות מערכות ניהול ובקרה'),
+    ('pos_systems_cost', 'עלות מערכות קופות ותשלומים'),
+    ('website_cost', 'עלות אתר אינטרנט'),
+    ('safety_permits_cost', 'עלות אישורי בטיחות וכיבוי אש'),
+    ('business_licenses_cost', 'עלות רישיונות עסק'),
+    ('consulting_cost', 'עלות ייעוץ עסקי ופיננסי'),
+    ('legal_costs', 'הוצאות משפטיות'),
+    ('working_capital', 'הון חוזר לתפעול ראשוני'),
+    ('ticket_price_regular', 'מחיר כניסה ליום רגיל'),
+    ('visitors_regular', 'מספר מבקרים ביום רגיל'),
+    ('ticket_price_holiday', 'מחיר כניסה ליום חופשה/חג'),
+    ('visitors_holiday', 'מספר מבקרים ביום חופשה/חג'),
+    ('food_spend_regular', 'רכישה ממוצעת במזון ביום רגיל'),
+    ('food_spend_holiday', 'רכישה ממוצעת במזון ביום חופשה/חג'),
+    ('merch_spend_regular', 'רכישה ממוצעת במרצ\'נדייז ביום רגיל'),
+    ('merch_spend_holiday', 'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג'),
+    ('events_per_month', 'מספר אירועים פרטיים בחודש'),
+    ('event_price', 'מחיר לאירוע פרטי'),
+    ('workshops_per_month', 'מספר סדנאות בחודש'),
+    ('workshop_participants', 'מספר משתתפים בסדנה'),
+    ('workshop_price', 'מחיר לסדנה'),
+    ('monthly_rent', 'שכר דירה חודשי'),
+    ('ceo_salary', 'משכורת מנכ"ל'),
+    ('managers_salaries', 'משכורת מנהלים (סה"כ)'),
+    ('staff_salaries', 'משכורת צוות (סה"כ)'),
+    ('annual_property_tax', 'ארנונה שנתית'),
+    ('monthly_electricity', 'הוצאות חשמל חודשיות'),
+    ('monthly_water', 'הוצאות מים חודשיות'),
+    ('other_annual_expenses', 'הוצאות נוספות שנתיות'),
+    ('loan_amount', 'תשלומי הלוואה שנתיים'),
+    ('depreciation_rate', 'שיעור פחת שנתי (%)'),
+    ('loan_duration_years', 'אורך מימון (שנים)'),
+    ('loan_interest_rate', 'ריבית שנתית על הלוואה (%)'),
+)
+PARAM_KEYS = tuple(key for _, key in PARAM_FIELDS)
+FIELD_INDEX = {key: index for index, (_, key) in enumerate(PARAM_FIELDS)}
+assert PARAM_KEYS == tuple(default_params), "PARAM_FIELDS must follow the order of default_params"
+
+# קבוצות הפרמטרים בטופס הקלט, לפי סדר ההצגה (משותף לממשקי Streamlit ו-Dash)
+PARAM_GROUPS = {
+    'עלויות הקמה': (
+        'עלות בנייה', 'עלות מערכות חשמל ותאורה', 'עלות מערכות מיזוג ואוורור', 'עלות מתקני משחק', 'עלות ציוד VR/AR',
+        'עלות ריהוט ואביזרים', 'עלות מערכות ניהול ובקרה', 'עלות מערכות קופות ותשלומים', 'עלות אתר אינטרנט',
+        'עלות אישורי בטיחות וכיבוי אש', 'עלות רישיונות עסק', 'עלות ייעוץ עסקי ופיננסי', 'הוצאות משפטיות',
+        'הון חוזר לתפעול ראשוני', 'שיעור פחת שנתי (%)',
+    ),
+    'פרמטרים תפעוליים': (
+        'מחיר כניסה ליום רגיל', 'מספר מבקרים ביום רגיל', 'מחיר כניסה ליום חופשה/חג', 'מספר מבקרים ביום חופשה/חג',
+        'רכישה ממוצעת במזון ביום רגיל', 'רכישה ממוצעת במזון ביום חופשה/חג', 'רכישה ממוצעת במרצ\'נדייז ביום רגיל',
+        'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג', 'מספר אירועים פרטיים בחודש', 'מחיר לאירוע פרטי',
+        'מספר סדנאות בחודש', 'מספר משתתפים בסדנה', 'מחיר לסדנה',
+    ),
+    'הוצאות קבועות': (
+        'שכר דירה חודשי', 'משכורת מנכ"ל', 'משכורת מנהלים (סה"כ)', 'משכורת צוות (סה"כ)',
+        'ארנונה שנתית', 'הוצאות חשמל חודשיות', 'הוצאות מים חודשיות', 'הוצאות נוספות שנתיות', 'תשלומי הלוואה שנתיים',
+        'אורך מימון (שנים)', 'ריבית שנתית על הלוואה (%)',
+    ),
+}
+
+_get_param_values = itemgetter(*PARAM_KEYS)
+
+
+# רשומת פרמטרים קומפקטית: tuple עם שדות קבועים, לשימוש בלולאות חמות במקום מילון
+class ParamRecord(namedtuple('ParamRecord', [field for field, _ in PARAM_FIELDS])):
+    __slots__ = ()
+
+    # מפתח חסר (למשל בתוכנית שנשמרה לפני שנוספה הריבית על ההלוואה) מקבל את ערך ברירת המחדל
+    @classmethod
+    def from_dict(cls, params):
+        try:
+            values = _get_param_values(params)
+        except KeyError:
+            values = _get_param_values({**default_params, **params})
+        return tuple.__new__(cls, values)
+
+    def to_dict(self):
+        return dict(zip(PARAM_KEYS, self))
+
+    # עותק עם שינוי של שדה אחד או שניים - הרשומה המקורית אינה משתנה
+    def with_overrides(self, overrides):
+        values = list(self)
+        for key, value in overrides.items():
+            values[FIELD_INDEX[key]] = value
+        return tuple.__new__(ParamRecord, values)
+
+    # גישה לפי המפתח העברי, לתאימות עם קוד שעובד עם מילונים
+    def get(self, key):
+        return self[FIELD_INDEX[key]]
+
+
+# המרת מילון פרמטרים לרשומה (רשומה קיימת מוחזרת כמו שהיא)
+def as_record(params):
+    return params if isinstance(params, ParamRecord) else ParamRecord.from_dict(params)
+
+# פונקציה לחישוב עלויות הקמה
+def calculate_setup_costs(params):
+    params = as_record(params)
+    return sum([
+        params.construction_cost, params.electrical_cost, params.hvac_cost,
+        params.play_equipment_cost, params.vr_ar_cost, params.furniture_cost,
+        params.management_systems_cost, params.pos_systems_cost, params.website_cost,
+        params.safety_permits_cost, params.business_licenses_cost, params.consulting_cost,
+        params.legal_costs
+    ])
+
+# פונקציה לחישוב שורות ההכנסה, בסדר שבו הן מסוכמות
+def calculate_income_lines(params):
+    params = as_record(params)
+    income_regular_tickets = params.visitors_regular * params.ticket_price_regular * 191
+    income_regular_food = params.visitors_regular * params.food_spend_regular * 191
+    income_regular_merch = params.visitors_regular * params.merch_spend_regular * 191
+
+    income_holiday_tickets = params.visitors_holiday * params.ticket_price_holiday * 100
+    income_holiday_food = params.visitors_holiday * params.food_spend_holiday * 100
+    income_holiday_merch = params.visitors_holiday * params.merch_spend_holiday * 100
+
+    income_events = params.events_per_month * params.event_price * 12
+    income_workshops = params.workshops_per_month * params.workshop_participants * params.workshop_price * 12
+
+    return (
+        income_regular_tickets, income_regular_food, income_regular_merch,
+        income_holiday_tickets, income_holiday_food, income_holiday_merch,
+        income_events, income_workshops
+    )
+
+# פונקציה לחישוב הכנסות
+def calculate_income(params):
+    return sum(calculate_income_lines(params))
+
+# פונקציה לחישוב הוצאות משתנות
+def calculate_variable_expenses(params, income_regular_merch, income_holiday_merch, income_regular_food, income_holiday_food, income_events, income_workshops):
+    cost_of_merch = (income_regular_merch + income_holiday_merch) * 0.5
+    cost_of_food = (income_regular_food + income_holiday_food) * 0.4
+    cost_of_workshops = income_workshops * 0.5
+    cost_of_events = income_events * 0.4
+
+    return cost_of_merch + cost_of_food + cost_of_workshops + cost_of_events
+
+# פונקציה לחישוב הוצאות קבועות
+def calculate_fixed_expenses(params, annual_depreciation):
+    params = as_record(params)
+    return (
+        (params.monthly_rent + params.ceo_salary + params.managers_salaries +
+         params.staff_salaries + params.monthly_electricity + params.monthly_water) * 12 +
+        params.annual_property_tax + params.other_annual_expenses + annual_depreciation + params.working_capital
+    )
+
+# פונקציה לחישוב תשלומי הלוואה
+def calculate_loan_payments(params):
+    params = as_record(params)
+    loan_duration_months = int(params.loan_duration_years) * 12
+    return total_loan_payments(params.loan_amount, params.loan_interest_rate / 100, loan_duration_months)
+
+# פונקציה לחישוב רווח לפני מס
+def calculate_profit_before_tax(gross_profit, total_fixed_expenses, total_loan_payments):
+    return gross_profit - total_fixed_expenses - total_loan_payments
+
+# פונקציה לחישוב מחיר כניסה ממוצע
+def calculate_average_ticket_price(total_income, params):
+    params = as_record(params)
+    total_visitors_regular = params.visitors_regular * 191
+    total_visitors_holiday = params.visitors_holiday * 100
+    total_visitors = total_visitors_regular + total_visitors_holiday
+
+    return total_income / total_visitors if total_visitors != 0 else 0
+
+# פונקציה לחישוב נקודת איזון כוללת (מספר כרטיסים לשנה)
+def calculate_breakeven_total_tickets(total_variable_expenses, total_fixed_expenses, total_loan_payments, average_ticket_price):
+    return (total_variable_expenses + total_fixed_expenses + total_loan_payments) / average_ticket_price if average_ticket_price != 0 else 0
+
+# פונקציה לחישוב נקודת איזון יומית
+def calculate_breakeven_daily_tickets(breakeven_total_tickets):
+    operating_days_per_year = 300 
+    return breakeven_total_tickets / operating_days_per_year if operating_days_per_year != 0 else 0
+
+# פונקציה לחישוב החזר על ההשקעה (ROI)
+def calculate_roi(profit_before_tax, setup_costs):
+    return (profit_before_tax / setup_costs) * 100 if setup_costs != 0 else 0
+
+# פונקציה לחישוב תקופת החזר ההשקעה
+def calculate_payback_period(setup_costs, profit_before_tax):
+    return setup_costs / profit_before_tax if profit_before_tax != 0 else 0
+
+# פונקציה לחישוב החזר פנימי (IRR)
+def calculate_irr(setup_costs, profit_before_tax, loan_duration_years):
+    solution = annuity_irr(setup_costs, profit_before_tax, loan_duration_years)
+    return solution['rate'] * 100 if solution['converged'] else None
+
+# פונקציה לחישוב הכנסות והוצאות לפי קטגוריות
+def calculate_category_data(params, income_regular_tickets, income_holiday_tickets, income_regular_food, income_holiday_food,
+                             income_regular_merch, income_holiday_merch, income_events, income_workshops,
+                             cost_of_merch, cost_of_food, cost_of_events, cost_of_workshops, total_fixed_expenses, total_loan_payments):
+    income_data = {
+        'כרטיסים': income_regular_tickets + income_holiday_tickets,
+        'מזון ומשקאות': income_regular_food + income_holiday_food,
+        'מרצ\'נדייז': income_regular_merch + income_holiday_merch,
+        'אירועים': income_events,
+        'סדנאות': income_workshops
+    }
+
+    expense_data = {
+        'הוצאות קבועות': total_fixed_expenses,
+        'עלות מרצ\'נדייז': cost_of_merch,
+        'עלות מזון ומשקאות': cost_of_food,
+        'עלות אירועים': cost_of_events,
+        'עלות סדנאות': cost_of_workshops,
+        'תשלומי הלוואה': total_loan_payments
+    }
+
+    return income_data, expense_data
+
+# פונקציה לחישוב התוצאות
+@instrumented('calculate_results')
+def calculate_results(params):
+    """
+    מחשב את התוצאות הפיננסיות של התוכנית העסקית בהתבסס על פרמטרי הקלט.
+
+    Args:
+        params (dict | ParamRecord): מילון של פרמטרים, או רשומת פרמטרים קומפקטית.
+
+    Returns:
+        dict: מילון של תוצאות.
+    """
+
+    params = as_record(params)
+    setup_costs = calculate_setup_costs(params)
+
+    # פחת שנתי כאחוז
+    annual_depreciation_percentage = params.depreciation_rate
+    annual_depreciation = setup_costs * (annual_depreciation_percentage / 100)
+
+    # הכנסות - כל שורה מחושבת פעם אחת ומסוכמת
+    income_lines = calculate_income_lines(params)
+    (income_regular_tickets, income_regular_food, income_regular_merch,
+     income_holiday_tickets, income_holiday_food, income_holiday_merch,
+     income_events, income_workshops) = income_lines
+    total_income = sum(income_lines)
+
+    # הוצאות משתנות
+    total_variable_expenses = calculate_variable_expenses(
+        params, income_regular_merch, income_holiday_merch, income_regular_food, income_holiday_food, income_events, income_workshops
+    )
+
+    # רווח גולמי
+    gross_profit = total_income - total_variable_expenses
+
+    # הוצאות קבועות (כוללות פחת והון חוזר)
+    total_fixed_expenses = calculate_fixed_expenses(params, annual_depreciation)
+
+    # תשלומי הלוואה חודשיים
+    total_loan_payments = calculate_loan_payments(params)
+
+    # רווח לפני מס
+    profit_before_tax = calculate_profit_before_tax(gross_profit, total_fixed_expenses, total_loan_payments)
+
+    # מחיר כניסה ממוצע
+    average_ticket_price = calculate_average_ticket_price(total_income, params)
+
+    # נקודת איזון כוללת (מספר כרטיסים לשנה)
+    breakeven_total_tickets = calculate_breakeven_total_tickets(total_variable_expenses, total_fixed_expenses, total_loan_payments, average_ticket_price)
+
+    # נקודת איזון יומית
+    breakeven_daily_tickets = calculate_breakeven_daily_tickets(breakeven_total_tickets)
+
+    # החזר על ההשקעה (ROI)
+    roi = calculate_roi(profit_before_tax, setup_costs)
+
+    # תקופת החזר ההשקעה
+    payback_period = calculate_payback_period(setup_costs, profit_before_tax)
+
+    # החזר פנימי (IRR)
+    irr = calculate_irr(setup_costs, profit_before_tax, int(params.loan_duration_years))
+
+    # הכנסות והוצאות לפי קטגוריות
+    income_data, expense_data = calculate_category_data(
+        params, income_regular_tickets, income_holiday_tickets, income_regular_food, income_holiday_food,
+        income_regular_merch, income_holiday_merch, income_events, income_workshops,
+        total_variable_expenses * (
+            (income_regular_merch + income_holiday_merch) * 0.5 / total_variable_expenses if total_variable_expenses != 0 else 0),
+        total_variable_expenses * (
+            (income_regular_food + income_holiday_food) * 0.4 / total_variable_expenses if total_variable_expenses != 0 else 0),
+        total_variable_expenses * (income_events * 0.4 / total_variable_expenses if total_variable_expenses != 0 else 0),
+        total_variable_expenses * (
+            income_workshops * 0.5 / total_variable_expenses if total_variable_expenses != 0 else 0),
+        total_fixed_expenses, total_loan_payments
+    )
+
+    results = {
+        'עלויות הקמה': setup_costs,
+        'פחת שנתי (%)': annual_depreciation_percentage, 
+        'הכנסות שנתיות': total_income,
+        'הוצאות משתנות': total_variable_expenses,
+        'רווח גולמי': gross_profit,
+        'הוצאות קבועות': total_fixed_expenses,
+        'תשלומי הלוואה': total_loan_payments,
+        'רווח לפני מס': profit_before_tax,
+        'נקודת איזון (מספר כרטיסים לשנה)': breakeven_total_tickets,
+        'נקודת איזון (מספר כרטיסים ליום)': breakeven_daily_tickets,
+        'החזר על ההשקעה (ROI)': roi,
+        'החזר פנימי (IRR)': irr,
+        'תקופת החזר השקעה (שנים)': payback_period,
+        'הכנסות לפי קטגוריות': income_data,
+        'הוצאות לפי קטגוריות': expense_data
+    }
+
+    return results
@@ -0,0 +1,335 @@
+from collections import deque, namedtuple
+
+from amortization import total_loan_payments
+from batch_engine import MONTHLY_FIXED_KEYS, SETUP_COST_KEYS
+from instrumentation import instrumented
+from model_core import (PARAM_KEYS, as_record, calculate_breakeven_daily_tickets, calculate_breakeven_total_tickets,
+                        calculate_irr, calculate_payback_period, calculate_profit_before_tax, calculate_roi)
+
+# צומת בגרף המודל: שם, הקלטים שלו (מפתחות פרמטרים או שמות צמתים אחרים) והפונקציה
+# שמחשבת אותו מערכי הקלטים, לפי הסדר
+Node = namedtuple('Node', ['name', 'inputs', 'func'])
+
+INCOME_LINE_NODES = (
+    'income_regular_tickets', 'income_regular_food', 'income_regular_merch',
+    'income_holiday_tickets', 'income_holiday_food', 'income_holiday_merch',
+    'income_events', 'income_workshops',
+)
+
+
+def _regular_day_income(visitors, spend):
+    return visitors * spend * 191
+
+
+def _holiday_income(visitors, spend):
+    return visitors * spend * 100
+
+
+def _fixed_expenses(rent, ceo, managers, staff, electricity, water, property_tax, other, depreciation, working_capital):
+    return (rent + ceo + managers + staff + electricity + water) * 12 + property_tax + other + depreciation + working_capital
+
+
+def _average_ticket_price(total_income, visitors_regular, visitors_holiday):
+    total_visitors = visitors_regular * 191 + visitors_holiday * 100
+    return total_income / total_visitors if total_visitors != 0 else 0
+
+
+def _income_by_category(regular_tickets, regular_food, regular_merch, holiday_tickets, holiday_food, holiday_merch,
+                        events, workshops):
+    return {
+        'כרטיסים': regular_tickets + holiday_tickets,
+        'מזון ומשקאות': regular_food + holiday_food,
+        'מרצ\'נדייז': regular_merch + holiday_merch,
+        'אירועים': events,
+        'סדנאות': workshops
+    }
+
+
+# חלק ההוצאות המשתנות של כל קטגוריה - באותו סדר פעולות כמו ב-calculate_results
+def _expenses_by_category(variable_expenses, merch, food, events, workshops, fixed_expenses, loan_payments):
+    def share(cost):
+        return variable_expenses * (cost / variable_expenses if variable_expenses != 0 else 0)
+
+    return {
+        'הוצאות קבועות': fixed_expenses,
+        'עלות מרצ\'נדייז': share(merch),
+        'עלות מזון ומשקאות': share(food),
+        'עלות אירועים': share(events),
+        'עלות סדנאות': share(workshops),
+        'תשלומי הלוואה': loan_payments
+    }
+
+
+# צמתי המודל, כל צומת אחרי הקלטים שלו. החישובים זהים (עד רמת הביט) ל-calculate_results
+MODEL_NODES = (
+    Node('setup_costs', SETUP_COST_KEYS, lambda *costs: sum(costs)),
+    Node('annual_depreciation', ('setup_costs', 'שיעור פחת שנתי (%)'),
+         lambda setup_costs, rate: setup_costs * (rate / 100)),
+
+    # הכנסות
+    Node('income_regular_tickets', ('מספר מבקרים ביום רגיל', 'מחיר כניסה ליום רגיל'), _regular_day_income),
+    Node('income_regular_food', ('מספר מבקרים ביום רגיל', 'רכישה ממוצעת במזון ביום רגיל'), _regular_day_income),
+    Node('income_regular_merch', ('מספר מבקרים ביום רגיל', 'רכישה ממוצעת במרצ\'נדייז ביום רגיל'),
+         _regular_day_income),
+    Node('income_holiday_tickets', ('מספר מבקרים ביום חופשה/חג', 'מחיר כניסה ליום חופשה/חג'), _holiday_income),
+    Node('income_holiday_food', ('מספר מבקרים ביום חופשה/חג', 'רכישה ממוצעת במזון ביום חופשה/חג'),
+         _holiday_income),
+    Node('income_holiday_merch', ('מספר מבקרים ביום חופשה/חג', 'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג'),
+         _holiday_income),
+    Node('income_events', ('מספר אירועים פרטיים בחודש', 'מחיר לאירוע פרטי'),
+         lambda events, price: events * price * 12),
+    Node('income_workshops', ('מספר סדנאות בחודש', 'מספר משתתפים בסדנה', 'מחיר לסדנה'),
+         lambda workshops, participants, price: workshops * participants * price * 12),
+    Node('total_income', INCOME_LINE_NODES, lambda *lines: sum(lines)),
+
+    # הוצאות משתנות ורווח גולמי
+    Node('cost_of_merch', ('income_regular_merch', 'income_holiday_merch'), lambda regular, holiday: (regular + holiday) * 0.5),
+    Node('cost_of_food', ('income_regular_food', 'income_holiday_food'), lambda regular, holiday: (regular + holiday) * 0.4),
+    Node('cost_of_workshops', ('income_workshops',), lambda income: income * 0.5),
+    Node('cost_of_events', ('income_events',), lambda income: income * 0.4),
+    Node('variable_expenses', ('cost_of_merch', 'cost_of_food', 'cost_of_workshops', 'cost_of_events'),
+         lambda merch, food, workshops, events: merch + food + workshops + events),
+    Node('gross_profit', ('total_income', 'variable_expenses'), lambda income, variable: income - variable),
+
+    # הוצאות קבועות והלוואה
+    Node('fixed_expenses', MONTHLY_FIXED_KEYS + ('ארנונה שנתית', 'הוצאות נוספות שנתיות', 'annual_depreciation',
+                                                'הון חוזר לתפעול ראשוני'), _fixed_expenses),
+    Node('loan_payments', ('תשלומי הלוואה שנתיים', 'ריבית שנתית על הלוואה (%)', 'אורך מימון (שנים)'),
+         lambda amount, rate, years: total_loan_payments(amount, rate / 100, int(years) * 12)),
+
+    # רווח ומדדים
+    Node('profit_before_tax', ('gross_profit', 'fixed_expenses', 'loan_payments'), calculate_profit_before_tax),
+    Node('average_ticket_price', ('total_income', 'מספר מבקרים ביום רגיל', 'מספר מבקרים ביום חופשה/חג'),
+         _average_ticket_price),
+    Node('breakeven_total_tickets', ('variable_expenses', 'fixed_expenses', 'loan_payments', 'average_ticket_price'),
+         calculate_breakeven_total_tickets),
+    Node('breakeven_daily_tickets', ('breakeven_total_tickets',), calculate_breakeven_daily_tickets),
+    Node('roi', ('profit_before_tax', 'setup_costs'), calculate_roi),
+    Node('payback_period', ('setup_costs', 'profit_before_tax'), calculate_payback_period),
+    Node('irr', ('setup_costs', 'profit_before_tax', 'אורך מימון (שנים)'),
+         lambda setup_costs, profit, years: calculate_irr(setup_costs, profit, int(years))),
+
+    # פירוט לפי קטגוריות
+    Node('income_by_category', INCOME_LINE_NODES, _income_by_category),
+    Node('expenses_by_category', ('variable_expenses', 'cost_of_merch', 'cost_of_food', 'cost_of_events',
+                                  'cost_of_workshops', 'fixed_expenses', 'loan_payments'), _expenses_by_category),
+)
+
+# מפתחות התוצאה של calculate_results, בסדר שלהם, והצומת (או הפרמטר) שממנו כל אחד נלקח
+RESULT_SOURCES = (
+    ('עלויות הקמה', 'setup_costs'),
+    ('פחת שנתי (%)', 'שיעור פחת שנתי (%)'),
+    ('הכנסות שנתיות', 'total_income'),
+    ('הוצאות משתנות', 'variable_expenses'),
+    ('רווח גולמי', 'gross_profit'),
+    ('הוצאות קבועות', 'fixed_expenses'),
+    ('תשלומי הלוואה', 'loan_payments'),
+    ('רווח לפני מס', 'profit_before_tax'),
+    ('נקודת איזון (מספר כרטיסים לשנה)', 'breakeven_total_tickets'),
+    ('נקודת איזון (מספר כרטיסים ליום)', 'breakeven_daily_tickets'),
+    ('החזר על ההשקעה (ROI)', 'roi'),
+    ('החזר פנימי (IRR)', 'irr'),
+    ('תקופת החזר השקעה (שנים)', 'payback_period'),
+    ('הכנסות לפי קטגוריות', 'income_by_category'),
+    ('הוצאות לפי קטגוריות', 'expenses_by_category'),
+)
+
+
+# גרף התלויות של המודל
+class ModelGraph:
+    """
+    צמתים חייבים להופיע אחרי הקלטים שלהם, כך שסדר ההגדרה הוא גם סדר חישוב
+    טופולוגי. קלט שאינו פרמטר ואינו צומת קודם הוא שגיאה (וכך גם מעגל).
+    """
+
+    def __init__(self, nodes, param_keys=PARAM_KEYS):
+        self.param_keys = tuple(param_keys)
+        self.nodes = {}
+        self.dependents = {key: [] for key in self.param_keys}
+        for node in nodes:
+            if node.name in self.dependents:
+                raise ValueError(f"Duplicate node name: {node.name!r}")
+            for name in node.inputs:
+                if name not in self.dependents:
+                    raise ValueError(f"Node {node.name!r} depends on unknown or later node {name!r}")
+                self.dependents[name].append(node.name)
+            self.nodes[node.name] = node
+            self.dependents[node.name] = []
+        self.order = tuple(self.nodes)
+        self._position = {name: index for index, name in enumerate(self.order)}
+        self._downstream_cache = {}
+
+    # כל הצמתים שמושפעים (ישירות או בעקיפין) מהשמות הנתונים, בסדר חישוב
+    def downstream(self, names):
+        key = frozenset(names)
+        if key not in self._downstream_cache:
+            self._downstream_cache[key] = self._downstream(key)
+        return self._downstream_cache[key]
+
+    def _downstream(self, names):
+        seen = set()
+        queue = deque(names)
+        while queue:
+            for dependent in self.dependents[queue.popleft()]:
+                if dependent not in seen:
+                    seen.add(dependent)
+                    queue.append(dependent)
+        return self.ordered(seen)
+
+    # שמות צמתים בסדר חישוב
+    def ordered(self, names):
+        return tuple(sorted(names, key=self._position.__getitem__))
+
+    # כל הפרמטרים והצמתים שהצומת תלוי בהם
+    def upstream(self, name):
+        seen = set()
+        queue = deque(self.nodes[name].inputs if name in self.nodes else ())
+        while queue:
+            current = queue.popleft()
+            if current not in seen:
+                seen.add(current)
+                if current in self.nodes:
+                    queue.extend(self.nodes[current].inputs)
+        return seen
+
+    # צמתים שאינם תלויים באף אחד מהשמות - ערכם קבוע כשרק השמות האלה משתנים
+    def invariant(self, names):
+        affected = set(self.downstream(names))
+        return tuple(name for name in self.order if name not in affected)
+
+    def evaluate(self, values, names=None):
+        """
+        מחשב צמתים לתוך values (מילון שמכיל כבר את כל הפרמטרים ואת ערכי הקלטים).
+
+        Args:
+            values (dict): ערכי פרמטרים וצמתים. מתעדכן במקום.
+            names (iterable): הצמתים לחישוב, בסדר חישוב. ברירת מחדל - כל הצמתים.
+
+        Returns:
+            dict: values.
+        """
+
+        nodes = self.nodes
+        for name in self.order if names is None else names:
+            inputs, func = nodes[name][1:]
+            values[name] = func(*map(values.__getitem__, inputs))
+        return values
+
+    def describe(self):
+        """
+        Returns:
+            list: שורה לכל צומת - קלטים ישירים, צמתים תלויים ישירים ומספר הפרמטרים שמשפיעים עליו.
+        """
+
+        return [{
+            'צומת': name,
+            'קלטים': ', '.join(self.nodes[name].inputs),
+            'צמתים תלויים': ', '.join(self.dependents[name]),
+            'פרמטרים משפיעים': sum(1 for key in self.upstream(name) if key not in self.nodes),
+        } for name in self.order]
+
+    # ייצוא בפורמט Graphviz DOT
+    def to_dot(self):
+        lines = ['digraph model {', '    rankdir=LR;']
+        for name in self.order:
+            for source in self.nodes[name].inputs:
+                lines.append(f'    "{source}" -> "{name}";')
+        lines.append('}')
+        return '\n'.join(lines)
+
+
+MODEL_GRAPH = ModelGraph(MODEL_NODES)
+
+
+# מודל ששומר את ערכי כל הצמתים ומחשב מחדש רק את מה שהשתנה
+class IncrementalModel:
+    """
+    צמתים שקלטיהם השתנו מסומנים כלא-מעודכנים ומחושבים רק כשמבקשים תוצאה, כך
+    שסריקה שמבקשת מדד אחד לא משלמת על צמתים שהמדד אינו תלוי בהם.
+    """
+
+    def __init__(self, params, graph=MODEL_GRAPH):
+        self.graph = graph
+        self.values = dict(zip(graph.param_keys, as_record(params)))
+        self._stale = set(graph.order)
+        self.last_recomputed = ()
+
+    @instrumented('model_graph.update')
+    def update(self, params):
+        """
+        מעדכן פרמטרים ומחשב מחדש רק את הצמתים שתלויים בהם.
+
+        Args:
+            params (dict | ParamRecord): פרמטרים מלאים, או רק הפרמטרים ששונו.
+
+        Returns:
+            dict: התוצאות, כמו calculate_results.
+        """
+
+        if not isinstance(params, dict):
+            params = as_record(params).to_dict()
+        values = self.values
+        changed = []
+        for key, value in params.items():
+            current = values[key]
+            # גם שינוי טיפוס (5 -> 5.0) נחשב שינוי, כדי שהתוצאות יהיו זהות לחישוב מלא
+            if value != current or type(value) is not type(current):
+                values[key] = value
+                changed.append(key)
+        if changed:
+            self._stale.update(self.graph.downstream(changed))
+        return self.results()
+
+    # חישוב הצמתים הלא-מעודכנים (כולם, או רק אלה שבשמות הנתונים)
+    def _refresh(self, names=None):
+        stale = self._stale if names is None else self._stale.intersection(names)
+        if stale:
+            self.last_recomputed = self.graph.ordered(stale)
+            self.graph.evaluate(self.values, self.last_recomputed)
+            self._stale -= stale
+
+    def results(self):
+        self._refresh()
+        values = self.values
+        results = {key: values[source] for key, source in RESULT_SOURCES}
+        # עותקים של מילוני הקטגוריות, כדי שקוראים לא ישנו את הערכים השמורים
+        results['הכנסות לפי קטגוריות'] = dict(results['הכנסות לפי קטגוריות'])
+        results['הוצאות לפי קטגוריות'] = dict(results['הוצאות לפי קטגוריות'])
+        return results
+
+    def sweep(self, param, param_values, output=None):
+        """
+        מחשב את המודל לכל ערך של פרמטר אחד. צמתים שאינם תלויים בפרמטר מחושבים
+        פעם אחת, ובכל צעד מחושבים רק הצמתים שתלויים בו - וכשמבקשים מדד אחד, רק
+        אלה מהם שהמדד תלוי בהם (למשל בלי IRR עבור רווח).
+
+        Args:
+            output (str): מפתח תוצאה להחזרה. None - מילון תוצאות מלא לכל ערך.
+
+        Returns:
+            list: תוצאה לכל ערך, לפי הסדר. ערך הפרמטר המקורי משוחזר בסוף.
+        """
+
+        graph, values = self.graph, self.values
+        base_value = values[param]
+        if output is None:
+            try:
+                return [self.update({param: value}) for value in param_values]
+            finally:
+                self.update({param: base_value})
+
+        source = dict(RESULT_SOURCES)[output]
+        needed = graph.upstream(source) | {source}
+        affected = graph.downstream([param])
+        self._refresh(needed.difference(affected))
+        names = tuple(name for name in affected if name in needed)
+        self._stale.update(affected)
+        outputs = []
+        try:
+            for value in param_values:
+                values[param] = value
+                graph.evaluate(values, names)
+                outputs.append(values[source])
+        finally:
+            values[param] = base_value
+        return outputs
@@ -0,0 +1,259 @@
+import os
+
+import numpy as np
+
+from batch_engine import IRR_KEY, PARAM_KEYS, calculate_irr_arrays, calculate_results_arrays
+from jobs import process_pool
+
+# מדדי התוצאה שמתפלגותיהם נאספות בסימולציה
+SIMULATION_METRICS = (
+    'רווח לפני מס',
+    'החזר על ההשקעה (ROI)',
+    'החזר פנימי (IRR)',
+    'תקופת החזר השקעה (שנים)',
+)
+
+DISTRIBUTION_TYPES = ('normal', 'triangular', 'lognormal', 'empirical')
+
+# הפרמטרים התפעוליים שבדרך כלל מקבלים התפלגות
+OPERATIONAL_PARAMS = (
+    'מחיר כניסה ליום רגיל', 'מספר מבקרים ביום רגיל', 'מחיר כניסה ליום חופשה/חג', 'מספר מבקרים ביום חופשה/חג',
+    'רכישה ממוצעת במזון ביום רגיל', 'רכישה ממוצעת במזון ביום חופשה/חג', 'רכישה ממוצעת במרצ\'נדייז ביום רגיל',
+    'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג', 'מספר אירועים פרטיים בחודש', 'מחיר לאירוע פרטי',
+    'מספר סדנאות בחודש', 'מספר משתתפים בסדנה', 'מחיר לסדנה'
+)
+
+# ברירות מחדל לסימולציה
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_BINS = 4096
+PILOT_SIZE = 20_000
+
+
+# פונקציה להגרלת ערכים מהתפלגות
+def sample_distribution(spec, rng, size):
+    """
+    מגריל ערכים מהתפלגות המוגדרת במילון.
+
+    Args:
+        spec (dict): הגדרת התפלגות, למשל {'type': 'normal', 'mean': 300, 'std': 30}.
+            normal: mean, std | triangular: left, mode, right |
+            lognormal: mean, sigma (של הלוגריתם) | empirical: values, weights (אופציונלי).
+            המפתחות האופציונליים min ו-max חותכים את הערכים שהוגרלו.
+        rng (np.random.Generator): מחולל המספרים האקראיים.
+        size (int): מספר הערכים להגרלה.
+
+    Returns:
+        np.ndarray: מערך הערכים שהוגרלו.
+    """
+
+    kind = spec['type']
+    if kind == 'normal':
+        values = rng.normal(spec['mean'], spec['std'], size)
+    elif kind == 'triangular':
+        values = rng.triangular(spec['left'], spec['mode'], spec['right'], size)
+    elif kind == 'lognormal':
+        # log של בסיס 0 או שלילי נותן -inf או NaN, וההגרלות היו יוצאות 0 או NaN בלי שגיאה
+        if not np.isfinite(spec['mean']):
+            raise ValueError(f"Lognormal mean must be finite, got {spec['mean']!r}")
+        values = rng.lognormal(spec['mean'], spec['sigma'], size)
+    elif kind == 'empirical':
+        weights = spec.get('weights')
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+            weights = weights / weights.sum()
+        values = rng.choice(np.asarray(spec['values'], dtype=np.float64), size=size, p=weights)
+    else:
+        raise ValueError(f"Unknown distribution type: {kind!r} (expected one of {DISTRIBUTION_TYPES})")
+
+    if 'min' in spec or 'max' in spec:
+        values = np.clip(values, spec.get('min'), spec.get('max'))
+    return values
+
+
+# מצבר היסטוגרמה עם גבולות קבועים - ניתן למיזוג בין תהליכים
+def _empty_accumulator(edges):
+    return {
+        'edges': edges,
+        'counts': np.zeros(len(edges) - 1, dtype=np.int64),
+        'underflow': 0,
+        'overflow': 0,
+        'nan_count': 0,
+        'count': 0,
+        'negative_count': 0,
+        'mean': 0.0,
+        'm2': 0.0,
+        'min': np.inf,
+        'max': -np.inf,
+    }
+
+
+# מיזוג מומנטים (ממוצע וסכום ריבועי סטיות) של שתי קבוצות - נוסחת Chan
+def _combine_moments(target, count, mean, m2):
+    total = target['count'] + count
+    if total == 0:
+        return
+    delta = mean - target['mean']
+    target['m2'] += m2 + delta ** 2 * target['count'] * count / total
+    target['mean'] += delta * count / total
+    target['count'] = total
+
+
+def _accumulate(accumulator, values):
+    finite = values[np.isfinite(values)]
+    edges = accumulator['edges']
+    accumulator['nan_count'] += values.size - finite.size
+    if finite.size == 0:
+        return
+    mean = float(finite.mean())
+    _combine_moments(accumulator, finite.size, mean, float(np.square(finite - mean).sum()))
+    accumulator['counts'] += np.histogram(finite, bins=edges)[0]
+    accumulator['underflow'] += int(np.count_nonzero(finite < edges[0]))
+    accumulator['overflow'] += int(np.count_nonzero(finite > edges[-1]))
+    accumulator['negative_count'] += int(np.count_nonzero(finite < 0))
+    accumulator['min'] = min(accumulator['min'], float(finite.min()))
+    accumulator['max'] = max(accumulator['max'], float(finite.max()))
+
+
+def _merge(target, source):
+    for key in ('counts', 'underflow', 'overflow', 'nan_count', 'negative_count'):
+        target[key] += source[key]
+    _combine_moments(target, source['count'], source['mean'], source['m2'])
+    target['min'] = min(target['min'], source['min'])
+    target['max'] = max(target['max'], source['max'])
+
+
+# פונקציה לחישוב אחוזון מתוך מצבר היסטוגרמה
+def _histogram_quantile(accumulator, q):
+    count = accumulator['count']
+    if count == 0:
+        return np.nan
+    edges = accumulator['edges']
+    # הרחבת ההיסטוגרמה עם תאי החריגה, התחומים בין הקצה לבין min/max שנצפו
+    counts = np.concatenate(([accumulator['underflow']], accumulator['counts'], [accumulator['overflow']]))
+    bounds = np.concatenate(([min(accumulator['min'], edges[0])], edges, [max(accumulator['max'], edges[-1])]))
+    cumulative = np.cumsum(counts)
+    target = q * count
+    index = int(np.searchsorted(cumulative, target, side='left'))
+    index = min(index, len(counts) - 1)
+    previous = cumulative[index - 1] if index > 0 else 0
+    fraction = (target - previous) / counts[index] if counts[index] else 0.0
+    value = bounds[index] + fraction * (bounds[index + 1] - bounds[index])
+    return float(np.clip(value, accumulator['min'], accumulator['max']))
+
+
+# פונקציה לחישוב מדדי הסימולציה על מקטע של הגרלות
+def _evaluate_draws(base_params, distributions, rng, size):
+    columns = dict(base_params)
+    for key, spec in distributions.items():
+        columns[key] = sample_distribution(spec, rng, size)
+    results = calculate_results_arrays(columns)
+    results[IRR_KEY] = calculate_irr_arrays(results, columns['אורך מימון (שנים)'])
+    return {metric: np.broadcast_to(results[metric], (size,)) for metric in SIMULATION_METRICS}
+
+
+# עבודת מקטע אחד (רצה בתהליך נפרד)
+def _simulate_chunk(base_params, distributions, seed_sequence, size, edges):
+    rng = np.random.default_rng(seed_sequence)
+    draws = _evaluate_draws(base_params, distributions, rng, size)
+    accumulators = {}
+    for metric in SIMULATION_METRICS:
+        accumulators[metric] = _empty_accumulator(edges[metric])
+        _accumulate(accumulators[metric], draws[metric])
+    return accumulators
+
+
+# פונקציה לקביעת גבולות ההיסטוגרמה מהרצת פיילוט קטנה
+def _pilot_edges(base_params, distributions, seed_sequence, bins):
+    draws = _evaluate_draws(base_params, distributions, np.random.default_rng(seed_sequence), PILOT_SIZE)
+    edges = {}
+    for metric, values in draws.items():
+        finite = values[np.isfinite(values)]
+        if finite.size == 0:
+            low, high = -1.0, 1.0
+        else:
+            low, high = np.percentile(finite, [0.1, 99.9])
+            padding = (high - low) * 0.5 or max(abs(low), 1.0) * 0.5
+            low, high = low - padding, high + padding
+        edges[metric] = np.linspace(low, high, bins + 1)
+    return edges
+
+
+# פונקציה להרצת סימולציית מונטה קרלו
+def run_monte_carlo(base_params, distributions, n_draws=1_000_000, seed=0, chunk_size=DEFAULT_CHUNK_SIZE,
+                    n_workers=None, bins=DEFAULT_BINS, quantiles=(0.05, 0.5, 0.95), progress=None):
+    """
+    מריץ סימולציית מונטה קרלו על המודל ומחזיר את התפלגויות המדדים.
+
+    ההגרלות מחושבות במקטעים ונצברות להיסטוגרמות בעלות גבולות קבועים, כך
+    שהזיכרון אינו תלוי במספר ההגרלות. לכל מקטע זרע משלו (SeedSequence.spawn),
+    ולכן התוצאה זהה לכל מספר תהליכים.
+
+    Args:
+        base_params (dict): פרמטרי הבסיס.
+        distributions (dict): מיפוי פרמטר -> הגדרת התפלגות (ראו sample_distribution).
+        n_draws (int): מספר ההגרלות הכולל.
+        seed (int): זרע לשחזור התוצאות.
+        chunk_size (int): מספר ההגרלות לכל מקטע.
+        n_workers (int): מספר התהליכים. 1 מריץ בתהליך הנוכחי; None - מספר הליבות.
+        bins (int): מספר התאים בהיסטוגרמה של כל מדד.
+        quantiles (tuple): האחוזונים לדיווח.
+        progress (callable): נקרא אחרי כל מקטע - progress(מקטעים שהסתיימו, סך המקטעים,
+            partial=סיכום ההגרלות עד כה, באותו מבנה כמו התוצאה).
+
+    Returns:
+        dict: מיפוי מדד -> מילון עם count, mean, std, min, max, probability_negative,
+            האחוזונים (P5, P50, ...) ו-histogram (counts, edges).
+    """
+
+    unknown = [key for key in distributions if key not in PARAM_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown parameters in distributions: {unknown}")
+
+    pilot_seed, chunks_seed = np.random.SeedSequence(seed).spawn(2)
+    edges = _pilot_edges(base_params, distributions, pilot_seed, bins)
+
+    chunk_sizes = [min(chunk_size, n_draws - start) for start in range(0, n_draws, chunk_size)]
+    chunk_seeds = chunks_seed.spawn(len(chunk_sizes))
+    n_workers = n_workers or os.cpu_count() or 1
+
+    totals = {metric: _empty_accumulator(edges[metric]) for metric in SIMULATION_METRICS}
+    jobs = [(base_params, distributions, chunk_seed, size, edges) for chunk_seed, size in zip(chunk_seeds, chunk_sizes)]
+    if n_workers == 1 or len(jobs) <= 1:
+        partials = (_simulate_chunk(*job) for job in jobs)
+        _merge_all(totals, partials, progress, quantiles, len(jobs))
+    else:
+        executor = process_pool(n_workers)
+        try:
+            _merge_all(totals, executor.map(_simulate_chunk, *zip(*jobs)), progress, quantiles, len(jobs))
+        finally:
+            # ביטול (חריגה מ-progress) לא ממתין למקטעים שעוד לא התחילו
+            executor.shutdown(cancel_futures=True)
+
+    return {metric: _summarize(accumulator, quantiles) for metric, accumulator in totals.items()}
+
+
+def _merge_all(totals, partials, progress=None, quantiles=(), n_chunks=None):
+    for done, partial in enumerate(partials, start=1):
+        for metric, accumulator in partial.items():
+            _merge(totals[metric], accumulator)
+        if progress is not None:
+            progress(done, n_chunks, partial={metric: _summarize(accumulator, quantiles)
+                                              for metric, accumulator in totals.items()})
+
+
+# סיכום מצבר להתפלגות מדווחת
+def _summarize(accumulator, quantiles):
+    count = accumulator['count']
+    summary = {
+        'count': count,
+        'nan_count': accumulator['nan_count'],
+        'mean': accumulator['mean'] if count else np.nan,
+        'std': float(np.sqrt(accumulator['m2'] / count)) if count else np.nan,
+        'min': accumulator['min'] if count else np.nan,
+        'max': accumulator['max'] if count else np.nan,
+        'probability_negative': accumulator['negative_count'] / count if count else np.nan,
+        'histogram': (accumulator['counts'], accumulator['edges']),
+    }
+    for q in quantiles:
+        summary[f"P{q * 100:g}"] = _histogram_quantile(accumulator, q)
+    return summary
@@ -0,0 +1,145 @@
+import numpy as np
+
+from instrumentation import instrumented
+
+# סימני הפורמט - קבועים ולא לפי הלוקאל של התהליך (כמו he_IL: פסיק לאלפים ונקודה עשרונית)
+THOUSANDS_SEPARATOR = ','
+DECIMAL_POINT = '.'
+
+# סיומות נפוצות
+CURRENCY_SUFFIX = ' ש״ח'
+PERCENT_SUFFIX = '%'
+
+# מספר הספרות המרבי (כולל ספרות אחרי הנקודה) שמפורמט בנתיב הווקטורי - כדי שהערך
+# המוכפל ב-10**decimals ייכנס ב-int64. ערכים גדולים יותר ו-inf מפורמטים אחד-אחד
+MAX_VECTOR_DIGITS = 18
+
+# סף יחסי לזיהוי ערך שנמצא (כמעט) בדיוק באמצע בין שני ערכים מעוגלים - בהם ההכפלה
+# ב-10**decimals עלולה לשנות את כיוון העיגול, ולכן הם מפורמטים אחד-אחד
+_TIE_TOLERANCE = 4.5e-16
+
+# טבלת התווים של כל קבוצת אלפים (000-999), עם המפריד שלפניה: ',000' ... ',999'
+_DIGIT_GROUPS = np.array([[ord(THOUSANDS_SEPARATOR)] + [ord(digit) for digit in f'{group:03d}']
+                          for group in range(1000)], dtype=np.uint32)
+
+
+# פורמט של ערך בודד - בלי תלות בלוקאל, ולכן בטוח לשימוש מכמה threads
+def format_number(value, decimals=2, suffix='', missing=''):
+    """
+    Args:
+        value (float | None): הערך.
+        decimals (int): מספר הספרות אחרי הנקודה.
+        suffix (str): סיומת (למשל CURRENCY_SUFFIX).
+        missing (str): הטקסט לערך חסר (None או NaN).
+
+    Returns:
+        str: הערך עם מפריד אלפים, למשל '1,234.50 ש״ח'.
+    """
+
+    if value is None or value != value:
+        return missing
+    return f"{value:,.{decimals}f}{suffix}"
+
+
+# המרת קלט (כולל None בעמודות object) למערך float
+def _as_float_array(values):
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = np.where(np.equal(values, None), np.nan, values)
+    return values.astype(np.float64)
+
+
+# פונקציה לפורמט עמודה שלמה של מספרים בבת אחת
+@instrumented('number_format.format_numbers')
+def format_numbers(values, decimals=2, suffix='', missing=''):
+    """
+    מפרמט מערך מספרים עם מפריד אלפים וסיומת, בפעולות NumPy ובלי locale.
+
+    הערכים מקובצים לפי התבנית שלהם (מספר הספרות בחלק השלם והסימן). בכל קבוצה
+    מיקומי התווים קבועים, ולכן כל הקבוצה נבנית כמטריצת תווים (קוד יוניקוד לכל
+    תו) בפעולות וקטוריות - קבוצות האלפים נשלפות מטבלה - ומוצגת כמערך מחרוזות.
+    מספר הקבוצות חסום במספר הספרות, לא במספר הערכים.
+
+    התוצאה זהה לפורמט '{:,.2f}' של Python לכל ערך: ערכים שבהם העיגול אינו
+    חד-משמעי (חצי בדיוק), ערכים גדולים מאוד ו-inf מפורמטים אחד-אחד.
+
+    Args:
+        values (array-like): הערכים (רשימה, מערך או עמודת DataFrame).
+        decimals (int): מספר הספרות אחרי הנקודה.
+        suffix (str): סיומת שמתווספת לכל ערך.
+        missing (str): הטקסט לערכים חסרים (None או NaN), ללא סיומת.
+
+    Returns:
+        np.ndarray: מערך object של מחרוזות, באותה צורה כמו values.
+    """
+
+    values = _as_float_array(values)
+    flat = values.ravel()
+    scale = 10 ** decimals
+
+    is_missing = np.isnan(flat)
+    with np.errstate(invalid='ignore', over='ignore'):
+        magnitude = np.abs(flat) * scale
+        fraction = magnitude - np.floor(magnitude)
+        vector = np.isfinite(magnitude) & (magnitude < 10.0 ** MAX_VECTOR_DIGITS) & \
+            (np.abs(fraction - 0.5) > magnitude * _TIE_TOLERANCE)
+    integer, fractional = np.divmod(np.round(np.where(vector, magnitude, 0)).astype(np.int64), scale)
+    negative = np.signbit(flat)
+    lengths = np.searchsorted(10 ** np.arange(1, MAX_VECTOR_DIGITS, dtype=np.int64), integer, side='right') + 1
+
+    formatted = np.empty(len(flat), dtype=object)
+    suffix_codes = [ord(char) for char in suffix]
+    fraction_powers = 10 ** np.arange(decimals - 1, -1, -1, dtype=np.int64)
+    fraction_width = decimals + 1 if decimals else 0
+
+    # קבוצה לכל תבנית (מספר ספרות, סימן) - שורות רצופות אחרי מיון לפי התבנית
+    layouts = np.where(vector, lengths * 2 + negative, -1)
+    order = np.argsort(layouts, kind='stable')
+    order = order[layouts[order] >= 0]
+    bounds = np.flatnonzero(np.diff(layouts[order])) + 1
+    for rows in np.split(order, bounds):
+        if not len(rows):
+            continue
+        length, sign = int(lengths[rows[0]]), int(negative[rows[0]])
+        n_groups = (length + 2) // 3
+        integer_width = length + (length - 1) // 3
+        point = sign + integer_width
+        codes = np.empty((len(rows), point + fraction_width + len(suffix)), dtype=np.uint32)
+        if sign:
+            codes[:, 0] = ord('-')
+        groups = (integer[rows, None] // 1000 ** np.arange(n_groups - 1, -1, -1, dtype=np.int64)) % 1000
+        codes[:, sign:point] = _DIGIT_GROUPS[groups].reshape(len(rows), 4 * n_groups)[:, 4 * n_groups - integer_width:]
+        if decimals:
+            codes[:, point] = ord(DECIMAL_POINT)
+            codes[:, point + 1:point + fraction_width] = ord('0') + (fractional[rows, None] // fraction_powers) % 10
+        codes[:, point + fraction_width:] = suffix_codes
+        formatted[rows] = codes.view(f'U{codes.shape[1]}').ravel()
+
+    for index in np.flatnonzero(~vector & ~is_missing):
+        formatted[index] = format_number(float(flat[index]), decimals, suffix)
+    formatted[is_missing] = missing
+    return formatted.reshape(values.shape)
+
+
+# פונקציה לפורמט עמודות מספריות בטבלה להצגה
+def format_frame(frame, decimals=2, suffixes=None, columns=None, missing=''):
+    """
+    Args:
+        frame (pd.DataFrame): הטבלה.
+        decimals (int | dict): מספר הספרות אחרי הנקודה - לכל העמודות, או לפי עמודה.
+        suffixes (dict): עמודה -> סיומת.
+        columns (sequence): העמודות לפורמט. None - כל העמודות המספריות.
+        missing (str): הטקסט לערכים חסרים.
+
+    Returns:
+        pd.DataFrame: עותק של הטבלה שבו העמודות שנבחרו הן מחרוזות מפורמטות.
+    """
+
+    suffixes = suffixes or {}
+    if columns is None:
+        columns = [column for column in frame.columns if frame[column].dtype.kind in 'iuf']
+    formatted = frame.copy()
+    for column in columns:
+        places = decimals.get(column, 2) if isinstance(decimals, dict) else decimals
+        formatted[column] = format_numbers(frame[column].to_numpy(), places, suffixes.get(column, ''), missing)
+    return formatted
@@ -0,0 +1,337 @@
+import os
+
+import numpy as np
+
+from batch_engine import (IRR_KEY, PARAM_INDEX, PARAM_KEYS, RESULT_KEYS, calculate_irr_arrays,
+                          calculate_results_batch, params_to_matrix)
+from global_sensitivity import sobol_directions, sobol_points
+from instrumentation import instrumented
+from jobs import process_pool
+from model_core import calculate_results
+from monte_carlo import sample_distribution
+
+# המדדים שאפשר למקסם
+OBJECTIVES = ('רווח לפני מס', 'החזר על ההשקעה (ROI)', IRR_KEY)
+
+# משתני ההחלטה ברירת המחדל - תמחור, הוצאה לנפש וכמות אירועים וסדנאות
+DECISION_PARAMS = (
+    'מחיר כניסה ליום רגיל', 'מחיר כניסה ליום חופשה/חג',
+    'רכישה ממוצעת במזון ביום רגיל', 'רכישה ממוצעת במזון ביום חופשה/חג',
+    'רכישה ממוצעת במרצ\'נדייז ביום רגיל', 'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג',
+    'מספר אירועים פרטיים בחודש', 'מחיר לאירוע פרטי', 'מספר סדנאות בחודש', 'מספר משתתפים בסדנה', 'מחיר לסדנה',
+)
+
+# פרמטרים שמקבלים רק ערכים שלמים (כמויות)
+INTEGER_PARAMS = tuple(key for key in PARAM_KEYS if key.startswith('מספר ')) + ('אורך מימון (שנים)',)
+
+CONSTRAINT_OPERATORS = ('<=', '>=')
+
+# מצבי סיום לכל נקודת התחלה
+STATUS_CONVERGED = 'converged'
+STATUS_MAX_ITERATIONS = 'max_iterations'
+
+# ברירות מחדל לחיפוש
+DEFAULT_STARTS = 32
+INITIAL_STEP = 0.25  # הצעד ההתחלתי כשבר מרוחב הטווח של כל משתנה
+STEP_TOLERANCE = 1e-4  # הצעד המינימלי כשבר מרוחב הטווח
+MAX_ITERATIONS = 200
+
+
+# פונקציה לבניית טווחי משתני ההחלטה - +/- spread סביב ערך הבסיס כשאין טווח מפורש
+def decision_bounds(base_params, params=DECISION_PARAMS, bounds=None, spread=0.3):
+    bounds = dict(bounds or {})
+    ranges = {}
+    for key in list(params) + [key for key in bounds if key not in params]:
+        if key not in PARAM_INDEX:
+            raise ValueError(f"Unknown parameter: {key!r}")
+        low, high = bounds.get(key, (base_params[key] * (1 - spread), base_params[key] * (1 + spread)))
+        ranges[key] = (float(min(low, high)), float(max(low, high)))
+    return ranges
+
+
+# ערכי צד שמאל של אילוץ: פרמטר או תוצאה (מפתח), צירוף ליניארי של פרמטרים (מילון), או פונקציה
+def _constraint_values(lhs, columns, results):
+    if callable(lhs):
+        return np.asarray(lhs(columns, results), dtype=np.float64)
+    if isinstance(lhs, dict):
+        return sum(coefficient * columns[key] for key, coefficient in lhs.items())
+    if lhs in columns:
+        return columns[lhs]
+    if lhs in results:
+        return results[lhs]
+    raise ValueError(f"Unknown constraint field: {lhs!r}")
+
+
+# פונקציה להערכת נקודות החלטה רבות במעבר אחד
+def evaluate_points(base_row, keys, points, objective, constraints=()):
+    """
+    Args:
+        base_row (np.ndarray): שורת פרמטרי הבסיס בסדר PARAM_KEYS.
+        keys (sequence): משתני ההחלטה, בסדר העמודות של points.
+        points (np.ndarray): נקודות בגודל (N, len(keys)). משתנים שלמים מעוגלים.
+        objective (str): מדד מתוך OBJECTIVES (או RESULT_KEYS).
+        constraints (sequence): שלשות (צד שמאל, אופרטור, ערך) - ראו optimize.
+
+    Returns:
+        tuple: (ערכי המדד - inf- כשאינו מוגדר, סכום ההפרות היחסיות של האילוצים - 0 בנקודה חוקית).
+    """
+
+    matrix = np.tile(base_row, (len(points), 1))
+    for index, key in enumerate(keys):
+        values = points[:, index]
+        matrix[:, PARAM_INDEX[key]] = np.round(values) if key in INTEGER_PARAMS else values
+    results = calculate_results_batch(matrix)
+    columns = dict(zip(PARAM_KEYS, matrix.T))
+    uses_irr = objective == IRR_KEY or any(lhs == IRR_KEY for lhs, _, _ in constraints)
+    if uses_irr:
+        results[IRR_KEY] = calculate_irr_arrays(results, columns['אורך מימון (שנים)'])
+
+    values = np.asarray(results[objective], dtype=np.float64)
+    values = np.where(np.isnan(values), -np.inf, values)
+    violation = np.zeros(len(points))
+    for lhs, operator, rhs in constraints:
+        if operator not in CONSTRAINT_OPERATORS:
+            raise ValueError(f"Unknown operator: {operator!r} (expected one of {CONSTRAINT_OPERATORS})")
+        lhs_values = _constraint_values(lhs, columns, results)
+        excess = lhs_values - rhs if operator == '<=' else rhs - lhs_values
+        # ערך לא מוגדר (למשל IRR ללא פתרון) נחשב הפרה
+        excess = np.where(np.isnan(excess), np.inf, excess)
+        violation += np.maximum(excess, 0) / max(abs(rhs), 1.0)
+    return values, violation
+
+
+# האם (ערך, הפרה) חדשים טובים מהקודמים: נקודה חוקית עדיפה, ובין חוקיות - הערך הגבוה
+def _better(values, violation, best_values, best_violation):
+    return (violation < best_violation) | ((violation == best_violation) & (values > best_values))
+
+
+# חיפוש דפוס (pattern search) מכל נקודות ההתחלה בבת אחת (רץ בתהליך נפרד)
+def _pattern_search(base_row, keys, lows, highs, starts, objective, constraints, max_iterations, progress=None):
+    n_starts, n_keys = starts.shape
+    current = starts.copy()
+    values, violation = evaluate_points(base_row, keys, current, objective, constraints)
+    step = np.tile(INITIAL_STEP * (highs - lows), (n_starts, 1))
+    min_step = STEP_TOLERANCE * (highs - lows)
+    iterations = np.zeros(n_starts, dtype=np.int64)
+    evaluations = n_starts
+    directions = np.concatenate([np.eye(n_keys), -np.eye(n_keys)])
+
+    active = np.ones(n_starts, dtype=bool)
+    for iteration in range(max_iterations):
+        rows = np.flatnonzero(active)
+        if rows.size == 0:
+            break
+        if progress is not None:
+            progress(iteration, max_iterations)
+        # כל הצעדים (+/- בכל משתנה) של כל נקודות ההתחלה הפעילות - הערכה אחת של המודל
+        candidates = np.clip(current[rows, None, :] + directions[None, :, :] * step[rows, None, :], lows, highs)
+        candidate_values, candidate_violation = evaluate_points(
+            base_row, keys, candidates.reshape(-1, n_keys), objective, constraints)
+        evaluations += candidate_values.size
+        candidate_values = candidate_values.reshape(rows.size, -1)
+        candidate_violation = candidate_violation.reshape(rows.size, -1)
+
+        # המועמד הטוב ביותר לכל נקודה: הפרה מינימלית, ובתוכה ערך מקסימלי
+        best = np.argmin(np.where(candidate_violation == candidate_violation.min(axis=1, keepdims=True),
+                                  -candidate_values, np.inf), axis=1)
+        best_values = candidate_values[np.arange(rows.size), best]
+        best_violation = candidate_violation[np.arange(rows.size), best]
+        improved = _better(best_values, best_violation, values[rows], violation[rows])
+
+        moved = rows[improved]
+        current[moved] = candidates[improved, best[improved]]
+        values[moved], violation[moved] = best_values[improved], best_violation[improved]
+        stalled = rows[~improved]
+        step[stalled] *= 0.5
+        iterations[rows] += 1
+        active[stalled] = (step[stalled] >= min_step).any(axis=1)
+
+    status = np.where(active, STATUS_MAX_ITERATIONS, STATUS_CONVERGED)
+    return current, values, violation, status, iterations, evaluations
+
+
+# פונקציה למציאת הפרמטרים שממקסמים מדד תחת אילוצים
+@instrumented('optimizer.optimize')
+def optimize(base_params, objective='רווח לפני מס', params=DECISION_PARAMS, bounds=None, constraints=(),
+             n_starts=DEFAULT_STARTS, seed=0, max_iterations=MAX_ITERATIONS, n_workers=1, progress=None):
+    """
+    ממקסם את objective על משתני ההחלטה, בתוך הטווחים ובכפוף לאילוצים.
+
+    החיפוש הוא חיפוש דפוס (pattern search) ללא נגזרות מכמה נקודות התחלה: נקודת
+    הבסיס ונקודות סובול בתוך הטווחים. בכל איטרציה כל הצעדים האפשריים של כל
+    נקודות ההתחלה מוערכים בקריאה אחת למנוע הווקטורי. אילוצים מטופלים בכלל
+    ההעדפה - נקודה חוקית עדיפה על כל נקודה לא חוקית, ובין נקודות לא חוקיות
+    עדיפה זו עם ההפרה הקטנה יותר.
+
+    Args:
+        base_params (dict): פרמטרי הבסיס. פרמטרים שאינם משתני החלטה קבועים.
+        objective (str): המדד למקסום (מתוך OBJECTIVES או RESULT_KEYS).
+        params (sequence): משתני ההחלטה.
+        bounds (dict): טווחים, פרמטר -> (מינימום, מקסימום). ברירת מחדל +/- 30% סביב הבסיס
+            (ראו decision_bounds). פרמטר עם טווח שאינו ב-params מתווסף למשתני ההחלטה.
+        constraints (sequence): שלשות (צד שמאל, אופרטור, ערך), למשל:
+            ('נקודת איזון (מספר כרטיסים ליום)', '<=', 250) - אילוץ על תוצאה או פרמטר;
+            ({'משכורת מנהלים (סה"כ)': 12, 'משכורת צוות (סה"כ)': 12}, '<=', 3e6) - אילוץ ליניארי;
+            (lambda columns, results: ..., '>=', 0) - אילוץ כללי על עמודות הפרמטרים והתוצאות.
+        n_starts (int): מספר נקודות ההתחלה.
+        seed (int): זרע להזזת נקודות סובול.
+        max_iterations (int): מספר האיטרציות המקסימלי לכל נקודת התחלה.
+        n_workers (int): מספר תהליכים לחלוקת נקודות ההתחלה. None - מספר הליבות.
+        progress (callable): נקרא בכל איטרציה - progress(איטרציה, max_iterations). בהרצה
+            בתהליך אחד בלבד.
+
+    Returns:
+        dict: 'params' (הפרמטרים הטובים ביותר), 'results' (calculate_results עליהם),
+            'value', 'violation', 'feasible', 'status', 'evaluations' ו-'starts' - DataFrame
+            עם התוצאה של כל נקודת התחלה, מהטובה לגרועה.
+    """
+
+    if objective not in OBJECTIVES and objective not in RESULT_KEYS:
+        raise ValueError(f"Unknown objective: {objective!r}")
+    ranges = decision_bounds(base_params, params, bounds)
+    keys = list(ranges)
+    lows = np.array([ranges[key][0] for key in keys])
+    highs = np.array([ranges[key][1] for key in keys])
+    base_row = params_to_matrix([base_params])[0]
+
+    # נקודת הבסיס (בתוך הטווחים) ונקודות סובול מוזזות
+    n_starts = max(1, int(n_starts))
+    shift = np.random.default_rng(seed).integers(0, 1 << 32, size=len(keys), dtype=np.uint64)
+    points = sobol_points(np.arange(n_starts - 1), sobol_directions(len(keys)), shift)
+    starts = np.vstack([np.clip(base_row[[PARAM_INDEX[key] for key in keys]], lows, highs),
+                        lows + points * (highs - lows)])
+
+    n_workers = n_workers or os.cpu_count() or 1
+    groups = [group for group in np.array_split(starts, min(n_workers, n_starts)) if len(group)]
+    jobs = [(base_row, keys, lows, highs, group, objective, tuple(constraints), max_iterations) for group in groups]
+    if len(jobs) == 1:
+        partials = [_pattern_search(*jobs[0], progress=progress)]
+    else:
+        with process_pool(len(jobs)) as executor:
+            partials = list(executor.map(_pattern_search, *zip(*jobs)))
+
+    current, values, violation, status, iterations = (np.concatenate([partial[index] for partial in partials])
+                                                      for index in range(5))
+    evaluations = sum(partial[5] for partial in partials)
+    for index, key in enumerate(keys):
+        if key in INTEGER_PARAMS:
+            current[:, index] = np.round(current[:, index])
+
+    import pandas as pd
+
+    starts_table = pd.DataFrame(current, columns=keys)
+    starts_table[objective] = values
+    starts_table['הפרת אילוצים'] = violation
+    starts_table['סטטוס'] = status
+    starts_table['איטרציות'] = iterations
+    order = np.lexsort((-values, violation))
+    starts_table = starts_table.iloc[order].reset_index(drop=True)
+
+    best = order[0]
+    best_params = dict(base_params)
+    best_params.update(zip(keys, current[best].tolist()))
+    return {
+        'params': best_params,
+        'results': calculate_results(best_params),
+        'value': float(values[best]),
+        'violation': float(violation[best]),
+        'feasible': bool(violation[best] == 0),
+        'status': str(status[best]),
+        'evaluations': int(evaluations),
+        'starts': starts_table,
+    }
+
+
+# חזית פארטו (מקסימום ערך צפוי, מינימום סיכון) מתוך טבלת מועמדים
+def pareto_mask(expected, risk):
+    order = np.lexsort((-expected, risk))
+    mask = np.zeros(len(expected), dtype=bool)
+    best = -np.inf
+    for index in order:
+        if expected[index] > best:
+            mask[index] = True
+            best = expected[index]
+    return mask
+
+
+# פונקציה לחישוב חזית פארטו של רווח מול סיכון
+@instrumented('optimizer.pareto_front')
+def pareto_front(base_params, distributions, objective='רווח לפני מס', params=DECISION_PARAMS, bounds=None,
+                 constraints=(), n_candidates=2048, n_draws=256, seed=0, chunk_size=256, progress=None):
+    """
+    מעריך מועמדים רבים (נקודות סובול בטווחי ההחלטה) תחת אי-ודאות, ומחזיר את
+    החזית שבה אי אפשר להעלות את הערך הצפוי בלי להעלות את הסיכון.
+
+    כל המועמדים מוערכים על אותן הגרלות (common random numbers), כך שההבדלים
+    ביניהם אינם רעש הגרלה. הסיכון הוא סטיית התקן של המדד על פני ההגרלות.
+
+    Args:
+        base_params (dict): פרמטרי הבסיס.
+        distributions (dict): פרמטר -> הגדרת התפלגות (ראו monte_carlo.sample_distribution).
+            פרמטרים אקראיים אינם יכולים להיות גם משתני החלטה.
+        objective, params, bounds, constraints: כמו ב-optimize. האילוצים נבדקים
+            בערכי הבסיס של הפרמטרים האקראיים.
+        n_candidates (int): מספר המועמדים.
+        n_draws (int): מספר ההגרלות לכל מועמד.
+        seed (int): זרע להגרלות ולהזזת נקודות סובול.
+        chunk_size (int): מספר המועמדים שמוערכים בבת אחת (n_draws שורות לכל אחד).
+        progress (callable): נקרא אחרי כל מקטע - progress(מועמדים שהוערכו, n_candidates).
+
+    Returns:
+        dict: 'candidates' - DataFrame עם משתני ההחלטה, mean, std, P5, probability_loss,
+            feasible ו-pareto לכל מועמד; 'front' - המועמדים החוקיים שעל החזית, לפי הסיכון.
+    """
+
+    ranges = decision_bounds(base_params, params, bounds)
+    keys = list(ranges)
+    overlap = [key for key in distributions if key in ranges]
+    if overlap:
+        raise ValueError(f"Random parameters cannot also be decision parameters: {overlap}")
+    lows = np.array([ranges[key][0] for key in keys])
+    highs = np.array([ranges[key][1] for key in keys])
+    base_row = params_to_matrix([base_params])[0]
+
+    rng = np.random.default_rng(seed)
+    shift = rng.integers(0, 1 << 32, size=len(keys), dtype=np.uint64)
+    candidates = lows + sobol_points(np.arange(n_candidates), sobol_directions(len(keys)), shift) * (highs - lows)
+    draws = {key: sample_distribution(spec, rng, n_draws) for key, spec in distributions.items()}
+
+    _, violation = evaluate_points(base_row, keys, candidates, objective, constraints)
+    draw_row = np.tile(base_row, (n_draws, 1))
+    for key, values in draws.items():
+        draw_row[:, PARAM_INDEX[key]] = values
+
+    expected, risk, p5, probability_loss = (np.empty(n_candidates) for _ in range(4))
+    for start in range(0, n_candidates, chunk_size):
+        stop = min(start + chunk_size, n_candidates)
+        matrix = np.tile(draw_row, (stop - start, 1))
+        for index, key in enumerate(keys):
+            values = np.repeat(candidates[start:stop, index], n_draws)
+            matrix[:, PARAM_INDEX[key]] = np.round(values) if key in INTEGER_PARAMS else values
+        results = calculate_results_batch(matrix)
+        if objective == IRR_KEY:
+            values = calculate_irr_arrays(results, matrix[:, PARAM_INDEX['אורך מימון (שנים)']])
+        else:
+            values = results[objective]
+        values = values.reshape(stop - start, n_draws)
+        expected[start:stop] = np.nanmean(values, axis=1)
+        risk[start:stop] = np.nanstd(values, axis=1)
+        p5[start:stop] = np.nanpercentile(values, 5, axis=1)
+        probability_loss[start:stop] = (values < 0).mean(axis=1)
+        if progress is not None:
+            progress(stop, n_candidates)
+
+    for index, key in enumerate(keys):
+        if key in INTEGER_PARAMS:
+            candidates[:, index] = np.round(candidates[:, index])
+
+    import pandas as pd
+
+    table = pd.DataFrame(candidates, columns=keys)
+    table['mean'], table['std'], table['P5'], table['probability_loss'] = expected, risk, p5, probability_loss
+    table['feasible'] = violation == 0
+    table['pareto'] = False
+    feasible = np.flatnonzero(table['feasible'].to_numpy() & np.isfinite(expected))
+    table.loc[feasible[pareto_mask(expected[feasible], risk[feasible])], 'pareto'] = True
+    front = table[table['pareto']].sort_values('std').reset_index(drop=True)
+    return {'candidates': table, 'front': front}
@@ -0,0 +1,135 @@
+import numpy as np
+
+from batch_engine import IRR_KEY, PARAM_INDEX, PARAM_KEYS, RESULT_KEYS, calculate_irr_arrays, calculate_results_batch
+from instrumentation import instrumented
+from irr_engine import irr
+
+# עמודות אופציונליות בטבלת הסניפים שאינן פרמטרים של המודל
+BRANCH_NAME_COLUMN = 'שם'
+OPENING_YEAR_COLUMN = 'שנת פתיחה'
+
+# תוצאות שמסתכמות בין סניפים. ROI, תקופת החזר ו-IRR מחושבים מחדש מהסכומים
+ADDITIVE_KEYS = (
+    'עלויות הקמה',
+    'הכנסות שנתיות',
+    'הוצאות משתנות',
+    'רווח גולמי',
+    'הוצאות קבועות',
+    'תשלומי הלוואה',
+    'רווח לפני מס',
+)
+
+# עמודות התזרים השנתי המאוחד
+CASH_FLOW_COLUMNS = ('סניפים פעילים', 'השקעה', 'הכנסות', 'הוצאות', 'תשלומי הלוואה', 'רווח לפני מס',
+                     'תזרים נטו', 'תזרים מצטבר')
+
+
+# פונקציה לבניית מטריצת פרמטרים לסניפים - ערכי הבסיס עם דריסות לכל סניף
+def branch_matrix(base_params, overrides):
+    """
+    Args:
+        base_params (dict): פרמטרי הבסיס המשותפים לכל הסניפים.
+        overrides (pd.DataFrame | list): שורה (או מילון) לכל סניף עם הפרמטרים ששונים
+            מהבסיס. תא ריק (NaN) או מפתח חסר - ערך הבסיס. עמודות שאינן פרמטרים מתעלמות.
+
+    Returns:
+        np.ndarray: מטריצה בגודל (N, len(PARAM_KEYS)).
+    """
+
+    import pandas as pd
+
+    frame = overrides if isinstance(overrides, pd.DataFrame) else pd.DataFrame(list(overrides))
+    matrix = np.empty((len(frame), len(PARAM_KEYS)))
+    for index, key in enumerate(PARAM_KEYS):
+        if key in frame.columns:
+            column = pd.to_numeric(frame[key], errors='raise').to_numpy(dtype=np.float64)
+            matrix[:, index] = np.where(np.isnan(column), base_params[key], column)
+        else:
+            matrix[:, index] = base_params[key]
+    return matrix
+
+
+# סכום משקלים לכל שנה בטווח [start, stop) של כל סניף, בזמן ליניארי (מערך הפרשים)
+def _spread_over_years(weights, start, stop, horizon):
+    changes = np.bincount(start, weights=weights, minlength=horizon + 1)
+    changes -= np.bincount(stop, weights=weights, minlength=horizon + 1)
+    return np.cumsum(changes)[:horizon]
+
+
+# פונקציה לחישוב תוצאות מאוחדות לרשת סניפים
+@instrumented('portfolio.evaluate')
+def evaluate_portfolio(base_params, branches, opening_years=None):
+    """
+    מחשב את כל הסניפים במעבר וקטורי אחד ומאחד הכנסות, הוצאות, הלוואות ותזרים.
+
+    כמו במודל של סניף בודד, כל סניף משקיע את עלויות ההקמה בשנת הפתיחה ומניב את
+    הרווח לפני מס שלו בכל אחת משנות המימון שאחריה. התזרים המאוחד הוא סכום
+    התזרימים האלה, וה-IRR של הרשת מחושב עליו. זמן הריצה ליניארי במספר הסניפים.
+
+    Args:
+        base_params (dict): פרמטרי הבסיס המשותפים.
+        branches (pd.DataFrame | list): דריסות הפרמטרים לכל סניף (ראו branch_matrix).
+            עמודות BRANCH_NAME_COLUMN ו-OPENING_YEAR_COLUMN, אם קיימות, נותנות שם
+            ושנת פתיחה לכל סניף.
+        opening_years (sequence): שנת הפתיחה של כל סניף (0 - מיידית). גובר על
+            OPENING_YEAR_COLUMN.
+
+    Returns:
+        dict: 'סניפים' - DataFrame עם התוצאות של כל סניף; 'מאוחד' - מילון של
+            התוצאות המאוחדות; 'תזרים שנתי' - DataFrame עם שורה לכל שנה.
+    """
+
+    import pandas as pd
+
+    frame = branches if isinstance(branches, pd.DataFrame) else pd.DataFrame(list(branches))
+    matrix = branch_matrix(base_params, frame)
+    results = calculate_results_batch(matrix)
+    years = np.trunc(matrix[:, PARAM_INDEX['אורך מימון (שנים)']])
+    branch_irr = calculate_irr_arrays(results, years)
+
+    if opening_years is None:
+        opening_years = frame[OPENING_YEAR_COLUMN] if OPENING_YEAR_COLUMN in frame.columns else 0
+    opening_years = np.broadcast_to(np.asarray(opening_years, dtype=np.int64), (len(frame),))
+    if (opening_years < 0).any():
+        raise ValueError("Opening years must be non-negative")
+
+    table = pd.DataFrame({key: results[key] for key in RESULT_KEYS})
+    table[IRR_KEY] = branch_irr
+    table.insert(0, OPENING_YEAR_COLUMN, opening_years)
+    names = frame[BRANCH_NAME_COLUMN].to_numpy() if BRANCH_NAME_COLUMN in frame.columns else \
+        [f'סניף {index + 1}' for index in range(len(frame))]
+    table.insert(0, BRANCH_NAME_COLUMN, names)
+
+    # תזרים שנתי - השקעה בשנת הפתיחה, ופעילות בשנות המימון שאחריה
+    operating_years = np.maximum(years, 0).astype(np.int64)
+    first_year = opening_years + 1
+    last_year = first_year + operating_years
+    horizon = int(last_year.max(initial=1))
+    investment = np.bincount(opening_years, weights=results['עלויות הקמה'], minlength=horizon)
+
+    def yearly(values):
+        return _spread_over_years(np.asarray(values, dtype=np.float64), first_year, last_year, horizon)
+
+    profit = yearly(results['רווח לפני מס'])
+    cash_flow = profit - investment
+    annual = pd.DataFrame(dict(zip(CASH_FLOW_COLUMNS, (
+        yearly(np.ones(len(frame))).round().astype(np.int64),
+        investment,
+        yearly(results['הכנסות שנתיות']),
+        yearly(results['הוצאות משתנות'] + results['הוצאות קבועות']),
+        yearly(results['תשלומי הלוואה']),
+        profit,
+        cash_flow,
+        np.cumsum(cash_flow),
+    ))))
+    annual.index.name = 'שנה'
+
+    consolidated = {key: float(results[key].sum()) for key in ADDITIVE_KEYS}
+    setup_costs, profit_before_tax = consolidated['עלויות הקמה'], consolidated['רווח לפני מס']
+    consolidated['החזר על ההשקעה (ROI)'] = profit_before_tax / setup_costs * 100 if setup_costs != 0 else 0
+    consolidated['תקופת החזר השקעה (שנים)'] = setup_costs / profit_before_tax if profit_before_tax != 0 else 0
+    solution = irr(cash_flow)
+    consolidated[IRR_KEY] = float(solution['rate'][0]) * 100 if solution['converged'][0] else None
+    consolidated['מספר סניפים'] = len(frame)
+
+    return {'סניפים': table, 'מאוחד': consolidated, 'תזרים שנתי': annual}
@@ -0,0 +1,309 @@
+import copy
+import functools
+import hashlib
+import json
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from instrumentation import record_cache_lookup
+
+# גודל ברירת המחדל של המטמון בזיכרון (מספר רשומות)
+DEFAULT_MAXSIZE = 1024
+
+# תיקייה אופציונלית לאחסון משותף בין סשנים ותהליכים. הקבצים בה נטענים ב-pickle, ולכן
+# היא חייבת להיות של המשתמש שמריץ את האפליקציה ונגישה רק לו (ראו _secure_dir)
+CACHE_DIR_ENV = 'GYMBOREE_CACHE_DIR'
+
+# גבולות האחסון המשותף: גודל כולל (בתים) וזמן מאז השימוש האחרון (שניות)
+DEFAULT_SHARED_MAX_BYTES = 1024 ** 3
+DEFAULT_SHARED_TTL = 7 * 24 * 3600
+
+# ניקוי האחסון המשותף רץ אחרי כתיבה של חלק זה מהגודל המקסימלי, ומוריד את הגודל לחלק זה ממנו
+SHARED_PRUNE_INTERVAL = 0.1
+SHARED_PRUNE_TARGET = 0.8
+
+
+# גרסת הקוד - hash של קובצי המקור של האפליקציה. הגרסה היא חלק מכל מפתח ב-memoize, כך
+# שתוצאות שחושבו בגרסה קודמת של המודל (למשל באחסון המשותף) לא מוגשות אחרי עדכון
+def _code_version():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                digest.update(name.encode('utf-8'))
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+CODE_VERSION = _code_version()
+
+
+# יצירת תיקייה במצב 0700 ובדיקה שהיא תיקייה רגילה של המשתמש הנוכחי שאחרים לא יכולים לגשת אליה
+def _secure_dir(path):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Cache directory {path!r} is not a directory")
+    if hasattr(os, 'getuid') and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        raise PermissionError(f"Cache directory {path!r} must be owned by the current user with mode 0700")
+    return path
+
+
+# המרת ערכים לייצוג JSON קנוני
+def _canonical_default(value):
+    if isinstance(value, np.ndarray):
+        return [_canonical_value(item) for item in value.tolist()]
+    if isinstance(value, np.generic):
+        return _canonical_value(value.item())
+    if isinstance(value, (set, frozenset)):
+        return sorted(_canonical_value(item) for item in value)
+    raise TypeError(f"Cannot hash value of type {type(value).__name__}")
+
+
+def _canonical_value(value):
+    # 50 ו-50.0 נותנים אותה תוצאה במודל, ולכן גם אותו מפתח
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, dict):
+        return {str(key): _canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(item) for item in value]
+    return value
+
+
+# פונקציה לחישוב מפתח תוכן (hash קנוני) לכל צירוף של ערכים
+def canonical_key(*parts):
+    """
+    מחשב hash קנוני (SHA-256) לצירוף ערכים - מילוני פרמטרים, שמות פרמטרים וטווחים.
+
+    סדר המפתחות במילון אינו משפיע, ומספרים שלמים ועשרוניים שווים מקבלים אותו מפתח.
+
+    Returns:
+        str: מחרוזת hex של ה-hash.
+    """
+
+    payload = json.dumps(_canonical_value(list(parts)), sort_keys=True, ensure_ascii=False,
+                         separators=(',', ':'), default=_canonical_default)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# מטמון LRU חסום עם מונים ואחסון משותף אופציונלי בדיסק
+class ResultCache:
+    """
+    Args:
+        maxsize (int): מספר הרשומות המרבי בזיכרון.
+        shared_dir (str): תיקייה לאחסון משותף בין תהליכים (נוצרת במצב 0700). None - בלי אחסון משותף.
+        shared_max_bytes (int): הגודל הכולל המרבי של האחסון המשותף.
+        shared_ttl (float): קובץ שלא נקרא או נכתב זמן רב מזה (שניות) נמחק ואינו מוגש.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, shared_dir=None, shared_max_bytes=DEFAULT_SHARED_MAX_BYTES,
+                 shared_ttl=DEFAULT_SHARED_TTL):
+        self.maxsize = maxsize
+        self.shared_dir = shared_dir
+        self.shared_max_bytes = shared_max_bytes
+        self.shared_ttl = shared_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._written_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        if shared_dir:
+            _secure_dir(shared_dir)
+            self.prune_shared()
+
+    def _shared_path(self, key):
+        return os.path.join(self.shared_dir, key[:2], f"{key}.pkl")
+
+    # קריאת רשומה מהאחסון המשותף. קובץ שעבר זמנו נמחק; קובץ שנקרא מסומן כמשומש (לניקוי לפי LRU)
+    def _read_shared(self, key):
+        path = self._shared_path(key)
+        with open(path, 'rb') as f:
+            if time.time() - os.fstat(f.fileno()).st_mtime > self.shared_ttl:
+                _remove(path)
+                raise FileNotFoundError(path)
+            value = pickle.load(f)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.shared_dir:
+            try:
+                value = self._read_shared(key)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                    self._store(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+        if self.shared_dir:
+            path = self._shared_path(key)
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            # כתיבה אטומית - קובץ זמני (במצב 0600) ואז החלפה, כדי שתהליכים אחרים לא יקראו קובץ חלקי
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    size = f.tell()
+                os.replace(temp_path, path)
+            except OSError:
+                _remove(temp_path)
+                return
+            with self._lock:
+                self._written_bytes += size
+                prune = self._written_bytes >= self.shared_max_bytes * SHARED_PRUNE_INTERVAL
+                if prune:
+                    self._written_bytes = 0
+            if prune:
+                self.prune_shared()
+
+    def prune_shared(self):
+        """
+        מוחק מהאחסון המשותף קבצים שעבר זמנם (shared_ttl), ואם הגודל הכולל עדיין מעל
+        shared_max_bytes - את הקבצים שהשימוש האחרון בהם הוא הישן ביותר, עד
+        SHARED_PRUNE_TARGET מהגודל המרבי. רץ גם כשתהליכים אחרים כותבים וקוראים.
+        """
+
+        if not self.shared_dir:
+            return
+        now = time.time()
+        files = []
+        with os.scandir(self.shared_dir) as buckets:
+            bucket_paths = [entry.path for entry in buckets if entry.is_dir(follow_symlinks=False)]
+        for bucket in bucket_paths:
+            try:
+                with os.scandir(bucket) as entries:
+                    for entry in entries:
+                        try:
+                            info = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if now - info.st_mtime > self.shared_ttl:
+                            _remove(entry.path)
+                        elif entry.name.endswith('.pkl'):
+                            files.append((info.st_mtime, info.st_size, entry.path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in files)
+        if total <= self.shared_max_bytes:
+            return
+        for _, size, path in sorted(files):
+            if total <= self.shared_max_bytes * SHARED_PRUNE_TARGET:
+                break
+            _remove(path)
+            total -= size
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.shared_hits = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# מחיקת קובץ שאולי כבר נמחק (למשל על ידי תהליך אחר)
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# תת-תיקייה של האחסון המשותף מתוך CACHE_DIR_ENV, או None אם לא הוגדרה תיקייה. אין
+# ברירת מחדל (למשל תיקייה זמנית), כי התיקייה חייבת להיות של האפליקציה בלבד
+def shared_cache_dir(*parts):
+    base = os.environ.get(CACHE_DIR_ENV)
+    if not base:
+        return None
+    return os.path.join(_secure_dir(base), *parts)
+
+
+# המטמון המשותף לכל הסשנים בתהליך (ואם הוגדרה תיקייה - גם בין תהליכים)
+result_cache = ResultCache(shared_dir=shared_cache_dir('results'))
+
+_MISSING = object()
+
+
+# דקורטור לממואיזציה לפי תוכן הארגומנטים
+def memoize(name, cache=None, copy_result=True):
+    """
+    עוטף פונקציה טהורה כך שתוצאותיה נשמרות במטמון לפי hash של הארגומנטים.
+
+    Args:
+        name (str): שם יציב לפונקציה (חלק מהמפתח, כך שהמטמון שורד הרצה מחדש של הסקריפט).
+        cache (ResultCache): המטמון לשימוש. ברירת מחדל - result_cache.
+        copy_result (bool): האם להחזיר עותק של התוצאה, כדי שקוראים לא ישנו את המטמון.
+            False מתאים לאובייקטים גדולים שהקוראים רק מציגים (למשל גרפים).
+
+    Returns:
+        callable: הדקורטור.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target = cache if cache is not None else result_cache
+            key = canonical_key(CODE_VERSION, name, args, kwargs)
+            value = target.get(key, _MISSING)
+            record_cache_lookup(name, value is not _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                target.set(key, value)
+            return copy.deepcopy(value) if copy_result else value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,307 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_engine import IRR_KEY, PARAM_KEYS, RESULT_KEYS, calculate_irr_arrays, calculate_results_batch
+from model_core import PARAM_FIELDS, calculate_results
+
+# קובץ ברירת המחדל של מאגר התרחישים (אפשר לשנות דרך משתנה סביבה)
+STORE_PATH_ENV = 'GYMBOREE_SCENARIO_DB'
+DEFAULT_STORE_PATH = 'scenarios.db'
+
+# עמודת SQL לכל תוצאה סקלרית של המודל
+RESULT_FIELDS = (
+    ('setup_costs', 'עלויות הקמה'),
+    ('depreciation_percentage', 'פחת שנתי (%)'),
+    ('annual_income', 'הכנסות שנתיות'),
+    ('variable_expenses', 'הוצאות משתנות'),
+    ('gross_profit', 'רווח גולמי'),
+    ('fixed_expenses', 'הוצאות קבועות'),
+    ('loan_payments', 'תשלומי הלוואה'),
+    ('profit_before_tax', 'רווח לפני מס'),
+    ('breakeven_yearly_tickets', 'נקודת איזון (מספר כרטיסים לשנה)'),
+    ('breakeven_daily_tickets', 'נקודת איזון (מספר כרטיסים ליום)'),
+    ('roi', 'החזר על ההשקעה (ROI)'),
+    ('payback_period', 'תקופת החזר השקעה (שנים)'),
+    ('irr', IRR_KEY),
+)
+assert {key for _, key in RESULT_FIELDS} == set(RESULT_KEYS) | {IRR_KEY}, "RESULT_FIELDS must cover RESULT_KEYS and IRR"
+
+# המדדים שעליהם יש אינדקס - שאילתות "הטובים ביותר לפי..." לא סורקות את כל הטבלה
+INDEXED_FIELDS = ('profit_before_tax', 'roi', 'payback_period', 'irr')
+
+# עמודות המטא-דאטה של כל תרחיש, לפני עמודות הפרמטרים והתוצאות
+META_COLUMNS = (('id', 'מזהה'), ('name', 'שם'), ('branch', 'סניף'), ('created_at', 'נוצר'))
+
+COLUMN_BY_KEY = {key: field for field, key in PARAM_FIELDS + RESULT_FIELDS}
+KEY_BY_COLUMN = {field: key for field, key in META_COLUMNS + PARAM_FIELDS + RESULT_FIELDS}
+
+FILTER_OPERATORS = ('<', '<=', '>', '>=', '=', '!=')
+
+_PARAM_COLUMNS = tuple(field for field, _ in PARAM_FIELDS)
+_RESULT_COLUMNS = tuple(field for field, _ in RESULT_FIELDS)
+_INSERT_COLUMNS = ('name', 'branch', 'created_at', 'params_hash') + _PARAM_COLUMNS + _RESULT_COLUMNS
+_INSERT_SQL = (f"INSERT INTO scenarios ({', '.join(_INSERT_COLUMNS)}) "
+               f"VALUES ({', '.join('?' * len(_INSERT_COLUMNS))})")
+
+
+def default_store_path():
+    return os.environ.get(STORE_PATH_ENV, DEFAULT_STORE_PATH)
+
+
+def _column(key):
+    if key in COLUMN_BY_KEY:
+        return COLUMN_BY_KEY[key]
+    if key in KEY_BY_COLUMN:
+        return key
+    raise ValueError(f"Unknown scenario field: {key!r}")
+
+
+# NaN/inf נשמרים כ-NULL (SQLite ממיר NaN ל-NULL בעצמו), וכך השאילתות עקביות
+def _finite(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isfinite(values), values, np.nan)
+
+
+# מפתח תוכן לפרמטרי תרחיש - hash של ערכי float64 בסדר PARAM_KEYS, כך ש-50 ו-50.0 זהים
+def params_hash(values):
+    return hashlib.sha256(np.asarray(values, dtype=np.float64).tobytes()).hexdigest()
+
+
+# מאגר תרחישים מקומי בקובץ SQLite
+class ScenarioStore:
+    """
+    כל תרחיש נשמר כשורה אחת: מטא-דאטה, עמודה לכל פרמטר (שמות השדות של
+    ParamRecord) ועמודה לכל תוצאה סקלרית. החיבור משותף בין threads ומוגן במנעול.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection as connection:
+            if self.path != ':memory:':
+                # WAL - קוראים לא נחסמים בזמן כתיבה; synchronous=NORMAL מספיק לעמידות ב-WAL
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS scenarios (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    branch TEXT,
+                    created_at REAL NOT NULL,
+                    params_hash TEXT NOT NULL,
+                    {', '.join(f'{column} REAL' for column in _PARAM_COLUMNS + _RESULT_COLUMNS)}
+                )""")
+            connection.execute('CREATE INDEX IF NOT EXISTS idx_scenarios_branch ON scenarios (branch)')
+            connection.execute('CREATE INDEX IF NOT EXISTS idx_scenarios_params_hash ON scenarios (params_hash)')
+            for column in INDEXED_FIELDS:
+                connection.execute(f'CREATE INDEX IF NOT EXISTS idx_scenarios_{column} ON scenarios ({column})')
+
+    # שמירת תרחיש בודד
+    def save(self, params, results=None, name=None, branch=None):
+        """
+        Args:
+            params (dict): מילון פרמטרים מלא.
+            results (dict): תוצאות calculate_results. None - מחושבות כאן.
+
+        Returns:
+            int: מזהה התרחיש.
+        """
+
+        results = results if results is not None else calculate_results(params)
+        row = self._row(params, results, name, branch, time.time())
+        with self._lock, self._connection as connection:
+            return connection.execute(_INSERT_SQL, row).lastrowid
+
+    # שמירת הרבה תרחישים בטרנזקציה אחת
+    def save_batch(self, matrix, results=None, names=None, branch=None):
+        """
+        Args:
+            matrix (np.ndarray): מטריצת תרחישים (N, len(PARAM_KEYS)).
+            results (Mapping): מערך לכל מפתח ב-RESULT_KEYS ול-IRR (למשל תוצאת
+                calculate_results_batch, או DataFrame של batch_runner). None - מחושבות כאן.
+            names (sequence): שם לכל תרחיש (אופציונלי).
+
+        Returns:
+            int: מספר התרחישים שנשמרו.
+        """
+
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if results is None:
+            results = calculate_results_batch(matrix)
+            results[IRR_KEY] = calculate_irr_arrays(results, matrix[:, PARAM_KEYS.index('אורך מימון (שנים)')])
+        n = len(matrix)
+        columns = [np.broadcast_to(np.asarray(results[key], dtype=np.float64), (n,)) for _, key in RESULT_FIELDS]
+        values = _finite(np.column_stack([matrix] + columns))
+        created_at = time.time()
+        names = names if names is not None else [None] * n
+        rows = ((name, branch, created_at, params_hash(params), *row)
+                for name, params, row in zip(names, matrix, values.tolist()))
+        with self._lock, self._connection as connection:
+            connection.executemany(_INSERT_SQL, rows)
+        return n
+
+    def _row(self, params, results, name, branch, created_at):
+        values = [params[key] for key in PARAM_KEYS]
+        outputs = [np.nan if results[key] is None else results[key] for _, key in RESULT_FIELDS]
+        return (name, branch, created_at, params_hash(values)) + tuple(_finite(values + outputs).tolist())
+
+    # מזהי התרחישים השמורים עם אותם פרמטרים בדיוק
+    def find(self, params):
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id FROM scenarios WHERE params_hash = ? ORDER BY id',
+                (params_hash([params[key] for key in PARAM_KEYS]),)).fetchall()
+        return [scenario_id for scenario_id, in rows]
+
+    # שליפת תרחיש לפי מזהה
+    def get(self, scenario_id):
+        """
+        Returns:
+            dict: 'id', 'name', 'branch', 'created_at', 'params' ו-'results', או None אם לא נמצא.
+        """
+
+        with self._lock:
+            cursor = self._connection.execute('SELECT * FROM scenarios WHERE id = ?', (int(scenario_id),))
+            row = cursor.fetchone()
+            columns = [description[0] for description in cursor.description]
+        if row is None:
+            return None
+        record = dict(zip(columns, row))
+        return {
+            'id': record['id'],
+            'name': record['name'],
+            'branch': record['branch'],
+            'created_at': record['created_at'],
+            'params': {key: record[field] for field, key in PARAM_FIELDS},
+            'results': {key: record[field] for field, key in RESULT_FIELDS},
+        }
+
+    # שאילתה עם סינון ומיון
+    def query(self, filters=(), order_by='החזר על ההשקעה (ROI)', descending=True, limit=100, branch=None,
+              columns=None):
+        """
+        לדוגמה - 100 התרחישים עם ה-ROI הגבוה ביותר ושכר דירה מתחת ל-120,000:
+            store.query([('שכר דירה חודשי', '<', 120_000)], order_by='החזר על ההשקעה (ROI)', limit=100)
+
+        Args:
+            filters (iterable): שלשות (שדה, אופרטור, ערך). השדה הוא מפתח פרמטר/תוצאה
+                בעברית או שם העמודה. האופרטורים - FILTER_OPERATORS.
+            order_by (str): שדה למיון. None - לפי סדר ההכנסה.
+            limit (int): מספר השורות המקסימלי. None - ללא הגבלה.
+            branch (str): סינון לפי סניף.
+            columns (sequence): שדות להחזרה (מלבד המטא-דאטה). None - כל השדות.
+
+        Returns:
+            pd.DataFrame: שורה לכל תרחיש, עם שמות עמודות בעברית.
+        """
+
+        conditions, arguments = [], []
+        for key, operator, value in filters:
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Unknown operator: {operator!r} (expected one of {FILTER_OPERATORS})")
+            conditions.append(f'{_column(key)} {operator} ?')
+            arguments.append(value)
+        if branch is not None:
+            conditions.append('branch = ?')
+            arguments.append(branch)
+
+        selected = [field for field, _ in META_COLUMNS]
+        selected += [_column(key) for key in columns] if columns is not None else \
+            list(_PARAM_COLUMNS + _RESULT_COLUMNS)
+        sql = f"SELECT {', '.join(selected)} FROM scenarios"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        if order_by is not None:
+            # NULL (למשל IRR לא מוגדר) תמיד בסוף. NULLS LAST עדיין משתמש באינדקס של העמודה
+            sql += f" ORDER BY {_column(order_by)} {'DESC' if descending else 'ASC'} NULLS LAST"
+        if limit is not None:
+            sql += ' LIMIT ?'
+            arguments.append(int(limit))
+
+        with self._lock:
+            frame = pd.read_sql_query(sql, self._connection, params=arguments)
+        return frame.rename(columns=KEY_BY_COLUMN)
+
+    # השוואת תרחישים - מדד בכל שורה, תרחיש בכל עמודה, והפרש מהתרחיש הראשון
+    def compare(self, scenario_ids, keys=None):
+        """
+        Args:
+            scenario_ids (sequence): מזהי התרחישים. הראשון הוא הבסיס להפרשים.
+            keys (sequence): שדות להשוואה. None - כל התוצאות ופרמטרים ששונים בין התרחישים.
+
+        Returns:
+            pd.DataFrame: עמודה לכל תרחיש ועמודת הפרש לכל תרחיש מלבד הראשון.
+        """
+
+        scenario_ids = [int(scenario_id) for scenario_id in scenario_ids]
+        if not scenario_ids:
+            return pd.DataFrame()
+        placeholders = ', '.join('?' * len(scenario_ids))
+        with self._lock:
+            frame = pd.read_sql_query(f'SELECT * FROM scenarios WHERE id IN ({placeholders})', self._connection,
+                                      params=scenario_ids)
+        frame = frame.set_index('id').reindex(scenario_ids)
+
+        if keys is None:
+            params = frame[list(_PARAM_COLUMNS)]
+            changed = [column for column in _PARAM_COLUMNS if params[column].nunique(dropna=False) > 1]
+            fields = list(_RESULT_COLUMNS) + changed
+        else:
+            fields = [_column(key) for key in keys]
+
+        labels = [name if isinstance(name, str) and name else f'#{scenario_id}'
+                  for scenario_id, name in zip(scenario_ids, frame['name'])]
+        table = frame[fields].T
+        table.columns = labels
+        table.index = [KEY_BY_COLUMN[field] for field in fields]
+        for label in labels[1:]:
+            table[f'הפרש {label}'] = table[label] - table[labels[0]]
+        return table
+
+    def delete(self, scenario_ids):
+        scenario_ids = [(int(scenario_id),) for scenario_id in scenario_ids]
+        with self._lock, self._connection as connection:
+            connection.executemany('DELETE FROM scenarios WHERE id = ?', scenario_ids)
+
+    def branches(self):
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT DISTINCT branch FROM scenarios WHERE branch IS NOT NULL ORDER BY branch').fetchall()
+        return [branch for branch, in rows]
+
+    # התרחיש האחרון שנשמר לכל סניף - בסיס לחישוב רשת הסניפים (portfolio)
+    def latest_by_branch(self):
+        """
+        Returns:
+            pd.DataFrame: שורה לכל סניף עם עמודת 'שם' (שם הסניף) ועמודה לכל פרמטר.
+        """
+
+        columns = ', '.join(('branch',) + _PARAM_COLUMNS)
+        with self._lock:
+            frame = pd.read_sql_query(
+                f'SELECT {columns} FROM scenarios WHERE id IN '
+                '(SELECT MAX(id) FROM scenarios WHERE branch IS NOT NULL GROUP BY branch) ORDER BY branch',
+                self._connection)
+        return frame.rename(columns={**KEY_BY_COLUMN, 'branch': 'שם'})
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM scenarios').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
@@ -0,0 +1,198 @@
+import numpy as np
+
+from batch_engine import (MONTHLY_FIXED_KEYS, PARAM_INDEX, PARAM_KEYS, SETUP_COST_KEYS, calculate_results_batch,
+                          params_to_matrix)
+
+# המדדים שעבורם מחושבות נגזרות חלקיות
+JACOBIAN_OUTPUTS = (
+    'רווח לפני מס',
+    'החזר על ההשקעה (ROI)',
+    'נקודת איזון (מספר כרטיסים לשנה)',
+    'נקודת איזון (מספר כרטיסים ליום)',
+    'תקופת החזר השקעה (שנים)',
+)
+
+ANNUAL_FIXED_KEYS = ('ארנונה שנתית', 'הוצאות נוספות שנתיות', 'הון חוזר לתפעול ראשוני')
+
+# ימי פעילות ושיעורי עלות משתנה - כמו ב-model_core
+REGULAR_DAYS = 191
+HOLIDAY_DAYS = 100
+OPERATING_DAYS = 300
+
+
+def _gradient():
+    return np.zeros(len(PARAM_KEYS))
+
+
+# פונקציה לחישוב הנגזרות החלקיות של המודל לפי כל הפרמטרים
+def calculate_jacobian(params):
+    """
+    מחשב נגזרות חלקיות מדויקות (אנליטיות) של רווח, ROI, נקודות איזון ותקופת החזר
+    לפי כל פרמטר ב-default_params, במעבר אחד.
+
+    אורך המימון נכנס למודל כמספר שלם (int), ולכן הנגזרת לפיו היא 0 בכל נקודה
+    שאינה מעבר בין שנים שלמות.
+
+    Args:
+        params (dict): מילון של פרמטרים.
+
+    Returns:
+        dict: מיפוי מדד -> מילון פרמטר -> נגזרת חלקית.
+    """
+
+    p = {key: float(params[key]) for key in PARAM_KEYS}
+    i = PARAM_INDEX
+
+    visitors_regular, visitors_holiday = p['מספר מבקרים ביום רגיל'], p['מספר מבקרים ביום חופשה/חג']
+    ticket_regular, ticket_holiday = p['מחיר כניסה ליום רגיל'], p['מחיר כניסה ליום חופשה/חג']
+    food_regular, food_holiday = p['רכישה ממוצעת במזון ביום רגיל'], p['רכישה ממוצעת במזון ביום חופשה/חג']
+    merch_regular = p['רכישה ממוצעת במרצ\'נדייז ביום רגיל']
+    merch_holiday = p['רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג']
+    events, event_price = p['מספר אירועים פרטיים בחודש'], p['מחיר לאירוע פרטי']
+    workshops, participants, workshop_price = p['מספר סדנאות בחודש'], p['מספר משתתפים בסדנה'], p['מחיר לסדנה']
+    depreciation_rate = p['שיעור פחת שנתי (%)'] / 100
+
+    # הכנסות (I), הוצאות משתנות (Cv) ומספר המבקרים השנתי (N)
+    income = (REGULAR_DAYS * visitors_regular * (ticket_regular + food_regular + merch_regular) +
+              HOLIDAY_DAYS * visitors_holiday * (ticket_holiday + food_holiday + merch_holiday) +
+              12 * events * event_price + 12 * workshops * participants * workshop_price)
+    variable = (REGULAR_DAYS * visitors_regular * (0.4 * food_regular + 0.5 * merch_regular) +
+                HOLIDAY_DAYS * visitors_holiday * (0.4 * food_holiday + 0.5 * merch_holiday) +
+                12 * 0.4 * events * event_price + 12 * 0.5 * workshops * participants * workshop_price)
+    total_visitors = REGULAR_DAYS * visitors_regular + HOLIDAY_DAYS * visitors_holiday
+
+    d_income, d_variable, d_visitors = _gradient(), _gradient(), _gradient()
+    day_types = (
+        (REGULAR_DAYS, visitors_regular, ticket_regular, food_regular, merch_regular,
+         ('מספר מבקרים ביום רגיל', 'מחיר כניסה ליום רגיל', 'רכישה ממוצעת במזון ביום רגיל',
+          'רכישה ממוצעת במרצ\'נדייז ביום רגיל')),
+        (HOLIDAY_DAYS, visitors_holiday, ticket_holiday, food_holiday, merch_holiday,
+         ('מספר מבקרים ביום חופשה/חג', 'מחיר כניסה ליום חופשה/חג', 'רכישה ממוצעת במזון ביום חופשה/חג',
+          'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג')),
+    )
+    for days, visitors, ticket, food, merch, (visitors_key, ticket_key, food_key, merch_key) in day_types:
+        d_income[i[visitors_key]] = days * (ticket + food + merch)
+        d_income[i[ticket_key]] = d_income[i[food_key]] = d_income[i[merch_key]] = days * visitors
+        d_variable[i[visitors_key]] = days * (0.4 * food + 0.5 * merch)
+        d_variable[i[food_key]] = days * 0.4 * visitors
+        d_variable[i[merch_key]] = days * 0.5 * visitors
+        d_visitors[i[visitors_key]] = days
+
+    for key, value, rate in (('מספר אירועים פרטיים בחודש', event_price, 0.4),
+                             ('מחיר לאירוע פרטי', events, 0.4),
+                             ('מספר סדנאות בחודש', participants * workshop_price, 0.5),
+                             ('מספר משתתפים בסדנה', workshops * workshop_price, 0.5),
+                             ('מחיר לסדנה', workshops * participants, 0.5)):
+        d_income[i[key]] = 12 * value
+        d_variable[i[key]] = 12 * rate * value
+
+    # עלויות הקמה (S) והוצאות קבועות (F)
+    setup_costs = sum(p[key] for key in SETUP_COST_KEYS)
+    d_setup = _gradient()
+    for key in SETUP_COST_KEYS:
+        d_setup[i[key]] = 1
+
+    d_fixed = d_setup * depreciation_rate
+    d_fixed[i['שיעור פחת שנתי (%)']] = setup_costs / 100
+    for key in MONTHLY_FIXED_KEYS:
+        d_fixed[i[key]] = 12
+    for key in ANNUAL_FIXED_KEYS:
+        d_fixed[i[key]] = 1
+
+    # תשלומי הלוואה (L) - ליניאריים בסכום, מדרגה באורך המימון
+    loan_months = int(p['אורך מימון (שנים)']) * 12
+    monthly_rate = p['ריבית שנתית על הלוואה (%)'] / 100 / 12
+    d_loan = _gradient()
+    if loan_months <= 0:
+        loan_factor = 0.0
+    elif monthly_rate == 0:
+        # בריבית 0: L = A, ו-dL/dr = A(n+1)/2 (הגבול של הנגזרת הכללית)
+        loan_factor = 1.0
+        d_loan[i['ריבית שנתית על הלוואה (%)']] = p['תשלומי הלוואה שנתיים'] * (loan_months + 1) / 2 / 1200
+    else:
+        discount = (1 + monthly_rate) ** (-loan_months)
+        loan_factor = monthly_rate / (1 - discount) * loan_months
+        # d/dr [r / (1 - (1+r)^-n)] = (1 - v - n r v / (1+r)) / (1 - v)^2, והריבית באחוזים שנתיים
+        d_factor = (1 - discount - loan_months * monthly_rate * discount / (1 + monthly_rate)) / (1 - discount) ** 2
+        d_loan[i['ריבית שנתית על הלוואה (%)']] = p['תשלומי הלוואה שנתיים'] * d_factor * loan_months / 1200
+    d_loan[i['תשלומי הלוואה שנתיים']] = loan_factor
+    loan = p['תשלומי הלוואה שנתיים'] * loan_factor
+
+    fixed = (sum(p[key] for key in MONTHLY_FIXED_KEYS) * 12 +
+             sum(p[key] for key in ANNUAL_FIXED_KEYS) + setup_costs * depreciation_rate)
+    profit = income - variable - fixed - loan
+    d_profit = d_income - d_variable - d_fixed - d_loan
+
+    # ROI = 100 * profit / S
+    if setup_costs != 0:
+        d_roi = 100 * (d_profit * setup_costs - profit * d_setup) / setup_costs ** 2
+    else:
+        d_roi = _gradient()
+
+    # תקופת החזר = S / profit
+    if profit != 0:
+        d_payback = (d_setup * profit - setup_costs * d_profit) / profit ** 2
+    else:
+        d_payback = _gradient()
+
+    # נקודת איזון = (Cv + F + L) / (I / N) = K * N / I
+    costs = variable + fixed + loan
+    d_costs = d_variable + d_fixed + d_loan
+    if income != 0 and total_visitors != 0:
+        d_breakeven = (d_costs * total_visitors + costs * d_visitors) / income - costs * total_visitors * d_income / income ** 2
+    else:
+        d_breakeven = _gradient()
+
+    gradients = {
+        'רווח לפני מס': d_profit,
+        'החזר על ההשקעה (ROI)': d_roi,
+        'נקודת איזון (מספר כרטיסים לשנה)': d_breakeven,
+        'נקודת איזון (מספר כרטיסים ליום)': d_breakeven / OPERATING_DAYS,
+        'תקופת החזר השקעה (שנים)': d_payback,
+    }
+    return {output: dict(zip(PARAM_KEYS, gradient.tolist())) for output, gradient in gradients.items()}
+
+
+# פונקציה לחישוב גמישויות (שינוי באחוזים במדד לכל אחוז שינוי בפרמטר)
+def calculate_elasticities(params, results, jacobian=None):
+    """
+    Args:
+        params (dict): מילון של פרמטרים.
+        results (dict): תוצאות calculate_results עבור אותם פרמטרים.
+        jacobian (dict): תוצאת calculate_jacobian, אם כבר חושבה.
+
+    Returns:
+        dict: מיפוי מדד -> מילון פרמטר -> גמישות (0 כאשר ערך המדד הוא 0).
+    """
+
+    jacobian = jacobian or calculate_jacobian(params)
+    elasticities = {}
+    for output, derivatives in jacobian.items():
+        value = results[output]
+        elasticities[output] = {
+            key: derivative * params[key] / value if value != 0 else 0
+            for key, derivative in derivatives.items()
+        }
+    return elasticities
+
+
+# פונקציה לחישוב נתוני תרשים טורנדו לכל הפרמטרים בהרצה וקטורית אחת
+def calculate_tornado(params, output='רווח לפני מס', spread=0.2):
+    """
+    מחשב את ערך המדד כאשר כל פרמטר בנפרד יורד/עולה ב-spread, בקריאה אחת למנוע הווקטורי.
+
+    Returns:
+        list: רשימת (פרמטר, ערך בשינוי למטה, ערך בשינוי למעלה), ממוינת לפי רוחב הטווח (הגדול ראשון).
+    """
+
+    base_row = params_to_matrix([params])[0]
+    n = len(PARAM_KEYS)
+    matrix = np.tile(base_row, (2 * n, 1))
+    rows = np.arange(n)
+    matrix[rows, rows] *= 1 - spread
+    matrix[rows + n, rows] *= 1 + spread
+    values = calculate_results_batch(matrix)[output]
+
+    tornado = [(key, float(values[index]), float(values[index + n])) for index, key in enumerate(PARAM_KEYS)]
+    tornado.sort(key=lambda item: abs(item[2] - item[1]), reverse=True)
+    return tornado
@@ -1,17 +1,33 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import numpy_financial as npf
-import plotly.express as px
 import plotly.graph_objects as go
-import locale
-import io
-
-# הגדרת לוקאל לאלפי מפרידים
-try:
-    locale.setlocale(locale.LC_ALL, 'he_IL.UTF-8')
-except locale.Error:
-    locale.setlocale(locale.LC_ALL, '')
+import os
+import shutil
+import tempfile
+import uuid
+
+from model_core import PARAM_GROUPS, default_params as base_params
+from charts import (build_breakeven_figure, build_cash_flow_figure, build_expense_pie_figure,
+                    build_income_pie_figure, build_pareto_figure, build_portfolio_cash_flow_figure,
+                    build_profit_margin_figure, build_sobol_figure, build_waterfall_figure,
+                    update_advanced_sensitivity_graph, update_sensitivity_graph, update_tornado_graph)
+from batch_engine import params_to_matrix
+from cash_flow_projection import SALARY_KEYS, project_cash_flows
+from excel_export import generate_excel, grid_header, iter_grid_rows, iter_projection_rows, projection_header
+from global_sensitivity import DEFAULT_SPREAD, SOBOL_METRICS, sobol_indices
+from goal_seek import STATUS_CONVERGED, goal_seek
+from grid_engine import sensitivity_range, sweep_grid
+from instrumentation import Profiler, export_json, profiling, stage
+from jobs import STATUS_CANCELLED, STATUS_DONE, job_manager
+from model_graph import IncrementalModel
+from monte_carlo import OPERATIONAL_PARAMS, run_monte_carlo
+from number_format import CURRENCY_SUFFIX, PERCENT_SUFFIX, format_frame, format_number, format_numbers
+from optimizer import DECISION_PARAMS, OBJECTIVES, optimize, pareto_front
+from portfolio import OPENING_YEAR_COLUMN, evaluate_portfolio
+from result_cache import canonical_key, memoize, result_cache
+from scenario_store import ScenarioStore
+from sensitivity import calculate_elasticities, calculate_jacobian
 
 # כותרת האפליקציה
 st.title("מחשבון תוכנית עסקית לג'ימבורי יובל המבולבל")
@@ -126,285 +142,20 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# פרמטרים ראשוניים
-default_params = {
-    # עלויות הקמה
-    'עלות בנייה': 900_000,
-    'עלות מערכות חשמל ותאורה': 300_000,
-    'עלות מערכות מיזוג ואוורור': 250_000,
-    'עלות מתקני משחק': 900_000,
-    'עלות ציוד VR/AR': 300_000,
-    'עלות ריהוט ואביזרים': 150_000,
-    'עלות מערכות ניהול ובקרה': 150_000,
-    'עלות מערכות קופות ותשלומים': 100_000,
-    'עלות אתר אינטרנט': 50_000,
-    'עלות אישורי בטיחות וכיבוי אש': 100_000,
-    'עלות רישיונות עסק': 50_000,
-    'עלות ייעוץ עסקי ופיננסי': 50_000,
-    'הוצאות משפטיות': 50_000,
-    'הון חוזר לתפעול ראשוני': 500_000,
-
-    # פרמטרים תפעוליים
-    'מחיר כניסה ליום רגיל': 50,
-    'מספר מבקרים ביום רגיל': 300,
-    'מחיר כניסה ליום חופשה/חג': 50,
-    'מספר מבקרים ביום חופשה/חג': 1_200,
-    'רכישה ממוצעת במזון ביום רגיל': 20,
-    'רכישה ממוצעת במזון ביום חופשה/חג': 25,
-    'רכישה ממוצעת במרצ\'נדייז ביום רגיל': 15,
-    'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג': 20,
-    'מספר אירועים פרטיים בחודש': 20,
-    'מחיר לאירוע פרטי': 2_000,
-    'מספר סדנאות בחודש': 5,
-    'מספר משתתפים בסדנה': 15,
-    'מחיר לסדנה': 100,
-
-    # הוצאות קבועות
-    'שכר דירה חודשי': 150_000,
-    'משכורת מנכ"ל': 20_000,
-    'משכורת מנהלים (סה"כ)': 60_000,
-    'משכורת צוות (סה"כ)': 140_000,
-    'ארנונה שנתית': 360_000,
-    'הוצאות חשמל חודשיות': 25_000,
-    'הוצאות מים חודשיות': 5_000,
-    'הוצאות נוספות שנתיות': 236_000,
-    'תשלומי הלוואה שנתיים': 975_000,
-
-    # פרמטרים נוספים
-    'שיעור פחת שנתי (%)': 2,
-    'אורך מימון (שנים)': 5
-}
-
-# פונקציה לחישוב עלויות הקמה
-def calculate_setup_costs(params):
-    return sum([
-        params['עלות בנייה'], params['עלות מערכות חשמל ותאורה'], params['עלות מערכות מיזוג ואוורור'],
-        params['עלות מתקני משחק'], params['עלות ציוד VR/AR'], params['עלות ריהוט ואביזרים'],
-        params['עלות מערכות ניהול ובקרה'], params['עלות מערכות קופות ותשלומים'], params['עלות אתר אינטרנט'],
-        params['עלות אישורי בטיחות וכיבוי אש'], params['עלות רישיונות עסק'], params['עלות ייעוץ עסקי ופיננסי'],
-        params['הוצאות משפטיות']
-    ])
-
-# פונקציה לחישוב הכנסות
-def calculate_income(params):
-    income_regular_tickets = params['מספר מבקרים ביום רגיל'] * params['מחיר כניסה ליום רגיל'] * 191
-    income_regular_food = params['מספר מבקרים ביום רגיל'] * params['רכישה ממוצעת במזון ביום רגיל'] * 191
-    income_regular_merch = params['מספר מבקרים ביום רגיל'] * params['רכישה ממוצעת במרצ\'נדייז ביום רגיל'] * 191
-
-    income_holiday_tickets = params['מספר מבקרים ביום חופשה/חג'] * params['מחיר כניסה ליום חופשה/חג'] * 100
-    income_holiday_food = params['מספר מבקרים ביום חופשה/חג'] * params['רכישה ממוצעת במזון ביום חופשה/חג'] * 100
-    income_holiday_merch = params['מספר מבקרים ביום חופשה/חג'] * params['רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג'] * 100
-
-    income_events = params['מספר אירועים פרטיים בחודש'] * params['מחיר לאירוע פרטי'] * 12
-    income_workshops = params['מספר סדנאות בחודש'] * params['מספר משתתפים בסדנה'] * params['מחיר לסדנה'] * 12
-
-    return sum([
-        income_regular_tickets, income_regular_food, income_regular_merch,
-        income_holiday_tickets, income_holiday_food, income_holiday_merch,
-        income_events, income_workshops
-    ])
-
-# פונקציה לחישוב הוצאות משתנות
-def calculate_variable_expenses(params, income_regular_merch, income_holiday_merch, income_regular_food, income_holiday_food, income_events, income_workshops):
-    cost_of_merch = (income_regular_merch + income_holiday_merch) * 0.5
-    cost_of_food = (income_regular_food + income_holiday_food) * 0.4
-    cost_of_workshops = income_workshops * 0.5
-    cost_of_events = income_events * 0.4
-
-    return cost_of_merch + cost_of_food + cost_of_workshops + cost_of_events
-
-# פונקציה לחישוב הוצאות קבועות
-def calculate_fixed_expenses(params, annual_depreciation):
-    return (
-        (params['שכר דירה חודשי'] + params['משכורת מנכ"ל'] + params['משכורת מנהלים (סה"כ)'] +
-         params['משכורת צוות (סה"כ)'] + params['הוצאות חשמל חודשיות'] + params['הוצאות מים חודשיות']) * 12 +
-        params['ארנונה שנתית'] + params['הוצאות נוספות שנתיות'] + annual_depreciation + params['הון חוזר לתפעול ראשוני']
-    )
-
-# פונקציה לחישוב תשלומי הלוואה
-def calculate_loan_payments(params):
-    loan_duration_years = int(params['אורך מימון (שנים)'])
-    loan_duration_months = loan_duration_years * 12
-    loan_amount = params['תשלומי הלוואה שנתיים']
-    annual_interest_rate = 0.05 
-    monthly_interest_rate = annual_interest_rate / 12
-    if monthly_interest_rate == 0:
-        monthly_payment = loan_amount / loan_duration_months
-    else:
-        monthly_payment = loan_amount * monthly_interest_rate / (1 - (1 + monthly_interest_rate) ** (-loan_duration_months))
-    return monthly_payment * loan_duration_months
-
-# פונקציה לחישוב רווח לפני מס
-def calculate_profit_before_tax(gross_profit, total_fixed_expenses, total_loan_payments):
-    return gross_profit - total_fixed_expenses - total_loan_payments
-
-# פונקציה לחישוב מחיר כניסה ממוצע
-def calculate_average_ticket_price(total_income, params):
-    total_visitors_regular = params['מספר מבקרים ביום רגיל'] * 191
-    total_visitors_holiday = params['מספר מבקרים ביום חופשה/חג'] * 100
-    total_visitors = total_visitors_regular + total_visitors_holiday
-
-    return total_income / total_visitors if total_visitors != 0 else 0
-
-# פונקציה לחישוב נקודת איזון כוללת (מספר כרטיסים לשנה)
-def calculate_breakeven_total_tickets(total_variable_expenses, total_fixed_expenses, total_loan_payments, average_ticket_price):
-    return (total_variable_expenses + total_fixed_expenses + total_loan_payments) / average_ticket_price if average_ticket_price != 0 else 0
-
-# פונקציה לחישוב נקודת איזון יומית
-def calculate_breakeven_daily_tickets(breakeven_total_tickets):
-    operating_days_per_year = 300 
-    return breakeven_total_tickets / operating_days_per_year if operating_days_per_year != 0 else 0
-
-# פונקציה לחישוב החזר על ההשקעה (ROI)
-def calculate_roi(profit_before_tax, setup_costs):
-    return (profit_before_tax / setup_costs) * 100 if setup_costs != 0 else 0
-
-# פונקציה לחישוב תקופת החזר ההשקעה
-def calculate_payback_period(setup_costs, profit_before_tax):
-    return setup_costs / profit_before_tax if profit_before_tax != 0 else 0
-
-# פונקציה לחישוב החזר פנימי (IRR)
-def calculate_irr(setup_costs, profit_before_tax, loan_duration_years):
-    cash_flows = [-setup_costs] + [profit_before_tax] * loan_duration_years
-    try:
-        return npf.irr(cash_flows) * 100 
-    except:
-        return None
-
-# פונקציה לחישוב הכנסות והוצאות לפי קטגוריות
-def calculate_category_data(params, income_regular_tickets, income_holiday_tickets, income_regular_food, income_holiday_food,
-                             income_regular_merch, income_holiday_merch, income_events, income_workshops,
-                             cost_of_merch, cost_of_food, cost_of_events, cost_of_workshops, total_fixed_expenses, total_loan_payments):
-    income_data = {
-        'כרטיסים': income_regular_tickets + income_holiday_tickets,
-        'מזון ומשקאות': income_regular_food + income_holiday_food,
-        'מרצ\'נדייז': income_regular_merch + income_holiday_merch,
-        'אירועים': income_events,
-        'סדנאות': income_workshops
-    }
-
-    expense_data = {
-        'הוצאות קבועות': total_fixed_expenses,
-        'עלות מרצ\'נדייז': cost_of_merch,
-        'עלות מזון ומשקאות': cost_of_food,
-        'עלות אירועים': cost_of_events,
-        'עלות סדנאות': cost_of_workshops,
-        'תשלומי הלוואה': total_loan_payments
-    }
-
-    return income_data, expense_data
-
-# פונקציה לחישוב התוצאות
-def calculate_results(params):
-    """
-    מחשב את התוצאות הפיננסיות של התוכנית העסקית בהתבסס על פרמטרי הקלט.
-
-    Args:
-        params (dict): מילון של פרמטרים.
-
-    Returns:
-        dict: מילון של תוצאות.
-    """
-
-    setup_costs = calculate_setup_costs(params)
-
-    # פחת שנתי כאחוז
-    annual_depreciation_percentage = params['שיעור פחת שנתי (%)']
-    annual_depreciation = setup_costs * (annual_depreciation_percentage / 100)
-
-    # הכנסות
-    income_regular_tickets = params['מספר מבקרים ביום רגיל'] * params['מחיר כניסה ליום רגיל'] * 191
-    income_regular_food = params['מספר מבקרים ביום רגיל'] * params['רכישה ממוצעת במזון ביום רגיל'] * 191
-    income_regular_merch = params['מספר מבקרים ביום רגיל'] * params['רכישה ממוצעת במרצ\'נדייז ביום רגיל'] * 191
-
-    income_holiday_tickets = params['מספר מבקרים ביום חופשה/חג'] * params['מחיר כניסה ליום חופשה/חג'] * 100
-    income_holiday_food = params['מספר מבקרים ביום חופשה/חג'] * params['רכישה ממוצעת במזון ביום חופשה/חג'] * 100
-    income_holiday_merch = params['מספר מבקרים ביום חופשה/חג'] * params['רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג'] * 100
-
-    income_events = params['מספר אירועים פרטיים בחודש'] * params['מחיר לאירוע פרטי'] * 12
-    income_workshops = params['מספר סדנאות בחודש'] * params['מספר משתתפים בסדנה'] * params['מחיר לסדנה'] * 12
-
-    total_income = calculate_income(params)
-
-    # הוצאות משתנות
-    total_variable_expenses = calculate_variable_expenses(
-        params, income_regular_merch, income_holiday_merch, income_regular_food, income_holiday_food, income_events, income_workshops
-    )
-
-    # רווח גולמי
-    gross_profit = total_income - total_variable_expenses
-
-    # הוצאות קבועות (כוללות פחת והון חוזר)
-    total_fixed_expenses = calculate_fixed_expenses(params, annual_depreciation)
-
-    # תשלומי הלוואה חודשיים
-    total_loan_payments = calculate_loan_payments(params)
-
-    # רווח לפני מס
-    profit_before_tax = calculate_profit_before_tax(gross_profit, total_fixed_expenses, total_loan_payments)
-
-    # מחיר כניסה ממוצע
-    average_ticket_price = calculate_average_ticket_price(total_income, params)
-
-    # נקודת איזון כוללת (מספר כרטיסים לשנה)
-    breakeven_total_tickets = calculate_breakeven_total_tickets(total_variable_expenses, total_fixed_expenses, total_loan_payments, average_ticket_price)
-
-    # נקודת איזון יומית
-    breakeven_daily_tickets = calculate_breakeven_daily_tickets(breakeven_total_tickets)
-
-    # החזר על ההשקעה (ROI)
-    roi = calculate_roi(profit_before_tax, setup_costs)
-
-    # תקופת החזר ההשקעה
-    payback_period = calculate_payback_period(setup_costs, profit_before_tax)
-
-    # החזר פנימי (IRR)
-    irr = calculate_irr(setup_costs, profit_before_tax, int(params['אורך מימון (שנים)']))
-
-    # הכנסות והוצאות לפי קטגוריות
-    income_data, expense_data = calculate_category_data(
-        params, income_regular_tickets, income_holiday_tickets, income_regular_food, income_holiday_food,
-        income_regular_merch, income_holiday_merch, income_events, income_workshops,
-        total_variable_expenses * (
-            (income_regular_merch + income_holiday_merch) * 0.5 / total_variable_expenses if total_variable_expenses != 0 else 0),
-        total_variable_expenses * (
-            (income_regular_food + income_holiday_food) * 0.4 / total_variable_expenses if total_variable_expenses != 0 else 0),
-        total_variable_expenses * (income_events * 0.4 / total_variable_expenses if total_variable_expenses != 0 else 0),
-        total_variable_expenses * (
-            income_workshops * 0.5 / total_variable_expenses if total_variable_expenses != 0 else 0),
-        total_fixed_expenses, total_loan_payments
-    )
-
-    results = {
-        'עלויות הקמה': setup_costs,
-        'פחת שנתי (%)': annual_depreciation_percentage, 
-        'הכנסות שנתיות': total_income,
-        'הוצאות משתנות': total_variable_expenses,
-        'רווח גולמי': gross_profit,
-        'הוצאות קבועות': total_fixed_expenses,
-        'תשלומי הלוואה': total_loan_payments,
-        'רווח לפני מס': profit_before_tax,
-        'נקודת איזון (מספר כרטיסים לשנה)': breakeven_total_tickets,
-        'נקודת איזון (מספר כרטיסים ליום)': breakeven_daily_tickets,
-        'החזר על ההשקעה (ROI)': roi,
-        'החזר פנימי (IRR)': irr,
-        'תקופת החזר השקעה (שנים)': payback_period,
-        'הכנסות לפי קטגוריות': income_data,
-        'הוצאות לפי קטגוריות': expense_data
-    }
-
-    return results
+# פרמטרים ראשוניים (עותק לכל הרצה - המודול המיובא משותף לכל המשתמשים). אחרי חישוב
+# או טעינת תרחיש שמור - הפרמטרים של הסשן
+default_params = dict(st.session_state.get('params', base_params))
 
 # יצירת קלט לפרמטרים (מותאם ל-Streamlit)
 def create_input_control(key, value):
     if isinstance(value, int):
-        formatted_value = f"{locale.format_string('%d', value, grouping=True)}"
+        formatted_value = format_number(value, 0)
     elif isinstance(value, float):
-        formatted_value = f"{locale.format_string('%.2f', value, grouping=True)}"
+        formatted_value = format_number(value)
     else:
         formatted_value = value
 
-    if 'שנים' in key or 'מספר' in key or 'שיעור' in key:
+    if 'שנים' in key or 'מספר' in key or 'שיעור' in key or 'ריבית' in key:
         input_type = 'number'
     else:
         input_type = 'text'
@@ -426,43 +177,24 @@ def create_input_control(key, value):
 # הצגת טאב הפרמטרים (מותאם ל-Streamlit)
 def render_parameters_tab():
     st.header("פרמטרים")
-    
+
     # קבוצות פרמטרים
-    setup_params = [
-        'עלות בנייה', 'עלות מערכות חשמל ותאורה', 'עלות מערכות מיזוג ואוורור', 'עלות מתקני משחק', 'עלות ציוד VR/AR',
-        'עלות ריהוט ואביזרים', 'עלות מערכות ניהול ובקרה', 'עלות מערכות קופות ותשלומים', 'עלות אתר אינטרנט',
-        'עלות אישורי בטיחות וכיבוי אש', 'עלות רישיונות עסק', 'עלות ייעוץ עסקי ופיננסי', 'הוצאות משפטיות', 'הון חוזר לתפעול ראשוני',
-        'שיעור פחת שנתי (%)'
-    ]
-
-    operational_params = [
-        'מחיר כניסה ליום רגיל', 'מספר מבקרים ביום רגיל', 'מחיר כניסה ליום חופשה/חג', 'מספר מבקרים ביום חופשה/חג',
-        'רכישה ממוצעת במזון ביום רגיל', 'רכישה ממוצעת במזון ביום חופשה/חג', 'רכישה ממוצעת במרצ\'נדייז ביום רגיל',
-        'רכישה ממוצעת במרצ\'נדייז ביום חופשה/חג', 'מספר אירועים פרטיים בחודש', 'מחיר לאירוע פרטי',
-        'מספר סדנאות בחודש', 'מספר משתתפים בסדנה', 'מחיר לסדנה'
-    ]
-
-    fixed_expenses_params = [
-        'שכר דירה חודשי', 'משכורת מנכ"ל', 'משכורת מנהלים (סה"כ)', 'משכורת צוות (סה"כ)',
-        'ארנונה שנתית', 'הוצאות חשמל חודשיות', 'הוצאות מים חודשיות', 'הוצאות נוספות שנתיות', 'תשלומי הלוואה שנתיים',
-        'אורך מימון (שנים)'
-    ]
-
-    with st.expander("עלויות הקמה"):
-        for key in setup_params:
-            default_params[key] = create_input_control(key, default_params[key])
-
-    with st.expander("פרמטרים תפעוליים"):
-        for key in operational_params:
-            default_params[key] = create_input_control(key, default_params[key])
-
-    with st.expander("הוצאות קבועות"):
-        for key in fixed_expenses_params:
-            default_params[key] = create_input_control(key, default_params[key])
+    for group, keys in PARAM_GROUPS.items():
+        with st.expander(group):
+            for key in keys:
+                default_params[key] = create_input_control(key, default_params[key])
 
     if st.button("חשב"):
-        results = calculate_results(default_params)
-        st.session_state['results'] = results
+        recalculate(default_params)
+        st.rerun()
+
+# חישוב התוצאות ושמירתן בסשן. המודל נשמר בסשן, כך שעריכה של שדה בודד (בטאב הפרמטרים
+# או בטעינת תרחיש) מחשבת מחדש רק את הצמתים שתלויים בו
+def recalculate(params):
+    if 'incremental_model' not in st.session_state:
+        st.session_state['incremental_model'] = IncrementalModel(params)
+    st.session_state['params'] = dict(params)
+    st.session_state['results'] = st.session_state['incremental_model'].update(params)
 
 # יצירת טבלת מדדים עם הסברים
 def generate_metrics_table(metrics, explanations):
@@ -497,7 +229,7 @@ def generate_category_table(data):
     """
 
     df = pd.DataFrame(list(data.items()), columns=['קטגוריה', 'סכום'])
-    df['סכום'] = df['סכום'].apply(lambda x: f"{locale.format_string('%.2f', x, grouping=True)} ש״ח")  # פורמט סכום
+    df['סכום'] = format_numbers(df['סכום'].to_numpy(), suffix=CURRENCY_SUFFIX)  # פורמט סכום
 
     return df
 
@@ -532,15 +264,16 @@ def render_results_tab(results):
             return 'light'
 
     # יצירת טבלה של המדדים המרכזיים עם הסברים
-    main_metrics = {
-        'רווח לפני מס': f"{locale.format_string('%.2f', results['רווח לפני מס'], grouping=True)} ש״ח",
-        'נקודת איזון (מספר כרטיסים לשנה)': f"{locale.format_string('%.2f', results['נקודת איזון (מספר כרטיסים לשנה)'], grouping=True)} כרטיסים לשנה",
-        'נקודת איזון (מספר כרטיסים ליום)': f"{locale.format_string('%.2f', results['נקודת איזון (מספר כרטיסים ליום)'], grouping=True)} כרטיסים ליום",
-        'החזר על ההשקעה (ROI)': f"{locale.format_string('%.2f', results['החזר על ההשקעה (ROI)'], grouping=True)}%",
-        'החזר פנימי (IRR)': f"{locale.format_string('%.2f', results['החזר פנימי (IRR)'], grouping=True)}%" if results[
-                                                                                                                 'החזר פנימי (IRR)'] is not None else "N/A",
-        'תקופת החזר השקעה (שנים)': f"{locale.format_string('%.2f', results['תקופת החזר השקעה (שנים)'], grouping=True)} שנים"
+    main_metric_units = {
+        'רווח לפני מס': CURRENCY_SUFFIX,
+        'נקודת איזון (מספר כרטיסים לשנה)': ' כרטיסים לשנה',
+        'נקודת איזון (מספר כרטיסים ליום)': ' כרטיסים ליום',
+        'החזר על ההשקעה (ROI)': PERCENT_SUFFIX,
+        'החזר פנימי (IRR)': PERCENT_SUFFIX,
+        'תקופת החזר השקעה (שנים)': ' שנים'
     }
+    main_metrics = {key: format_number(results[key], suffix=unit, missing="N/A")
+                    for key, unit in main_metric_units.items()}
 
     # הסברים לכל מדד
     metrics_explanations = {
@@ -556,14 +289,9 @@ def render_results_tab(results):
     metrics_table = generate_metrics_table(main_metrics, metrics_explanations)
 
     # יצירת טבלה של כל ההכנסות וההוצאות עם הסברים
-    financials = {
-        'הכנסות שנתיות': f"{locale.format_string('%.2f', results['הכנסות שנתיות'], grouping=True)} ש״ח",
-        'הוצאות משתנות': f"{locale.format_string('%.2f', results['הוצאות משתנות'], grouping=True)} ש״ח",
-        'רווח גולמי': f"{locale.format_string('%.2f', results['רווח גולמי'], grouping=True)} ש״ח",
-        'הוצאות קבועות': f"{locale.format_string('%.2f', results['הוצאות קבועות'], grouping=True)} ש״ח",
-        'תשלומי הלוואה': f"{locale.format_string('%.2f', results['תשלומי הלוואה'], grouping=True)} ש״ח",
-        'רווח לפני מס': f"{locale.format_string('%.2f', results['רווח לפני מס'], grouping=True)} ש״ח"
-    }
+    financial_keys = ['הכנסות שנתיות', 'הוצאות משתנות', 'רווח גולמי', 'הוצאות קבועות', 'תשלומי הלוואה', 'רווח לפני מס']
+    financials = dict(zip(financial_keys,
+                          format_numbers([results[key] for key in financial_keys], suffix=CURRENCY_SUFFIX)))
 
     # הסברים לכל מדד כלכלי
     financials_explanations = {
@@ -637,11 +365,27 @@ def render_results_tab(results):
     st.write(expense_table)
     st.markdown("---")
 
+# החלקים בטאב הגרפים, לפי סדר ההצגה. כל גרף נבנה רק כשהחלק שלו נבחר
+CHART_SECTIONS = (
+    "מפל הכנסות והוצאות",
+    "התפלגות ההכנסות",
+    "התפלגות ההוצאות",
+    "נקודת איזון",
+    "תזרים מזומנים",
+    "שיעור רווחיות",
+    "תרשים טורנדו וגמישויות",
+    "ניתוח רגישות",
+    "ניתוח רגישות מתקדם",
+)
+
 # הצגת טאב הגרפים (מותאם ל-Streamlit)
 def render_charts_tab(results):
     """
     מציג את טאב הגרפים.
 
+    רק החלקים שנבחרו נבנים, וכל גרף נשמר במטמון לפי התוצאות והקלטים שלו -
+    שינוי בחירה בחלק אחד אינו בונה מחדש את שאר הגרפים.
+
     Args:
         results (dict): תוצאות החישוב.
     """
@@ -650,289 +394,541 @@ def render_charts_tab(results):
         st.write("אנא הזן את הפרמטרים ולחץ על 'חשב' כדי לראות את הגרפים.")
         return
 
-    # גרף מפל
-    waterfall_fig = go.Figure(go.Waterfall(
-        name="",
-        orientation="v",
-        measure=["relative", "relative", "relative", "relative", "total"],
-        x=["הכנסות", "הוצאות משתנות", "הוצאות קבועות", "תשלומי הלוואה", "רווח לפני מס"],
-        textposition="outside",
-        text=[
-            f"{locale.format_string('%.0f', results['הכנסות שנתיות'], grouping=True)} ש״ח",
-            f"-{locale.format_string('%.0f', results['הוצאות משתנות'], grouping=True)} ש״ח",
-            f"-{locale.format_string('%.0f', results['הוצאות קבועות'], grouping=True)} ש״ח",
-            f"-{locale.format_string('%.0f', results['תשלומי הלוואה'], grouping=True)} ש״ח",
-            f"{locale.format_string('%.0f', results['רווח לפני מס'], grouping=True)} ש״ח"
-        ],
-        y=[
-            results['הכנסות שנתיות'],
-            -results['הוצאות משתנות'],
-            -results['הוצאות קבועות'],
-            -results['תשלומי הלוואה'],
-            results['רווח לפני מס']
-        ],
-        connector={"line": {"color": "rgb(63, 63, 63)"}},
-        increasing={"marker": {"color": "#007bff"}},
-        decreasing={"marker": {"color": "#dc3545"}},
-        totals={"marker": {"color": "#28a745"}},
-    ))
-    waterfall_fig.update_layout(
-        title="מפל הכנסות והוצאות",
-        xaxis_title="",
-        yaxis_title="ש״ח",
-        font=dict(size=14),
-        hovermode="x unified"
+    selected_sections = st.multiselect("גרפים להצגה:", options=list(CHART_SECTIONS), default=[CHART_SECTIONS[0]])
+
+    for section in CHART_SECTIONS:
+        if section not in selected_sections:
+            continue
+        if section == "מפל הכנסות והוצאות":
+            st.plotly_chart(build_waterfall_figure(results), use_container_width=True)
+        elif section == "התפלגות ההכנסות":
+            st.plotly_chart(build_income_pie_figure(results), use_container_width=True)
+        elif section == "התפלגות ההוצאות":
+            st.plotly_chart(build_expense_pie_figure(results), use_container_width=True)
+        elif section == "נקודת איזון":
+            st.plotly_chart(build_breakeven_figure(default_params, results), use_container_width=True)
+        elif section == "תזרים מזומנים":
+            render_cash_flow_section()
+        elif section == "שיעור רווחיות":
+            st.plotly_chart(build_profit_margin_figure(results), use_container_width=True)
+        elif section == "תרשים טורנדו וגמישויות":
+            st.plotly_chart(update_tornado_graph({'params': default_params}), use_container_width=True)
+            with st.expander("גמישויות לפי פרמטר"):
+                st.write(generate_elasticity_table(default_params, results))
+        elif section == "ניתוח רגישות":
+            sensitivity_param = st.selectbox("בחר פרמטר לניתוח רגישות:", options=list(default_params.keys()))
+            st.plotly_chart(update_sensitivity_graph(sensitivity_param, {'params': default_params}),
+                            use_container_width=True)
+        elif section == "ניתוח רגישות מתקדם":
+            render_advanced_sensitivity_layout()
+
+# גרף זרם מזומנים (Cash Flow) - תחזית חודשית מסוכמת לשנים
+def render_cash_flow_section():
+    with st.expander("הנחות תחזית תזרים"):
+        projection_years = st.slider("אופק תחזית (שנים)", min_value=5, max_value=20, value=10)
+        ramp_up_months = st.number_input("חודשי הרצה עד תפוסה מלאה", value=6, min_value=0)
+        ramp_up_start = st.number_input("תפוסה בחודש הראשון (%)", value=60.0, min_value=0.0, max_value=100.0) / 100
+        price_growth = st.number_input("עליית מחירים שנתית (%)", value=2.0) / 100
+        salary_growth = st.number_input("עליית שכר שנתית (%)", value=3.0) / 100
+        cost_inflation = st.number_input("אינפלציה שנתית בהוצאות קבועות (%)", value=2.0) / 100
+        loan_grace_months = st.number_input("חודשי גרייס בהלוואה (ריבית בלבד)", value=0, min_value=0)
+        loan_balloon = st.number_input("תשלום בלון בסוף ההלוואה ש״ח", value=0.0, min_value=0.0)
+
+    cash_flow_fig = build_cash_flow_figure(
+        default_params, projection_years=projection_years, ramp_up_months=ramp_up_months,
+        ramp_up_start=ramp_up_start, price_growth=price_growth, salary_growth=salary_growth,
+        cost_inflation=cost_inflation, loan_grace_months=loan_grace_months, loan_balloon=loan_balloon
     )
-
-    # גרף הכנסות לפי קטגוריות (גרף עוגה)
-    income_df = pd.DataFrame(list(results['הכנסות לפי קטגוריות'].items()), columns=['קטגוריה', 'סכום'])
-    income_pie_fig = px.pie(income_df, values='סכום', names='קטגוריה', title='התפלגות ההכנסות')
-    income_pie_fig.update_traces(marker=dict(colors=['#007bff', '#28a745', '#dc3545', '#28a745', '#dc3545']))
-    income_pie_fig.update_layout(font=dict(size=14))
-
-    # גרף הוצאות לפי קטגוריות (גרף עוגה)
-    expense_df = pd.DataFrame(list(results['הוצאות לפי קטגוריות'].items()), columns=['קטגוריה', 'סכום'])
-    expense_pie_fig = px.pie(expense_df, values='סכום', names='קטגוריה', title='התפלגות ההוצאות')
-    expense_pie_fig.update_layout(font=dict(size=14))
-
-    # גרף נקודת איזון
-    breakeven_total_tickets = results['נקודת איזון (מספר כרטיסים לשנה)']
-    average_ticket_price = results['הכנסות שנתיות'] / (
-            default_params['מספר מבקרים ביום רגיל'] * 191 + default_params['מספר מבקרים ביום חופשה/חג'] * 100) if (
-            default_params['מספר מבקרים ביום רגיל'] * 191 + default_params['מספר מבקרים ביום חופשה/חג'] * 100) != 0 else 0
-
-    quantity = np.linspace(0, breakeven_total_tickets * 1.5, 100)
-    total_revenue = average_ticket_price * quantity
-    if breakeven_total_tickets != 0:
-        total_costs = (results['הוצאות משתנות'] + results['הוצאות קבועות'] + results['תשלומי הלוואה']) * quantity / breakeven_total_tickets
-    else:
-        total_costs = np.zeros_like(quantity)
-
-    breakeven_fig = go.Figure()
-    breakeven_fig.add_trace(go.Scatter(x=quantity, y=total_revenue, mode='lines', name='הכנסות', line=dict(color='#007bff')))
-    breakeven_fig.add_trace(go.Scatter(x=quantity, y=total_costs, mode='lines', name='הוצאות', line=dict(color='#dc3545')))
-    breakeven_fig.add_vline(x=breakeven_total_tickets, line_dash="dash", line_color="green",
-                            annotation_text=f"נקודת איזון: {locale.format_string('%.0f', breakeven_total_tickets, grouping=True)} כרטיסים לשנה",
-                            annotation_position="top right")
-    breakeven_fig.update_layout(title='גרף נקודת איזון', xaxis_title='מספר כרטיסים לשנה', yaxis_title='ש״ח',
-                                font=dict(size=14))
-
-    # גרף זרם מזומנים (Cash Flow)
-    cash_flow_fig = go.Figure()
-    years = list(range(1, default_params['אורך מימון (שנים)'] + 1))
-    cash_flow = [results['רווח לפני מס']] * default_params['אורך מימון (שנים)']
-    cash_flow.insert(0, -results['עלויות הקמה'])  # השקעה התחלתית
-    cumulative_cash_flow = np.cumsum(cash_flow)
-
-    cash_flow_fig.add_trace(go.Bar(x=["השקעה"] + [f"שנה {year}" for year in years], y=cash_flow, name='תזרים מזומנים', marker=dict(color='#28a745')))
-    cash_flow_fig.add_trace(
-        go.Scatter(x=["השקעה"] + [f"שנה {year}" for year in years], y=cumulative_cash_flow, mode='lines+markers',
-                   name='תזרים מזומנים מצטבר', line=dict(color='#007bff')))
-    cash_flow_fig.update_layout(title='תזרים מזומנים', xaxis_title='שנים', yaxis_title='ש״ח', font=dict(size=14))
-
-    # גרף שיעור רווחיות (Profit Margin)
-    profit_margin = (results['רווח לפני מס'] / results['הכנסות שנתיות']) * 100 if results['הכנסות שנתיות'] != 0 else 0
-    profit_margin_fig = go.Figure()
-    profit_margin_fig.add_trace(go.Indicator(
-        mode="gauge+number",
-        value=profit_margin,
-        title={'text': "שיעור רווחיות (%)"},
-        gauge={
-            'axis': {'range': [0, 100]},
-            'steps': [
-                {'range': [0, 20], 'color': "red"},
-                {'range': [20, 60], 'color': "yellow"},
-                {'range': [60, 100], 'color': "green"}
-            ],
-            'threshold': {'line': {'color': "black", 'width': 4}, 'thickness': 0.75, 'value': profit_margin}
-        }
-    ))
-    profit_margin_fig.update_layout(font=dict(size=14))
-
-    # גרף ניתוח רגישות
-    sensitivity_fig = st.plotly_chart(update_sensitivity_graph('מספר מבקרים ביום רגיל', {'params': default_params}), use_container_width=True)
-
-    sensitivity_param_dropdown = st.selectbox("בחר פרמטר לניתוח רגישות:", options=list(default_params.keys()))
-
-    sensitivity_layout = st.container()
-    with sensitivity_layout:
-        sensitivity_param_dropdown
-        sensitivity_fig
-
-    # ניתוח רגישות מתקדם (הצלבה בין פרמטרים)
-    advanced_sensitivity_layout = render_advanced_sensitivity_layout()
-
-    # הצגת הגרפים
-    st.plotly_chart(waterfall_fig, use_container_width=True)
-    st.plotly_chart(income_pie_fig, use_container_width=True)
-    st.plotly_chart(expense_pie_fig, use_container_width=True)
-    st.plotly_chart(breakeven_fig, use_container_width=True)
     st.plotly_chart(cash_flow_fig, use_container_width=True)
-    st.plotly_chart(profit_margin_fig, use_container_width=True)
-    sensitivity_layout
-    advanced_sensitivity_layout
-
-# פונקציה לניתוח רגישות מתקדם (הצלבה בין פרמטרים)
-def perform_advanced_sensitivity_analysis(current_params, param1, param2, range1, range2):
-    profits = []
-    combinations = []
-    for val1 in range1:
-        for val2 in range2:
-            temp_params = current_params.copy()
-            temp_params[param1] = val1
-            temp_params[param2] = val2
-            try:
-                res = calculate_results(temp_params)
-                profits.append(res['רווח לפני מס'])
-                combinations.append((val1, val2))
-            except KeyError as e:
-                # אם יש פרמטר חסר, נמשיך בלי להוסיף
-                print(f"Missing key: {e}")
-                continue
-    return combinations, profits
 
 # פונקציה להצגת ניתוח רגישות מתקדם
 def render_advanced_sensitivity_layout():
     sensitivity_params = [key for key in default_params.keys() if isinstance(default_params[key], (int, float))]
 
     param1 = st.selectbox("בחר פרמטר 1 לניתוח רגישות:", options=sensitivity_params)
-    param2 = st.selectbox("בחר פרמטר 2 לניתוח רגישות:", options=sensitivity_params)
-
-    advanced_sensitivity_fig = st.plotly_chart(update_advanced_sensitivity_graph(param1, param2, {'params': default_params}), use_container_width=True)
+    param2 = st.selectbox("בחר פרמטר 2 לניתוח רגישות:", options=sensitivity_params, index=1)
+    if param1 == param2:
+        st.warning("יש לבחור שני פרמטרים שונים.")
+        return
 
-    advanced_sensitivity_info = st.container()
-    with advanced_sensitivity_info:
-        st.write("")  # Placeholder for sensitivity info
+    # החלון המוצג - צמצום הטווח מחשב מחדש רק אותו, באותה רזולוציה
+    windows = []
+    for axis, param in (('x', param1), ('y', param2)):
+        base_value = float(default_params[param])
+        low, high = sorted((base_value * 0.5, base_value * 1.5)) if base_value else (0.0, 1.0)
+        windows.append(st.slider(f"טווח {param}", min_value=low, max_value=high,
+                                 value=(low + (high - low) * 0.3, low + (high - low) * 0.7), key=f"window_{axis}"))
+    resolution = st.select_slider("רזולוציה (נקודות לציר)", options=[50, 100, 200, 400], value=100)
+
+    st.plotly_chart(update_advanced_sensitivity_graph(param1, param2, {'params': default_params}, windows[0],
+                                                      windows[1], resolution),
+                    use_container_width=True)
+
+# תדירות הרענון של מצב עבודה ברקע (שניות)
+JOB_POLL_INTERVAL = 0.5
+
+# מפתח העבודות של הסשן במאגר המשותף - עבודה חדשה מאותו סוג מבטלת את הקודמת
+def session_job_key(kind):
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return f"{st.session_state['session_id']}:{kind}"
+
+# הגשת ניתוח כבד לרקע (start=True), או העבודה הקיימת אם הקלטים לא השתנו מאז שהוגשה.
+# שינוי קלטים מבטל עבודה שעוד רצה, והתוצאה שלה לא מוצגת
+def background_job(kind, inputs, start, func, *args, **kwargs):
+    key = session_job_key(kind)
+    signature = canonical_key(kind, inputs)
+    job = job_manager.latest(key)
+    if job is not None and st.session_state.get(f'job_signature_{kind}') != signature:
+        job.cancel()
+        job = None
+    if start:
+        job = job_manager.submit(func, *args, name=kind, key=key, **kwargs)
+        st.session_state[f'job_signature_{kind}'] = signature
+    return job
+
+# הצגת מצב העבודה: בסיום - התוצאה (או ביטול/שגיאה), ובזמן הריצה - מצב מתרענן
+def render_job(kind, render_result, render_partial=None):
+    job = job_manager.latest(session_job_key(kind))
+    if job is None:
+        return
+    if job.status == STATUS_DONE:
+        render_result(job.result)
+    elif job.status == STATUS_CANCELLED:
+        st.info("החישוב בוטל.")
+    elif job.error is not None:
+        st.error(f"החישוב נכשל: {job.error}")
+    else:
+        render_job_progress(kind, render_partial)
+
+# התקדמות, ביטול ותוצאה חלקית של עבודה שרצה. מתרענן לבד בלי להריץ את כל הדף מחדש;
+# כשהעבודה מסתיימת הדף מורץ פעם אחת מחדש, כך שהתוצאה מוצגת מחוץ ל-fragment והרענון נעצר
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_job_progress(kind, render_partial=None):
+    job = job_manager.latest(session_job_key(kind))
+    if job is None or job.finished:
+        st.rerun()
+    progress = job.progress
+    st.progress(progress or 0.0, text="מחשב..." if progress is None else f"מחשב... {progress:.0%}")
+    if st.button("בטל", key=f"cancel_{kind}"):
+        job.cancel()
+    if render_partial is not None and job.partial is not None:
+        render_partial(job.partial)
+
+# פונקציה לבניית הגדרת התפלגות סביב ערך בסיס
+def build_distribution(kind, base_value, spread, empirical_values=None):
+    if kind == 'normal':
+        return {'type': 'normal', 'mean': base_value, 'std': abs(base_value) * spread, 'min': 0}
+    if kind == 'triangular':
+        return {'type': 'triangular', 'left': base_value * (1 - spread), 'mode': base_value,
+                'right': base_value * (1 + spread)}
+    if kind == 'lognormal':
+        return {'type': 'lognormal', 'mean': np.log(base_value), 'sigma': spread}
+    return {'type': 'empirical', 'values': empirical_values or [base_value]}
+
+# הצגת טאב סימולציית מונטה קרלו (מותאם ל-Streamlit)
+def render_monte_carlo_tab():
+    st.header("סימולציית סיכונים (מונטה קרלו)")
+
+    selected_params = st.multiselect("בחר פרמטרים אקראיים:", options=list(OPERATIONAL_PARAMS),
+                                     default=['מספר מבקרים ביום רגיל', 'מספר מבקרים ביום חופשה/חג'])
+    distribution_labels = {'normal': 'נורמלית', 'triangular': 'משולשת', 'lognormal': 'לוג-נורמלית', 'empirical': 'אמפירית'}
+
+    distributions = {}
+    for key in selected_params:
+        with st.expander(key):
+            kind = st.selectbox("התפלגות", options=list(distribution_labels), format_func=distribution_labels.get,
+                                key=f"mc_kind_{key}")
+            if kind == 'empirical':
+                raw_values = st.text_input("ערכים אפשריים (מופרדים בפסיקים)", value=str(default_params[key]),
+                                           key=f"mc_values_{key}")
+                values = [float(value) for value in raw_values.split(',') if value.strip()]
+                distributions[key] = build_distribution(kind, default_params[key], 0, values)
+            else:
+                spread = st.number_input("פיזור (%)", value=20.0, min_value=0.0, key=f"mc_spread_{key}") / 100
+                # התפלגות לוג-נורמלית מוגדרת רק סביב ערך בסיס חיובי
+                if kind == 'lognormal' and default_params[key] <= 0:
+                    st.warning("התפלגות לוג-נורמלית דורשת ערך בסיס חיובי - נעשה שימוש בהתפלגות נורמלית.")
+                    kind = 'normal'
+                distributions[key] = build_distribution(kind, default_params[key], spread)
+
+    n_draws = st.number_input("מספר הגרלות", value=1_000_000, min_value=1_000, step=100_000)
+    seed = st.number_input("זרע אקראי", value=0, min_value=0)
+
+    job = background_job('monte_carlo', (default_params, distributions, n_draws, seed), st.button("הרץ סימולציה"),
+                         run_monte_carlo, default_params, distributions, n_draws=int(n_draws), seed=int(seed),
+                         n_workers=job_manager.worker_processes)
+    if job is not None:
+        render_job('monte_carlo', render_monte_carlo_summary, render_partial=render_monte_carlo_summary)
+
+# הצגת סיכום הסימולציה - גם כתוצאה חלקית בזמן שהסימולציה רצה
+def render_monte_carlo_summary(summary):
+    table = pd.DataFrame([
+        {
+            'מדד': metric,
+            'P5': stats['P5'],
+            'P50': stats['P50'],
+            'P95': stats['P95'],
+            'ממוצע': stats['mean'],
+            'סטיית תקן': stats['std'],
+            'הסתברות לערך שלילי': stats['probability_negative'] * 100,
+        }
+        for metric, stats in summary.items()
+    ])
+    st.subheader("התפלגות המדדים")
+    st.write(format_frame(table, suffixes={'הסתברות לערך שלילי': PERCENT_SUFFIX}))
+
+    for metric, stats in summary.items():
+        counts, edges = stats['histogram']
+        histogram_fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, marker=dict(color='#007bff')))
+        for label in ('P5', 'P50', 'P95'):
+            histogram_fig.add_vline(x=stats[label], line_dash="dash", line_color="green", annotation_text=label)
+        histogram_fig.update_layout(title=f'התפלגות - {metric}', xaxis_title=metric, yaxis_title='מספר הגרלות',
+                                    font=dict(size=14), bargap=0)
+        st.plotly_chart(histogram_fig, use_container_width=True)
+
+# הצגת טאב רגישות גלובלית (מדדי סובול)
+def render_global_sensitivity_tab():
+    st.header("רגישות גלובלית (מדדי סובול)")
+    st.write("כל הפרמטרים משתנים יחד בטווח סביב ערכי הבסיס. S1 - חלק השונות במדד שנובע מהפרמטר לבדו; "
+             "ST - כולל האינטראקציות שלו עם פרמטרים אחרים.")
+
+    spread = st.number_input("טווח סביב ערך הבסיס (%)", value=DEFAULT_SPREAD * 100, min_value=1.0, max_value=100.0)
+    n_samples = st.select_slider("מספר דגימות בסיס (N)", options=[2 ** power for power in range(10, 18)], value=8192)
+    seed = st.number_input("זרע אקראי", value=0, min_value=0, key='sobol_seed')
+    job = background_job('sobol', (default_params, n_samples, spread, seed), st.button("חשב מדדי סובול"),
+                         sobol_indices, default_params, n_samples=n_samples, spread=spread / 100, seed=int(seed),
+                         n_workers=job_manager.worker_processes)
+    if job is not None:
+        render_job('sobol', lambda indices: render_sobol_indices(indices, n_samples))
+
+def render_sobol_indices(indices, n_samples):
+    st.caption(f"{n_samples * (len(next(iter(indices.values()))) + 2):,} הערכות של המודל")
+    for metric in SOBOL_METRICS:
+        st.plotly_chart(build_sobol_figure(indices[metric], metric), use_container_width=True)
+        with st.expander(f"טבלה - {metric}"):
+            st.dataframe(indices[metric].round(4))
+
+# הצגת טאב האופטימיזציה - מקסום מדד תחת אילוצים וחזית רווח-סיכון
+def render_optimization_tab():
+    st.header("אופטימיזציה")
+    objective = st.selectbox("מדד למקסום:", options=OBJECTIVES)
+    numeric_params = [key for key in default_params if isinstance(default_params[key], (int, float))]
+    decision_params = st.multiselect("משתני החלטה:", options=numeric_params, default=list(DECISION_PARAMS))
+
+    bounds = {}
+    with st.expander("טווחי משתני ההחלטה"):
+        for key in decision_params:
+            low_column, high_column = st.columns(2)
+            low = low_column.number_input(f"{key} - מינימום", value=float(default_params[key]) * 0.7,
+                                          key=f"opt_low_{key}")
+            high = high_column.number_input(f"{key} - מקסימום", value=float(default_params[key]) * 1.3,
+                                            key=f"opt_high_{key}")
+            bounds[key] = (low, high)
+
+    constraints = []
+    with st.expander("אילוצים"):
+        max_breakeven = st.number_input("נקודת איזון יומית מקסימלית (0 - ללא)", value=0.0, min_value=0.0)
+        if max_breakeven:
+            constraints.append(('נקודת איזון (מספר כרטיסים ליום)', '<=', max_breakeven))
+        salary_budget = st.number_input("תקציב שכר חודשי (0 - ללא)", value=0.0, min_value=0.0)
+        if salary_budget:
+            constraints.append(({key: 1 for key in SALARY_KEYS}, '<=', salary_budget))
+        min_roi = st.number_input("ROI מינימלי (%) (0 - ללא)", value=0.0, min_value=0.0)
+        if min_roi:
+            constraints.append(('החזר על ההשקעה (ROI)', '>=', min_roi))
+
+    if not decision_params:
+        return
+    job = background_job('optimize', (default_params, objective, decision_params, bounds, constraints),
+                         st.button("מצא ערכים אופטימליים"),
+                         optimize, default_params, objective, decision_params, bounds, constraints)
+    if job is not None:
+        render_job('optimize', lambda solution: render_optimization_result(solution, objective, decision_params))
+
+    st.subheader("חזית רווח מול סיכון")
+    random_options = [key for key in OPERATIONAL_PARAMS if key not in decision_params]
+    random_params = st.multiselect("פרמטרים לא ודאיים:", options=random_options,
+                                   default=[key for key in ('מספר מבקרים ביום רגיל', 'מספר מבקרים ביום חופשה/חג')
+                                            if key not in decision_params])
+    spread = st.number_input("סטיית תקן (% מהבסיס)", value=20.0, min_value=0.0, key='pareto_spread') / 100
+    distributions = {key: build_distribution('normal', default_params[key], spread) for key in random_params}
+    job = background_job('pareto', (default_params, objective, decision_params, bounds, constraints, distributions),
+                         bool(random_params) and st.button("חשב חזית פארטו"),
+                         pareto_front, default_params, distributions, objective, decision_params, bounds, constraints)
+    if job is not None:
+        render_job('pareto', lambda pareto: render_pareto_front(pareto, objective))
+
+# הצגת הפתרון של האופטימיזציה מול הערכים הנוכחיים
+def render_optimization_result(solution, objective, decision_params):
+    if not solution['feasible']:
+        st.warning("לא נמצאה נקודה שמקיימת את כל האילוצים - מוצגת הנקודה הקרובה ביותר.")
+    st.metric(objective, format_number(solution['value']))
+    st.dataframe(pd.DataFrame({
+        'פרמטר': decision_params,
+        'ערך נוכחי': [default_params[key] for key in decision_params],
+        'ערך מומלץ': [solution['params'][key] for key in decision_params],
+    }))
+    st.caption(f"{solution['evaluations']:,} הערכות של המודל")
+    with st.expander("תוצאות לפי נקודת התחלה"):
+        st.dataframe(solution['starts'])
+
+def render_pareto_front(pareto, objective):
+    st.plotly_chart(build_pareto_figure(pareto['candidates'], objective), use_container_width=True)
+    st.dataframe(pareto['front'])
+
+# יצירת טבלת גמישויות (אחוז שינוי במדד לכל אחוז שינוי בפרמטר)
+@memoize('generate_elasticity_table')
+def generate_elasticity_table(params, results):
+    elasticities = calculate_elasticities(params, results, calculate_jacobian(params))
+    df = pd.DataFrame({
+        'פרמטר': list(params.keys()),
+        'רווח לפני מס': [elasticities['רווח לפני מס'][key] for key in params],
+        'החזר על ההשקעה (ROI)': [elasticities['החזר על ההשקעה (ROI)'][key] for key in params],
+        'נקודת איזון (מספר כרטיסים לשנה)': [elasticities['נקודת איזון (מספר כרטיסים לשנה)'][key] for key in params],
+    })
+    return df.reindex(df['רווח לפני מס'].abs().sort_values(ascending=False).index).round(4)
+
+# הצגת טאב איתור יעד (מותאם ל-Streamlit)
+def render_goal_seek_tab():
+    st.header("איתור יעד")
+    st.write("מציאת ערך הפרמטר שמביא את המדד הנבחר לערך היעד, כאשר שאר הפרמטרים קבועים.")
+
+    numeric_params = [key for key in default_params.keys() if isinstance(default_params[key], (int, float))]
+    param = st.selectbox("פרמטר לשינוי:", options=numeric_params)
+    output = st.selectbox("מדד יעד:", options=['רווח לפני מס', 'החזר על ההשקעה (ROI)', 'תקופת החזר השקעה (שנים)',
+                                               'נקודת איזון (מספר כרטיסים ליום)'])
+    target = st.number_input("ערך יעד:", value=0.0)
+
+    if not st.button("חפש ערך"):
+        return
 
-    advanced_sensitivity_layout = st.container()
-    with advanced_sensitivity_layout:
-        param1
-        param2
-        advanced_sensitivity_fig
-        advanced_sensitivity_info
+    solution = goal_seek(default_params, param, target, output=output)
+    if solution['status'][0] == STATUS_CONVERGED:
+        st.success(f"{param}: {format_number(solution['value'][0])}")
+    else:
+        status_messages = {
+            'no_bracket': "לא נמצא ערך אי-שלילי של הפרמטר שמגיע ליעד.",
+            'discontinuity': "המדד קופץ מעל היעד בנקודה זו - אין ערך שמגיע אליו בדיוק.",
+            'max_iterations': "החיפוש לא התכנס במספר האיטרציות המותר.",
+        }
+        st.error(status_messages[solution['status'][0]])
+
+# מאגר התרחישים - חיבור אחד משותף לכל הסשנים בתהליך
+@st.cache_resource
+def get_scenario_store():
+    return ScenarioStore()
+
+# שמירת התרחיש הנוכחי במאגר
+def render_save_scenario(results):
+    with st.expander("שמירת תרחיש"):
+        name = st.text_input("שם התרחיש")
+        branch = st.text_input("סניף")
+        if st.button("שמור תרחיש"):
+            scenario_id = get_scenario_store().save(default_params, results, name=name or None, branch=branch or None)
+            st.success(f"התרחיש נשמר (מזהה {scenario_id})")
+
+# מדדים למיון תרחישים שמורים (עם אינדקס במאגר)
+SCENARIO_SORT_METRICS = ('החזר על ההשקעה (ROI)', 'רווח לפני מס', 'תקופת החזר השקעה (שנים)', 'החזר פנימי (IRR)')
+
+# הצגת טאב התרחישים השמורים - חיפוש, השוואה וטעינה
+def render_scenarios_tab():
+    st.header("תרחישים שמורים")
+    store = get_scenario_store()
+    st.caption(f"{len(store)} תרחישים במאגר")
+
+    order_by = st.selectbox("מיון לפי:", options=SCENARIO_SORT_METRICS)
+    ascending = st.checkbox("סדר עולה", value=order_by == 'תקופת החזר השקעה (שנים)')
+    branches = store.branches()
+    branch = st.selectbox("סניף:", options=['הכל'] + branches)
+    limit = st.number_input("מספר תוצאות", value=100, min_value=1, max_value=10_000)
+
+    filters = []
+    with st.expander("סינון"):
+        numeric_params = [key for key in default_params if isinstance(default_params[key], (int, float))]
+        filter_field = st.selectbox("שדה:", options=['ללא'] + numeric_params + list(SCENARIO_SORT_METRICS))
+        operator = st.selectbox("תנאי:", options=['<', '<=', '>', '>=', '='])
+        value = st.number_input("ערך:", value=0.0)
+        if filter_field != 'ללא':
+            filters.append((filter_field, operator, value))
+
+    scenarios = store.query(filters, order_by=order_by, descending=not ascending, limit=int(limit),
+                            branch=None if branch == 'הכל' else branch)
+    st.dataframe(scenarios)
+    if scenarios.empty:
+        return
 
-    return advanced_sensitivity_layout
+    selected = st.multiselect("תרחישים להשוואה:", options=scenarios['מזהה'].tolist())
+    if len(selected) >= 2:
+        st.dataframe(store.compare(selected))
+
+    scenario_id = st.selectbox("טעינת תרחיש:", options=scenarios['מזהה'].tolist())
+    if st.button("טען תרחיש"):
+        recalculate(store.get(scenario_id)['params'])
+        st.rerun()
+
+# הצגת טאב רשת הסניפים - חישוב מאוחד של סניפים רבים
+def render_portfolio_tab():
+    st.header("רשת סניפים")
+    st.write("כל סניף מחושב מהפרמטרים הנוכחיים עם הדריסות שלו. עמודות אופציונליות: "
+             f"'שם' ו-'{OPENING_YEAR_COLUMN}' (0 - פתיחה מיידית).")
+
+    source = st.radio("מקור הסניפים:", ("קובץ CSV", "מאגר התרחישים (התרחיש האחרון של כל סניף)"))
+    if source == "קובץ CSV":
+        uploaded = st.file_uploader("קובץ סניפים", type=['csv'])
+        if uploaded is None:
+            return
+        branches = pd.read_csv(uploaded)
+    else:
+        branches = get_scenario_store().latest_by_branch()
+    if branches.empty:
+        st.warning("לא נמצאו סניפים.")
+        return
 
-# פונקציה לייצוא תוצאות לאקסל
-def generate_excel(results):
-    if not results:
-        return None
+    portfolio = evaluate_portfolio(default_params, branches)
+    consolidated = portfolio['מאוחד']
+    st.dataframe(pd.DataFrame({
+        'מדד': list(consolidated),
+        'ערך': format_numbers(list(consolidated.values()), missing='לא מוגדר'),
+    }))
+    st.plotly_chart(build_portfolio_cash_flow_figure(portfolio['תזרים שנתי']))
+    with st.expander("תזרים שנתי"):
+        st.dataframe(format_frame(portfolio['תזרים שנתי'], decimals={'סניפים פעילים': 0}))
+    with st.expander("תוצאות לפי סניף"):
+        st.dataframe(format_frame(portfolio['סניפים'], decimals={OPENING_YEAR_COLUMN: 0}, missing='לא מוגדר'))
+
+# בניית גיליונות הייצוא הנוספים. השורות נוצרות בהדרגה בזמן הכתיבה לקובץ
+def build_export_sheets(params, include_projection, include_grid, grid_param1, grid_param2, grid_points,
+                        progress=None):
+    sheets = []
+    if include_projection:
+        projection = project_cash_flows(params_to_matrix([params]))
+        sheets.append(('תחזית חודשית', projection_header(projection), iter_projection_rows(projection)))
+    if include_grid:
+        grid, axis_labels = sweep_grid(params, [
+            (grid_param1, sensitivity_range(params[grid_param1], points=grid_points)),
+            (grid_param2, sensitivity_range(params[grid_param2], points=grid_points)),
+        ], progress=progress)
+        sheets.append(('רשת רגישות', grid_header(axis_labels, 'רווח לפני מס'), iter_grid_rows(grid, axis_labels)))
+    return sheets
+
+# קובץ ייצוא גדול מזה לא מוגש מהדפדפן (Streamlit טוען את הקובץ לזיכרון כדי להגיש אותו)
+EXPORT_DOWNLOAD_MAX_SIZE = 64 * 1024 * 1024
+
+# ייצוא התוצאות והגיליונות הנוספים לאקסל (רץ ברקע). הקובץ נכתב לדיסק ומוחזר הנתיב שלו,
+# כך שהסשן לא מחזיק את כל הקובץ בזיכרון בין רענונים
+def export_excel(results, params, *sheet_options, progress=None):
+    fd, path = tempfile.mkstemp(prefix='gymboree_export_', suffix='.xlsx')
+    with generate_excel(results, build_export_sheets(params, *sheet_options, progress=progress)) as excel_io, \
+            os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(excel_io, f)
+    return path
+
+# כפתור הורדה לקובץ הייצוא מהדיסק. קובץ ייצוא קודם של הסשן נמחק, וקובץ גדול מדי
+# מופנה לייצוא משורת הפקודה
+def render_export_download(path):
+    previous = st.session_state.get('export_path')
+    if previous not in (None, path) and os.path.exists(previous):
+        os.remove(previous)
+    st.session_state['export_path'] = path
+    if not os.path.exists(path):
+        st.warning("קובץ הייצוא כבר אינו זמין - יש לייצא מחדש.")
+        return
+    size = os.path.getsize(path)
+    if size > EXPORT_DOWNLOAD_MAX_SIZE:
+        st.warning(f"קובץ הייצוא גדול מדי להורדה מהדפדפן ({size / 1024 ** 2:,.0f} MB). הקובץ נשמר ב-{path}; "
+                   "לרשתות גדולות מומלץ להריץ את הייצוא משורת הפקודה (batch_runner.py).")
+        return
+    with open(path, 'rb') as f:
+        st.download_button(
+            label="הורדת קובץ אקסל",
+            data=f,
+            file_name="gymboree_business_plan_results.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
 
-    # יצירת DataFrame לתוצאות כלליות
-    general_data = pd.DataFrame([
-        {'מדד': key, 'ערך': value}
-        for key, value in results.items() if not isinstance(value, dict)
-    ])
+# מספר ההרצות האחרונות שנשמרות לייצוא המדידות
+DIAGNOSTICS_HISTORY = 50
+
+# הצגת פאנל אבחון ביצועים בסרגל הצד
+def render_diagnostics_panel(rerun_profiler):
+    if 'session_profiler' not in st.session_state:
+        st.session_state['session_profiler'] = Profiler()
+        st.session_state['profiler_history'] = []
+    session_profiler = st.session_state['session_profiler']
+    history = st.session_state['profiler_history']
+    session_profiler.merge(rerun_profiler)
+    history.append(rerun_profiler)
+    del history[:-DIAGNOSTICS_HISTORY]
+
+    if not st.sidebar.checkbox("הצג אבחון ביצועים"):
+        return
 
-    # יצירת DataFrame להכנסות לפי קטגוריות
-    income_df = pd.DataFrame(list(results['הכנסות לפי קטגוריות'].items()), columns=['קטגוריה', 'סכום'])
-
-    # יצירת DataFrame להוצאות לפי קטגוריות
-    expense_df = pd.DataFrame(list(results['הוצאות לפי קטגוריות'].items()), columns=['קטגוריה', 'סכום'])
-
-    # כתיבת הנתונים לאקסל
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        general_data.to_excel(writer, sheet_name='תוצאות כלליות', index=False)
-        income_df.to_excel(writer, sheet_name='הכנסות לפי קטגוריות', index=False)
-        expense_df.to_excel(writer, sheet_name='הוצאות לפי קטגוריות', index=False)
-    output.seek(0)
-    return output
-
-# קולבק לניתוח רגישות חד-פרמטרי
-def update_sensitivity_graph(param, store_data):
-    if not store_data or 'params' not in store_data:
-        return {}
-    params = store_data['params']
-    if param not in params:
-        return {}
-    # טווח שינוי של +/- 20%
-    base_value = params.get(param, default_params.get(param, 1))
-    if base_value == 0:
-        param_values = np.array([0])
-    else:
-        param_values = np.linspace(base_value * 0.8, base_value * 1.2, 10)
-    profits = []
-    for val in param_values:
-        temp_params = params.copy()
-        temp_params[param] = val
-        try:
-            res = calculate_results(temp_params)
-            profits.append(res['רווח לפני מס'])
-        except KeyError as e:
-            # אם יש פרמטר חסר, נמשיך בלי להוסיף
-            print(f"Missing key: {e}")
-            profits.append(0)
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=param_values, y=profits, mode='lines+markers', name='רווח לפני מס'))
-    fig.update_layout(
-        title=f'ניתוח רגישות - {param}',
-        xaxis_title=f"{param} (ש״ח)" if 'עלות' in param or 'מחיר' in param else param,
-        yaxis_title='רווח לפני מס (ש״ח)',
-        font=dict(size=14),
-        hovermode="x unified"
+    with st.sidebar.expander("הרצה נוכחית", expanded=True):
+        st.dataframe(pd.DataFrame(rerun_profiler.to_rows()).round(3))
+    with st.sidebar.expander(f"כל הסשן ({len(history)} הרצות אחרונות נשמרות)"):
+        st.dataframe(pd.DataFrame(session_profiler.to_rows()).round(3))
+    if 'incremental_model' in st.session_state:
+        model = st.session_state['incremental_model']
+        with st.sidebar.expander("גרף המודל"):
+            st.caption(f"חושבו מחדש בעדכון האחרון: {len(model.last_recomputed)} מתוך {len(model.graph.order)} צמתים")
+            recomputed = set(model.last_recomputed)
+            st.dataframe(pd.DataFrame([dict(row, **{'חושב מחדש': row['צומת'] in recomputed})
+                                       for row in model.graph.describe()]))
+    st.sidebar.download_button(
+        label="ייצוא מדידות (JSON)",
+        data=export_json(rerun_profiler, session_profiler, history),
+        file_name="gymboree_diagnostics.json",
+        mime="application/json"
     )
-    return fig
-
-# קולבק לניתוח רגישות מתקדם (הצלבה בין פרמטרים)
-def update_advanced_sensitivity_graph(param1, param2, store_data):
-    if not store_data or 'params' not in store_data:
-        return {}
-    params = store_data['params']
-    if not param1 or not param2:
-        return {}
-    # טווח שינוי של +/- 20% לכל פרמטר
-    base_value1 = params.get(param1, default_params.get(param1, 1))
-    base_value2 = params.get(param2, default_params.get(param2, 1))
-    if base_value1 == 0:
-        param1_values = np.array([0])
-    else:
-        param1_values = np.linspace(base_value1 * 0.8, base_value1 * 1.2, 10)
-    if base_value2 == 0:
-        param2_values = np.array([0])
-    else:
-        param2_values = np.linspace(base_value2 * 0.8, base_value2 * 1.2, 10)
-    combinations, profits = perform_advanced_sensitivity_analysis(params, param1, param2, param1_values, param2_values)
-
-    if not combinations:
-        return {}
-
-    # יצירת DataFrame
-    df = pd.DataFrame(combinations, columns=[param1, param2])
-    df['רווח לפני מס'] = profits
-
-    # יצירת heatmap
-    fig = px.density_heatmap(
-        df,
-        x=param1,
-        y=param2,
-        z='רווח לפני מס',
-        color_continuous_scale='Viridis',
-        title=f'ניתוח רגישות מתקדם - {param1} מול {param2}',
-        labels={param1: param1, param2: param2, 'רווח לפני מס': 'רווח לפני מס (ש״ח)'},
-        nbinsx=10,
-        nbinsy=10
-    )
-    fig.update_layout(font=dict(size=14))
-    return fig
-
-# פריסת האפליקציה (מותאם ל-Streamlit)
-if 'results' not in st.session_state:
-    render_parameters_tab()
-else:
-    results = st.session_state['results']
-    tab = st.sidebar.radio("בחר טאב:", ("תוצאות", "גרפים"))
-    if tab == "תוצאות":
-        render_results_tab(results)
-
-        # כפתור לייצוא לאקסל
-        if st.button("ייצא לאקסל"):
-            excel_io = generate_excel(results)
-            st.download_button(
-                label="הורדת קובץ אקסל",
-                data=excel_io,
-                file_name="gymboree_business_plan_results.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-    elif tab == "גרפים":
-        render_charts_tab(results)
+
+# פריסת האפליקציה (מותאם ל-Streamlit) - כל הרצה נמדדת בנפרד
+with profiling() as rerun_profiler:
+    with stage('rerun'):
+        if 'results' not in st.session_state:
+            render_parameters_tab()
+        else:
+            results = st.session_state['results']
+            # טאב הפרמטרים נשאר זמין אחרי החישוב; ברירת המחדל היא התוצאות
+            tab = st.sidebar.radio("בחר טאב:", ("פרמטרים", "תוצאות", "גרפים", "סימולציה", "איתור יעד",
+                                                  "תרחישים", "רשת סניפים", "רגישות גלובלית",
+                                                  "אופטימיזציה"), index=1)
+            cache_stats = result_cache.stats()
+            st.sidebar.caption(f"מטמון תוצאות: {cache_stats['hits']} פגיעות, {cache_stats['misses']} החטאות, "
+                               f"{cache_stats['size']}/{cache_stats['maxsize']} רשומות")
+            if tab == "פרמטרים":
+                render_parameters_tab()
+            elif tab == "תוצאות":
+                render_results_tab(results)
+                render_save_scenario(results)
+
+                # כפתור לייצוא לאקסל
+                with st.expander("גיליונות נוספים לייצוא"):
+                    include_projection = st.checkbox("תחזית תזרים חודשית")
+                    include_grid = st.checkbox("רשת ניתוח רגישות מלאה")
+                    numeric_params = [key for key in default_params if isinstance(default_params[key], (int, float))]
+                    grid_param1 = st.selectbox("פרמטר 1:", options=numeric_params, key='export_grid_param1')
+                    grid_param2 = st.selectbox("פרמטר 2:", options=numeric_params, index=1, key='export_grid_param2')
+                    grid_points = st.number_input("מספר נקודות לכל פרמטר", value=100, min_value=2, max_value=1000)
+
+                sheet_options = (include_projection, include_grid, grid_param1, grid_param2, int(grid_points))
+                job = background_job('export', (results, default_params, sheet_options), st.button("ייצא לאקסל"),
+                                     export_excel, results, default_params, *sheet_options)
+                if job is not None:
+                    render_job('export', render_export_download)
+            elif tab == "גרפים":
+                render_charts_tab(results)
+            elif tab == "סימולציה":
+                render_monte_carlo_tab()
+            elif tab == "איתור יעד":
+                render_goal_seek_tab()
+            elif tab == "תרחישים":
+                render_scenarios_tab()
+            elif tab == "רשת סניפים":
+                render_portfolio_tab()
+            elif tab == "רגישות גלובלית":
+                render_global_sensitivity_tab()
+            elif tab == "אופטימיזציה":
+                render_optimization_tab()
+
+render_diagnostics_panel(rerun_profiler)
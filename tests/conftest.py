@@ -0,0 +1,5 @@
+import os
+import sys
+
+# המודולים נמצאים בשורש המאגר (ללא חבילה)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
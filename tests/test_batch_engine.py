@@ -0,0 +1,56 @@
+import numpy as np
+
+from amortization import loan_payment_totals, total_loan_payments
+from batch_engine import (IRR_KEY, PARAM_INDEX, PARAM_KEYS, RESULT_KEYS, calculate_irr_arrays,
+                          calculate_results_batch, params_to_matrix)
+from model_core import calculate_results, default_params
+
+
+# תרחישים אקראיים: חצי מהפרמטרים משתנים (שלמים ועשרוניים), כולל ריבית ומשך מימון
+def random_scenarios(n, seed=0):
+    rng = np.random.default_rng(seed)
+    scenarios = []
+    for index in range(n):
+        params = dict(default_params)
+        for key in PARAM_KEYS:
+            if rng.random() < 0.5:
+                value = params[key] * rng.uniform(0.5, 1.5)
+                params[key] = value if rng.random() < 0.5 else int(value)
+        params['אורך מימון (שנים)'] = int(rng.integers(1, 20)) if index % 2 else float(rng.uniform(1, 20))
+        if index % 7 == 0:
+            params['ריבית שנתית על הלוואה (%)'] = 0
+        if index % 50 == 0:
+            params['מספר מבקרים ביום רגיל'] = params['מספר מבקרים ביום חופשה/חג'] = 0
+        scenarios.append(params)
+    return scenarios
+
+
+def test_batch_is_bit_identical_to_calculate_results():
+    scenarios = random_scenarios(2000)
+    expected = [calculate_results(params) for params in scenarios]
+    results = calculate_results_batch(params_to_matrix(scenarios))
+    for key in RESULT_KEYS:
+        column = np.array([row[key] for row in expected], dtype=np.float64)
+        np.testing.assert_array_equal(column.view(np.int64), results[key].view(np.int64), err_msg=key)
+
+
+def test_batch_irr_matches_calculate_results():
+    scenarios = random_scenarios(500, seed=1)
+    matrix = params_to_matrix(scenarios)
+    batch_irr = calculate_irr_arrays(calculate_results_batch(matrix), matrix[:, PARAM_INDEX['אורך מימון (שנים)']])
+    expected = np.array([np.nan if row[IRR_KEY] is None else row[IRR_KEY]
+                         for row in map(calculate_results, scenarios)])
+    np.testing.assert_allclose(batch_irr, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_loan_payment_totals_are_bit_identical_to_scalar_path():
+    rng = np.random.default_rng(2)
+    amount = rng.uniform(0, 2e6, 5000)
+    rate = np.where(rng.random(5000) < 0.1, 0.0, rng.uniform(0, 0.3, 5000))
+    months = rng.integers(0, 360, 5000).astype(np.float64)
+    grace = rng.integers(0, 24, 5000).astype(np.float64)
+    balloon = np.where(rng.random(5000) < 0.3, amount * 0.2, 0.0)
+    expected = np.array([total_loan_payments(*row) for row in zip(amount.tolist(), rate.tolist(), months.tolist(),
+                                                                  grace.tolist(), balloon.tolist())])
+    totals = loan_payment_totals(amount, rate, months, grace, balloon)
+    np.testing.assert_array_equal(expected.view(np.int64), totals.view(np.int64))
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_engine import IRR_KEY, PARAM_KEYS, RESULT_KEYS, calculate_results_batch, params_to_matrix
+from batch_runner import IRR_STATUS_COLUMN, NAME_COLUMN, read_scenarios, run_batch
+from model_core import default_params
+
+
+# תרחישים שבחלקם ה-IRR אינו מוגדר (רווח שלילי)
+@pytest.fixture
+def scenarios_csv(tmp_path):
+    frame = pd.DataFrame({
+        NAME_COLUMN: ['a', 'b', 'c', 'd'],
+        'מספר מבקרים ביום רגיל': [300, 150, 0, 450.5],
+        'מספר מבקרים ביום חופשה/חג': [500, 200, 0, 600],
+        'אורך מימון (שנים)': [10, 5, 10, 7.5],
+    })
+    path = tmp_path / 'scenarios.csv'
+    frame.to_csv(path, index=False)
+    return path, frame
+
+
+def expected_results(frame):
+    params = [{**default_params, **{key: row[key] for key in frame.columns if key in PARAM_KEYS}}
+              for _, row in frame.iterrows()]
+    return calculate_results_batch(params_to_matrix(params))
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'json', 'jsonl'])
+def test_round_trip_matches_batch_engine(scenarios_csv, tmp_path, file_format):
+    input_path, frame = scenarios_csv
+    output_path = tmp_path / f'results.{file_format}'
+    assert run_batch(str(input_path), str(output_path), chunk_size=3, n_workers=1) == len(frame)
+
+    output = pd.concat(read_scenarios(str(output_path)), ignore_index=True)
+    assert output[NAME_COLUMN].astype(str).tolist() == frame[NAME_COLUMN].tolist()
+    expected = expected_results(frame)
+    for key in RESULT_KEYS:
+        np.testing.assert_allclose(output[key].to_numpy(dtype=np.float64), expected[key], rtol=1e-12, err_msg=key)
+
+
+def test_json_output_is_valid_json_with_nulls(scenarios_csv, tmp_path):
+    input_path, frame = scenarios_csv
+    output_path = tmp_path / 'results.json'
+    run_batch(str(input_path), str(output_path), chunk_size=3, n_workers=1)
+
+    with open(output_path, encoding='utf-8') as f:
+        records = json.loads(f.read(), parse_constant=lambda token: pytest.fail(f"invalid JSON token {token}"))
+    assert len(records) == len(frame)
+    for record in records:
+        converged = record[IRR_STATUS_COLUMN] == 'converged'
+        assert isinstance(record[IRR_KEY], float) if converged else record[IRR_KEY] is None
+    assert records[0][IRR_STATUS_COLUMN] == 'converged'
+
+
+def test_parquet_round_trip(scenarios_csv, tmp_path):
+    pytest.importorskip('pyarrow')
+    input_path, frame = scenarios_csv
+    output_path = tmp_path / 'results.parquet'
+    run_batch(str(input_path), str(output_path), chunk_size=3, n_workers=1)
+    output = pd.concat(read_scenarios(str(output_path)), ignore_index=True)
+    np.testing.assert_allclose(output['רווח לפני מס'], expected_results(frame)['רווח לפני מס'], rtol=1e-12)
+
+
+def test_process_pool_gives_same_output(scenarios_csv, tmp_path):
+    input_path, _ = scenarios_csv
+    run_batch(str(input_path), str(tmp_path / 'serial.csv'), chunk_size=1, n_workers=1)
+    run_batch(str(input_path), str(tmp_path / 'parallel.csv'), chunk_size=1, n_workers=2)
+    assert (tmp_path / 'serial.csv').read_text(encoding='utf-8') == (tmp_path / 'parallel.csv').read_text(encoding='utf-8')
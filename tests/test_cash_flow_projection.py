@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from batch_engine import params_to_matrix
+from cash_flow_projection import (FLAT_HOLIDAY_DAYS_BY_MONTH, FLAT_REGULAR_DAYS_BY_MONTH, annual_totals,
+                                  project_cash_flows)
+from model_core import calculate_results, default_params
+from test_batch_engine import random_scenarios
+
+
+@pytest.fixture(params=['seasonal', 'flat'])
+def day_profile(request):
+    if request.param == 'flat':
+        return {'regular_days_by_month': FLAT_REGULAR_DAYS_BY_MONTH, 'holiday_days_by_month': FLAT_HOLIDAY_DAYS_BY_MONTH}
+    return {}
+
+
+def test_annual_totals_match_calculate_results(day_profile):
+    scenarios = random_scenarios(50, seed=3)
+    projection = project_cash_flows(params_to_matrix(scenarios), years=20, **day_profile)
+    for row, params in enumerate(scenarios):
+        results = calculate_results(params)
+        for key, model_key in (('הכנסות', 'הכנסות שנתיות'), ('הוצאות משתנות', 'הוצאות משתנות')):
+            np.testing.assert_allclose(annual_totals(projection[key])[row], results[model_key], rtol=1e-12, atol=1e-6)
+        # הפחת אינו תזרימי וההון החוזר מוצא בחודש 0, ולכן אינם בהוצאות הקבועות החודשיות
+        annual_depreciation = results['עלויות הקמה'] * params['שיעור פחת שנתי (%)'] / 100
+        fixed = results['הוצאות קבועות'] - annual_depreciation - params['הון חוזר לתפעול ראשוני']
+        np.testing.assert_allclose(annual_totals(projection['הוצאות קבועות'])[row], fixed, rtol=1e-12, atol=1e-6)
+        # אורך המימון קצר מהאופק, כך שכל התשלומים נכללים
+        assert projection['תשלומי הלוואה'][row].sum() == pytest.approx(results['תשלומי הלוואה'], rel=1e-9, abs=1e-6)
+
+
+def test_cumulative_cash_flow_and_loan_balance():
+    projection = project_cash_flows(params_to_matrix([default_params]), years=10)
+    start = projection['תקבולי הלוואה'] - projection['השקעה ראשונית']
+    np.testing.assert_allclose(projection['תזרים מצטבר'][0],
+                               start[0] + np.cumsum(projection['תזרים נטו'][0]), rtol=1e-12)
+    np.testing.assert_allclose(projection['ריבית'] + projection['קרן'], projection['תשלומי הלוואה'], rtol=1e-12,
+                               atol=1e-9)
+    assert projection['יתרת הלוואה'][0, -1] == pytest.approx(0, abs=1e-6)
+
+
+def test_growth_is_applied_once_per_year():
+    projection = project_cash_flows(params_to_matrix([default_params]), years=3, visitor_growth=0.1,
+                                    price_growth=0.05)
+    income = annual_totals(projection['הכנסות'])[0]
+    np.testing.assert_allclose(income[1:] / income[:-1], 1.1 * 1.05, rtol=1e-12)
+
+
+def test_ramp_up_reduces_only_the_first_months():
+    base = project_cash_flows(params_to_matrix([default_params]), years=2)['הכנסות'][0]
+    ramped = project_cash_flows(params_to_matrix([default_params]), years=2, ramp_up_months=6,
+                                ramp_up_start=0.5)['הכנסות'][0]
+    assert ramped[0] == pytest.approx(base[0] * 0.5)
+    assert (ramped[:6] < base[:6]).all()
+    np.testing.assert_array_equal(ramped[6:], base[6:])
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from global_sensitivity import _estimate, parameter_bounds, sobol_directions, sobol_indices, sobol_points
+from model_core import default_params
+
+PROFIT_KEY = 'רווח לפני מס'
+RENT_KEY = 'שכר דירה חודשי'
+CEO_KEY = 'משכורת מנכ"ל'
+
+
+# מדדי סובול לפונקציה אנליטית על [0, 1]^P, באותה שיטת סלטלי כמו ב-_evaluate_chunk
+def analytic_indices(function, n_params, n_samples=1 << 14):
+    directions = sobol_directions(2 * n_params)
+    points = sobol_points(np.arange(n_samples), directions)
+    a, b = points[:, :n_params], points[:, n_params:]
+    blocks = [a, b]
+    for i in range(n_params):
+        block = a.copy()
+        block[:, i] = b[:, i]
+        blocks.append(block)
+    return _estimate(np.stack([function(block) for block in blocks]))
+
+
+def test_sobol_points_are_stratified():
+    points = sobol_points(np.arange(1 << 10), sobol_directions(6))
+    assert ((points > 0) & (points < 1)).all()
+    # כל 2^k הנקודות הראשונות ממלאות תא אחד בכל אחד מ-2^k התאים בכל ממד
+    for dimension in range(points.shape[1]):
+        cells = np.floor(points[:, dimension] * (1 << 10)).astype(int)
+        assert np.array_equal(np.sort(cells), np.arange(1 << 10))
+    # הנקודות תלויות רק באינדקס, ולא במקטע שבו חושבו
+    np.testing.assert_array_equal(sobol_points(np.arange(100, 300), sobol_directions(6)), points[100:300])
+
+
+def test_additive_function_indices():
+    weights = np.array([1.0, 2.0, 3.0])
+    first_order, total = analytic_indices(lambda x: x @ weights, 3)
+    expected = weights ** 2 / np.sum(weights ** 2)
+    np.testing.assert_allclose(first_order, expected, atol=1e-2)
+    np.testing.assert_allclose(total, expected, atol=1e-2)
+
+
+def test_product_function_indices():
+    # f = x1 * x2: V = 7/144, V1 = V2 = 3/144, ולכן S1 = 3/7 ו-ST = 4/7 לכל אחד
+    first_order, total = analytic_indices(lambda x: x[:, 0] * x[:, 1], 2)
+    np.testing.assert_allclose(first_order, [3 / 7, 3 / 7], atol=1e-2)
+    np.testing.assert_allclose(total, [4 / 7, 4 / 7], atol=1e-2)
+
+
+def test_model_indices_for_additive_fixed_costs():
+    # הרווח ליניארי ואדיטיבי בשכר הדירה ובמשכורת המנכ"ל, וטווח כל אחד יחסי לערך הבסיס.
+    # אומדן S1 רועש יותר מ-ST כשממוצע המדד רחוק מאפס, ולכן הסבולת שלו רחבה יותר
+    indices = sobol_indices(default_params, n_samples=16384, params=[RENT_KEY, CEO_KEY], metrics=[PROFIT_KEY],
+                            n_bootstrap=20, n_workers=1)[PROFIT_KEY]
+    squares = {key: default_params[key] ** 2 for key in (RENT_KEY, CEO_KEY)}
+    for key, square in squares.items():
+        expected = square / sum(squares.values())
+        assert indices.loc[key, 'S1'] == pytest.approx(expected, abs=1e-2)
+        assert indices.loc[key, 'ST'] == pytest.approx(expected, abs=1e-3)
+    assert (indices['S1_conf'] >= 0).all() and (indices['ST_conf'] >= 0).all()
+    assert indices['ST'].is_monotonic_decreasing
+
+
+def test_result_does_not_depend_on_worker_count_or_chunks():
+    kwargs = {'n_samples': 2048, 'params': [RENT_KEY, CEO_KEY, 'מספר מבקרים ביום רגיל'], 'n_bootstrap': 10}
+    serial = sobol_indices(default_params, chunk_size=2048, n_workers=1, **kwargs)
+    parallel = sobol_indices(default_params, chunk_size=512, n_workers=2, **kwargs)
+    for metric, table in serial.items():
+        np.testing.assert_allclose(parallel[metric].to_numpy(), table.to_numpy(), rtol=1e-12)
+        assert list(parallel[metric].index) == list(table.index)
+
+
+def test_parameter_bounds():
+    ranges = parameter_bounds(default_params, params=[RENT_KEY], spread=0.5, bounds={CEO_KEY: (1, 2)})
+    assert ranges == {RENT_KEY: (default_params[RENT_KEY] * 0.5, default_params[RENT_KEY] * 1.5), CEO_KEY: (1.0, 2.0)}
+    with pytest.raises(ValueError, match='Unknown parameters'):
+        parameter_bounds(default_params, params=['פרמטר לא קיים'])
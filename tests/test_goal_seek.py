@@ -0,0 +1,23 @@
+import numpy as np
+
+from batch_engine import params_to_matrix
+from goal_seek import STATUS_CONVERGED, STATUS_NO_BRACKET, goal_seek
+from model_core import calculate_results, default_params
+
+
+def test_goal_seek_hits_target():
+    targets = np.array([3e6, 8e6, 2e7])
+    matrix = params_to_matrix([default_params] * len(targets))
+    solution = goal_seek(matrix, 'מספר מבקרים ביום רגיל', targets)
+    assert (solution['status'] == STATUS_CONVERGED).all()
+    for value, target in zip(solution['value'], targets):
+        profit = calculate_results({**default_params, 'מספר מבקרים ביום רגיל': value})['רווח לפני מס']
+        assert abs(profit - target) <= 1e-6 * target
+
+
+def test_goal_seek_reports_unreachable_target():
+    # שכר דירה אינו יכול להעלות את הרווח מעל הרווח בשכר דירה 0
+    best = calculate_results({**default_params, 'שכר דירה חודשי': 0})['רווח לפני מס']
+    solution = goal_seek(default_params, 'שכר דירה חודשי', best + 1e6)
+    assert solution['status'][0] == STATUS_NO_BRACKET
+    assert np.isnan(solution['value'][0])
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from batch_engine import IRR_KEY
+from grid_engine import sensitivity_range, sweep_grid
+from model_core import calculate_results, default_params
+
+AXES = [
+    ('מספר מבקרים ביום רגיל', sensitivity_range(300, points=5)),
+    ('מחיר כניסה ליום רגיל', sensitivity_range(50, points=4)),
+    ('אורך מימון (שנים)', [5, 10, 12.5]),
+]
+
+
+def test_grid_matches_calculate_results():
+    grid, labels = sweep_grid(default_params, AXES)
+    assert grid.shape == (5, 4, 3)
+    for index in np.ndindex(grid.shape):
+        params = dict(default_params)
+        params.update({param: values[i] for (param, values), i in zip(labels, index)})
+        assert grid[index] == calculate_results(params)['רווח לפני מס']
+
+
+def test_chunking_does_not_change_result():
+    full, _ = sweep_grid(default_params, AXES)
+    progress = []
+    chunked, _ = sweep_grid(default_params, AXES, chunk_size=7,
+                            progress=lambda done, total, partial: progress.append((done, total)))
+    np.testing.assert_array_equal(full, chunked)
+    assert progress[-1] == (60, 60) and len(progress) == 9
+
+
+def test_out_array_is_filled_in_place(tmp_path):
+    out = np.lib.format.open_memmap(tmp_path / 'grid.npy', mode='w+', dtype=np.float64, shape=(5, 4, 3))
+    grid, _ = sweep_grid(default_params, AXES, out=out, chunk_size=11)
+    assert grid is out
+    np.testing.assert_array_equal(np.asarray(out), sweep_grid(default_params, AXES)[0])
+
+
+def test_out_array_with_wrong_shape_raises():
+    with pytest.raises(ValueError):
+        sweep_grid(default_params, AXES, out=np.empty((4, 5, 3)))
+
+
+def test_irr_output_matches_calculate_results():
+    grid, labels = sweep_grid(default_params, AXES[:2], output=IRR_KEY, chunk_size=6)
+    for index in np.ndindex(grid.shape):
+        params = dict(default_params)
+        params.update({param: values[i] for (param, values), i in zip(labels, index)})
+        expected = calculate_results(params)[IRR_KEY]
+        assert grid[index] == pytest.approx(np.nan if expected is None else expected, rel=1e-9, nan_ok=True)
+
+
+def test_later_axis_overrides_repeated_parameter():
+    grid, _ = sweep_grid(default_params, [('מספר מבקרים ביום רגיל', [100, 200]), ('מספר מבקרים ביום רגיל', [300])])
+    assert grid.shape == (2, 1)
+    np.testing.assert_array_equal(grid[:, 0], calculate_results(default_params)['רווח לפני מס'])
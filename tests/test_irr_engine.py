@@ -0,0 +1,47 @@
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+from irr_engine import annuity_irr, irr
+
+
+# תזרימים קונבנציונליים: השקעה בזמן 0 ותזרימים חיוביים אחריה
+def test_irr_matches_npf_irr_on_conventional_flows():
+    rng = np.random.default_rng(0)
+    flows = np.column_stack([-rng.uniform(1e5, 1e6, 200), rng.uniform(1e4, 3e5, (200, 10))])
+    expected = np.array([npf.irr(row) for row in flows])
+    np.testing.assert_allclose(irr(flows)['rate'], expected, rtol=1e-9)
+
+
+def test_annuity_irr_matches_npf_irr():
+    rng = np.random.default_rng(1)
+    setup_costs = rng.uniform(1e5, 1e6, 100)
+    profit = rng.uniform(1e4, 4e5, 100)
+    years = rng.integers(1, 20, 100)
+    expected = np.array([npf.irr([-cost] + [gain] * int(n)) for cost, gain, n in zip(setup_costs, profit, years)])
+    np.testing.assert_allclose(annuity_irr(setup_costs, profit, years)['rate'], expected, rtol=1e-9)
+
+
+# תזרים שה-NPV שלו מתאפס בדיוק בשיעורים הנתונים: מכפלת (x - 1/(1+r)) כש-x = 1/(1+rate)
+def flows_with_roots(rates):
+    return np.poly(1 / (1 + np.asarray(rates)))[::-1]
+
+
+def test_irr_matches_npf_irr_on_multi_root_flows():
+    rng = np.random.default_rng(2)
+    flows = []
+    for _ in range(200):
+        negative = rng.uniform(-0.6, -0.02)
+        positive = rng.uniform(0.02, 0.6)
+        # שורש שלישי רחוק, כדי שיהיו גם תזרימים עם שני שורשים באותו צד
+        far = rng.choice([-0.8, 0.9])
+        flows.append(flows_with_roots([negative, positive, far]))
+    flows = np.array(flows)
+    expected = np.array([npf.irr(row) for row in flows])
+    np.testing.assert_allclose(irr(flows)['rate'], expected, rtol=1e-8)
+
+
+def test_irr_prefers_positive_root_on_tie():
+    assert irr(flows_with_roots([-0.04, 0.04]))['rate'][0] == pytest.approx(0.04, rel=1e-10)
+    assert irr(flows_with_roots([-0.2, 0.03]))['rate'][0] == pytest.approx(0.03, rel=1e-10)
+    assert irr(flows_with_roots([-0.03, 0.2]))['rate'][0] == pytest.approx(-0.03, rel=1e-10)
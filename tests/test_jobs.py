@@ -0,0 +1,79 @@
+import threading
+
+import jobs
+from jobs import STATUS_CANCELLED, STATUS_DONE, JobCancelled, JobManager, process_pool
+
+
+# פונקציה שמדווחת על מקטעים עד שמשחררים אותה
+def blocking_task(release, progress=None):
+    for done in range(1000):
+        progress(done, 1000)
+        if release.wait(0.01):
+            return done
+    return None
+
+
+def square(value, progress=None):
+    return value * value
+
+
+def test_job_returns_result():
+    manager = JobManager(max_workers=1)
+    job = manager.submit(square, 7)
+    assert job.wait(5) == 49
+    assert job.status == STATUS_DONE and job.progress == 1.0
+    manager.shutdown()
+
+
+def test_cancel_stops_job_at_next_report():
+    manager = JobManager(max_workers=1)
+    job = manager.submit(blocking_task, threading.Event())
+    job.cancel()
+    try:
+        job.wait(5)
+    except JobCancelled:
+        pass
+    assert job.status == STATUS_CANCELLED
+    manager.shutdown()
+
+
+def test_new_job_with_same_key_cancels_previous():
+    manager = JobManager(max_workers=2)
+    first = manager.submit(blocking_task, threading.Event(), key='session:kind')
+    second = manager.submit(square, 3, key='session:kind')
+    assert second.wait(5) == 9
+    try:
+        first.wait(5)
+    except JobCancelled:
+        pass
+    assert first.status == STATUS_CANCELLED
+    assert manager.latest('session:kind') is second
+    manager.shutdown()
+
+
+def test_finished_jobs_are_pruned_after_ttl(monkeypatch):
+    manager = JobManager(max_workers=1)
+    old = manager.submit(square, 2, key='old-session:kind')
+    old.wait(5)
+    monkeypatch.setattr(jobs, 'FINISHED_JOB_TTL', -1)
+    manager.submit(square, 3, key='new-session:kind').wait(5)
+    assert manager.latest('old-session:kind') is None
+    assert manager.get(old.id) is None
+    manager.shutdown()
+
+
+def test_finished_keys_are_capped(monkeypatch):
+    monkeypatch.setattr(jobs, 'FINISHED_KEYS_KEPT', 3)
+    manager = JobManager(max_workers=1)
+    for index in range(10):
+        manager.submit(square, index, key=f'session{index}:kind').wait(5)
+    manager.submit(square, 0, key='last:kind')
+    assert sum(manager.latest(f'session{index}:kind') is not None for index in range(10)) <= 3
+    assert len(manager.jobs()) <= 4
+    manager.shutdown()
+
+
+def test_process_pool_uses_spawn():
+    with process_pool(1) as executor:
+        assert executor.submit(pow, 3, 2).result(timeout=60) == 9
+        assert executor._mp_context.get_start_method() == 'spawn'
@@ -0,0 +1,26 @@
+import numpy as np
+
+from batch_engine import calculate_results_batch, params_to_matrix
+from model_core import ParamRecord, calculate_results, default_params
+
+RATE_KEY = 'ריבית שנתית על הלוואה (%)'
+
+
+# תוכנית שנשמרה לפני שנוספה הריבית על ההלוואה
+def params_without_rate():
+    params = dict(default_params)
+    del params[RATE_KEY]
+    return params
+
+
+def test_missing_rate_key_uses_default():
+    params = params_without_rate()
+    assert ParamRecord.from_dict(params) == ParamRecord.from_dict(default_params)
+    assert calculate_results(params) == calculate_results(default_params)
+
+
+def test_params_to_matrix_fills_missing_keys():
+    matrix = params_to_matrix([params_without_rate(), default_params])
+    np.testing.assert_array_equal(matrix[0], matrix[1])
+    results = calculate_results_batch(matrix)
+    assert results['רווח לפני מס'][0] == calculate_results(default_params)['רווח לפני מס']
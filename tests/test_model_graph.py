@@ -0,0 +1,26 @@
+from model_core import calculate_results, default_params
+from model_graph import IncrementalModel
+
+
+def test_incremental_update_equals_full_recompute():
+    model = IncrementalModel(default_params)
+    params = dict(default_params)
+    edits = [
+        {'מספר מבקרים ביום רגיל': 180},
+        {'ריבית שנתית על הלוואה (%)': 0},
+        {'אורך מימון (שנים)': 7.5},
+        {'מספר מבקרים ביום רגיל': 180.0},
+    ]
+    for edit in edits:
+        params.update(edit)
+        assert model.update(edit) == calculate_results(params)
+
+
+def test_sweep_restores_base_value():
+    model = IncrementalModel(default_params)
+    values = [100, 150, 200]
+    sweep = model.sweep('מספר מבקרים ביום רגיל', values, output='רווח לפני מס')
+    expected = [calculate_results({**default_params, 'מספר מבקרים ביום רגיל': value})['רווח לפני מס']
+                for value in values]
+    assert sweep == expected
+    assert model.results() == calculate_results(default_params)
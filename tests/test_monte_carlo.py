@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from model_core import default_params
+from monte_carlo import SIMULATION_METRICS, _evaluate_draws, run_monte_carlo, sample_distribution
+
+DISTRIBUTIONS = {
+    'מספר מבקרים ביום רגיל': {'type': 'normal', 'mean': 300, 'std': 60, 'min': 0},
+    'מספר מבקרים ביום חופשה/חג': {'type': 'triangular', 'left': 300, 'mode': 500, 'right': 700},
+    'מחיר כניסה ליום רגיל': {'type': 'lognormal', 'mean': np.log(50), 'sigma': 0.1},
+}
+N_DRAWS = 60_000
+CHUNK_SIZE = 20_000
+
+
+# כל ההגרלות של הסימולציה, עם אותם זרעים למקטעים כמו ב-run_monte_carlo
+def all_draws(seed=0):
+    _, chunks_seed = np.random.SeedSequence(seed).spawn(2)
+    chunks = [_evaluate_draws(default_params, DISTRIBUTIONS, np.random.default_rng(chunk_seed), CHUNK_SIZE)
+              for chunk_seed in chunks_seed.spawn(N_DRAWS // CHUNK_SIZE)]
+    return {metric: np.concatenate([chunk[metric] for chunk in chunks]) for metric in SIMULATION_METRICS}
+
+
+def test_summary_matches_raw_draws():
+    summary = run_monte_carlo(default_params, DISTRIBUTIONS, n_draws=N_DRAWS, chunk_size=CHUNK_SIZE, n_workers=1)
+    for metric, values in all_draws().items():
+        finite = values[np.isfinite(values)]
+        result = summary[metric]
+        assert result['count'] == finite.size
+        assert result['mean'] == pytest.approx(finite.mean(), rel=1e-9)
+        assert result['std'] == pytest.approx(finite.std(), rel=1e-6)
+        assert result['min'] == finite.min() and result['max'] == finite.max()
+        assert result['probability_negative'] == pytest.approx(np.mean(finite < 0))
+        # האחוזונים מחושבים מהיסטוגרמה - שגיאה של לכל היותר תא אחד
+        edges = result['histogram'][1]
+        for q in (5, 50, 95):
+            assert abs(result[f'P{q}'] - np.percentile(finite, q)) <= edges[1] - edges[0], (metric, q)
+
+
+def test_result_does_not_depend_on_worker_count():
+    serial = run_monte_carlo(default_params, DISTRIBUTIONS, n_draws=N_DRAWS, chunk_size=CHUNK_SIZE, n_workers=1)
+    parallel = run_monte_carlo(default_params, DISTRIBUTIONS, n_draws=N_DRAWS, chunk_size=CHUNK_SIZE, n_workers=2)
+    for metric in SIMULATION_METRICS:
+        for field in ('count', 'mean', 'std', 'P5', 'P50', 'P95'):
+            assert serial[metric][field] == pytest.approx(parallel[metric][field], rel=1e-12, nan_ok=True)
+        np.testing.assert_array_equal(serial[metric]['histogram'][0], parallel[metric]['histogram'][0])
+
+
+def test_lognormal_rejects_non_finite_mean():
+    rng = np.random.default_rng(0)
+    with pytest.raises(ValueError):
+        sample_distribution({'type': 'lognormal', 'mean': -np.inf, 'sigma': 0.2}, rng, 10)
+
+
+def test_unknown_distribution_parameter_raises():
+    with pytest.raises(ValueError):
+        run_monte_carlo(default_params, {'פרמטר לא קיים': {'type': 'normal', 'mean': 1, 'std': 1}}, n_draws=10)
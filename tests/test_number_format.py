@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from number_format import CURRENCY_SUFFIX, PERCENT_SUFFIX, format_frame, format_number, format_numbers
+
+
+# ערכים אקראיים בכל סדרי הגודל, חצאים מדויקים ולא מדויקים, ערכים גבוליים ו-inf
+def fuzzed_values(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    magnitudes = 10.0 ** rng.uniform(-4, 20, n)
+    signs = np.where(rng.random(n) < 0.3, -1.0, 1.0)
+    ties = np.round(rng.uniform(-1e6, 1e6, n // 4), 2) + 0.005
+    halves = rng.integers(-10 ** 6, 10 ** 6, n // 4) / 8
+    special = [0.0, -0.0, 0.005, 0.015, 0.125, 2.675, -0.001, -0.005, 999.995, 999_999.995, 1e16 - 0.5,
+               2 ** 53, -(2 ** 63), 9.999999999999999e17, 1e18, 1.5e300, np.inf, -np.inf, 5e-324]
+    return np.concatenate([signs * magnitudes, ties, halves, special])
+
+
+@pytest.mark.parametrize('decimals', [0, 1, 2, 3])
+def test_matches_python_format(decimals):
+    values = fuzzed_values(seed=decimals)
+    formatted = format_numbers(values, decimals)
+    expected = [f'{value:,.{decimals}f}' for value in values.tolist()]
+    mismatches = [(value, got, want) for value, got, want in zip(values.tolist(), formatted, expected) if got != want]
+    assert not mismatches, mismatches[:5]
+
+
+def test_suffix_missing_and_shape():
+    values = np.array([[1234.5, np.nan], [-0.5, 1e6]])
+    formatted = format_numbers(values, suffix=CURRENCY_SUFFIX, missing='—')
+    assert formatted.shape == values.shape
+    assert formatted.tolist() == [['1,234.50 ש״ח', '—'], ['-0.50 ש״ח', '1,000,000.00 ש״ח']]
+    # None בעמודת object נחשב ערך חסר, כמו ב-format_number
+    assert format_numbers([None, 12.345, float('nan')], suffix=PERCENT_SUFFIX).tolist() == ['', '12.35%', '']
+    assert format_number(None) == format_number(float('nan')) == ''
+    assert format_numbers([]).shape == (0,)
+
+
+def test_format_frame():
+    frame = pd.DataFrame({'שם': ['א', 'ב'], 'הכנסות': [1234567.891, None], 'ROI': [12.5, -3.25],
+                          'סניפים': [3, 1200]})
+    formatted = format_frame(frame, decimals={'סניפים': 0}, suffixes={'הכנסות': CURRENCY_SUFFIX, 'ROI': '%'},
+                             missing='-')
+    assert formatted['שם'].tolist() == ['א', 'ב']
+    assert formatted['הכנסות'].tolist() == ['1,234,567.89 ש״ח', '-']
+    assert formatted['ROI'].tolist() == ['12.50%', '-3.25%']
+    assert formatted['סניפים'].tolist() == ['3', '1,200']
+    # הטבלה המקורית לא משתנה
+    assert frame['ROI'].dtype == np.float64
+
+    only = format_frame(frame, columns=['ROI'])
+    assert only['ROI'].tolist() == ['12.50', '-3.25'] and only['סניפים'].tolist() == [3, 1200]
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from batch_engine import params_to_matrix
+from model_core import calculate_results, default_params
+from optimizer import (STATUS_CONVERGED, STATUS_MAX_ITERATIONS, STEP_TOLERANCE, evaluate_points, optimize,
+                       pareto_mask)
+
+PRICE_KEY = 'מחיר כניסה ליום רגיל'
+EVENTS_KEY = 'מספר אירועים פרטיים בחודש'
+PROFIT_KEY = 'רווח לפני מס'
+BREAKEVEN_KEY = 'נקודת איזון (מספר כרטיסים ליום)'
+BOUNDS = {PRICE_KEY: (30.0, 90.0), EVENTS_KEY: (0.0, 10.3)}
+
+
+def test_unconstrained_optimum_is_on_the_bounds():
+    # הרווח עולה במחיר ובמספר האירועים, ולכן המקסימום בגבול העליון
+    result = optimize(default_params, params=[], bounds=BOUNDS, n_starts=8)
+    assert result['status'] == STATUS_CONVERGED and result['feasible']
+    assert result['params'][PRICE_KEY] == pytest.approx(90, abs=STEP_TOLERANCE * 60)
+    # משתנה שלם מעוגל, גם בתוצאה וגם בטבלת נקודות ההתחלה
+    assert result['params'][EVENTS_KEY] == 10
+    assert (result['starts'][EVENTS_KEY] % 1 == 0).all()
+    assert result['value'] == pytest.approx(result['results'][PROFIT_KEY], rel=1e-12)
+    assert result['value'] >= calculate_results(default_params)[PROFIT_KEY]
+
+
+def test_parameter_and_result_constraints_are_respected():
+    result = optimize(default_params, params=[], bounds=BOUNDS, n_starts=8, constraints=[(PRICE_KEY, '<=', 60)])
+    assert result['feasible'] and result['violation'] == 0
+    assert 60 - STEP_TOLERANCE * 60 <= result['params'][PRICE_KEY] <= 60
+
+    # אילוץ על תוצאה: נקודת האיזון היומית יורדת עם המחיר, ולכן אילוץ >= מגביל את המחיר
+    floor = calculate_results({**default_params, PRICE_KEY: 70, EVENTS_KEY: 10})[BREAKEVEN_KEY]
+    result = optimize(default_params, params=[], bounds=BOUNDS, n_starts=8, constraints=[(BREAKEVEN_KEY, '>=', floor)])
+    assert result['feasible']
+    assert result['results'][BREAKEVEN_KEY] >= floor
+    assert result['params'][PRICE_KEY] == pytest.approx(70, abs=0.05)
+
+    # אילוץ ליניארי על צירוף של פרמטרים
+    result = optimize(default_params, params=[], bounds=BOUNDS, n_starts=8,
+                      constraints=[({PRICE_KEY: 1, EVENTS_KEY: 5}, '<=', 80)])
+    assert result['feasible']
+    assert result['params'][PRICE_KEY] + 5 * result['params'][EVENTS_KEY] <= 80
+
+
+def test_infeasible_constraints_minimise_violation():
+    result = optimize(default_params, params=[], bounds=BOUNDS, n_starts=8, constraints=[(PRICE_KEY, '<=', 10)])
+    assert not result['feasible']
+    # ההפרה המינימלית בטווח היא במחיר 30, יחסית לצד הימני
+    assert result['params'][PRICE_KEY] == pytest.approx(30, abs=STEP_TOLERANCE * 60)
+    assert result['violation'] == pytest.approx((30 - 10) / 10, abs=1e-3)
+
+
+def test_status_reports_max_iterations():
+    result = optimize(default_params, params=[], bounds=BOUNDS, n_starts=4, max_iterations=2)
+    assert set(result['starts']['סטטוס']) == {STATUS_MAX_ITERATIONS}
+    assert (result['starts']['איטרציות'] == 2).all()
+
+
+def test_result_does_not_depend_on_worker_count():
+    serial = optimize(default_params, params=[], bounds=BOUNDS, n_starts=6, n_workers=1)
+    parallel = optimize(default_params, params=[], bounds=BOUNDS, n_starts=6, n_workers=2)
+    assert serial['params'] == parallel['params']
+    assert serial['evaluations'] == parallel['evaluations']
+    assert serial['starts'].equals(parallel['starts'])
+
+
+def test_evaluate_points_violation():
+    base_row = params_to_matrix([default_params])[0]
+    points = np.array([[50.0], [70.0]])
+    values, violation = evaluate_points(base_row, [PRICE_KEY], points, PROFIT_KEY, [(PRICE_KEY, '<=', 60)])
+    np.testing.assert_array_equal(violation, [0, 10 / 60])
+    assert values[1] > values[0]
+    with pytest.raises(ValueError, match='operator'):
+        evaluate_points(base_row, [PRICE_KEY], points, PROFIT_KEY, [(PRICE_KEY, '<', 60)])
+    with pytest.raises(ValueError, match='Unknown objective'):
+        optimize(default_params, objective='no such metric')
+
+
+def test_pareto_mask():
+    expected = np.array([1.0, 2.0, 3.0, 2.0])
+    risk = np.array([1.0, 2.0, 3.0, 3.0])
+    # הנקודה האחרונה נשלטת על ידי השנייה (אותו ערך, סיכון גבוה יותר)
+    np.testing.assert_array_equal(pareto_mask(expected, risk), [True, True, True, False])
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_engine import IRR_KEY, PARAM_KEYS, RESULT_KEYS
+from model_core import calculate_results, default_params
+from portfolio import ADDITIVE_KEYS, OPENING_YEAR_COLUMN, branch_matrix, evaluate_portfolio
+from test_batch_engine import random_scenarios
+
+YEARS_KEY = 'אורך מימון (שנים)'
+
+
+# סניפים עם מספר שלם של שנות מימון - התזרים השנתי מוגדר היטב
+def _branches(n, seed):
+    branches = random_scenarios(n, seed=seed)
+    for params in branches:
+        params[YEARS_KEY] = int(params[YEARS_KEY])
+    return branches
+
+
+def test_branch_matrix_fills_missing_overrides_from_base():
+    overrides = pd.DataFrame({'שכר דירה חודשי': [100_000, np.nan], 'שם': ['א', 'ב']})
+    matrix = branch_matrix(default_params, overrides)
+    rent = PARAM_KEYS.index('שכר דירה חודשי')
+    assert matrix[:, rent].tolist() == [100_000, default_params['שכר דירה חודשי']]
+    others = [index for index in range(len(PARAM_KEYS)) if index != rent]
+    np.testing.assert_array_equal(matrix[:, others],
+                                  np.tile([default_params[PARAM_KEYS[index]] for index in others], (2, 1)))
+
+
+def test_branch_results_match_single_branch_model():
+    branches = _branches(40, seed=6)
+    portfolio = evaluate_portfolio(default_params, branches)
+    table = portfolio['סניפים']
+    for row, params in enumerate(branches):
+        expected = calculate_results(params)
+        for key in RESULT_KEYS:
+            assert table[key].iloc[row] == expected[key], key
+        if expected[IRR_KEY] is None:
+            assert np.isnan(table[IRR_KEY].iloc[row])
+        else:
+            assert table[IRR_KEY].iloc[row] == pytest.approx(expected[IRR_KEY], rel=1e-9, abs=1e-9)
+
+    consolidated = portfolio['מאוחד']
+    for key in ADDITIVE_KEYS:
+        assert consolidated[key] == pytest.approx(sum(calculate_results(params)[key] for params in branches),
+                                                  rel=1e-12), key
+    assert consolidated['מספר סניפים'] == len(branches)
+
+
+def test_single_branch_consolidation_equals_branch():
+    expected = calculate_results(default_params)
+    consolidated = evaluate_portfolio(default_params, [{}])['מאוחד']
+    for key in ADDITIVE_KEYS + ('החזר על ההשקעה (ROI)', 'תקופת החזר השקעה (שנים)'):
+        assert consolidated[key] == pytest.approx(expected[key], rel=1e-12), key
+    assert consolidated[IRR_KEY] == pytest.approx(expected[IRR_KEY], rel=1e-9)
+
+
+def test_annual_cash_flow_with_opening_years():
+    branches = _branches(25, seed=7)
+    opening_years = np.arange(len(branches)) % 4
+    portfolio = evaluate_portfolio(default_params, pd.DataFrame(branches).assign(**{OPENING_YEAR_COLUMN: opening_years}))
+    annual = portfolio['תזרים שנתי']
+
+    # תזרים לכל סניף בנפרד: השקעה בשנת הפתיחה ורווח בכל שנת מימון שאחריה
+    horizon = len(annual)
+    expected = np.zeros(horizon)
+    active = np.zeros(horizon)
+    for params, opening in zip(branches, opening_years):
+        results = calculate_results(params)
+        expected[opening] -= results['עלויות הקמה']
+        operating = slice(opening + 1, opening + 1 + max(params[YEARS_KEY], 0))
+        expected[operating] += results['רווח לפני מס']
+        active[operating] += 1
+    np.testing.assert_allclose(annual['תזרים נטו'], expected, rtol=1e-9, atol=1e-3)
+    np.testing.assert_allclose(annual['תזרים מצטבר'], np.cumsum(expected), rtol=1e-9, atol=1e-3)
+    np.testing.assert_array_equal(annual['סניפים פעילים'], active)
+    assert annual['השקעה'].sum() == pytest.approx(portfolio['מאוחד']['עלויות הקמה'], rel=1e-12)
+
+    # שנת פתיחה מפורשת גוברת על העמודה
+    assert evaluate_portfolio(default_params, branches, opening_years=0)['תזרים שנתי']['השקעה'].iloc[1:].eq(0).all()
+    with pytest.raises(ValueError, match='non-negative'):
+        evaluate_portfolio(default_params, branches, opening_years=-1)
@@ -0,0 +1,69 @@
+import pytest
+
+import result_cache
+from result_cache import ResultCache, canonical_key, memoize
+
+
+def test_canonical_key_ignores_dict_order():
+    assert canonical_key({'a': 1, 'b': 2}) == canonical_key({'b': 2, 'a': 1})
+
+
+def test_canonical_key_treats_int_and_float_alike():
+    assert canonical_key({'a': 50}, [1, 2]) == canonical_key({'a': 50.0}, [1.0, 2.0])
+    assert canonical_key({'a': 50}) != canonical_key({'a': 50.5})
+
+
+def test_memoize_calls_function_once_per_key():
+    calls = []
+
+    @memoize('test.square', cache=ResultCache())
+    def square(params):
+        calls.append(params)
+        return {'value': params['x'] ** 2}
+
+    assert square({'x': 3}) == square({'x': 3.0}) == {'value': 9}
+    assert len(calls) == 1
+
+
+def test_shared_dir_is_shared_between_instances(tmp_path):
+    ResultCache(shared_dir=str(tmp_path)).set('key', {'value': 1})
+    other = ResultCache(shared_dir=str(tmp_path))
+    assert other.get('key') == {'value': 1}
+    assert other.stats()['shared_hits'] == 1
+
+
+def test_shared_dir_must_be_private(tmp_path):
+    shared_dir = tmp_path / 'cache'
+    ResultCache(shared_dir=str(shared_dir))
+    assert shared_dir.stat().st_mode & 0o777 == 0o700
+    shared_dir.chmod(0o777)
+    with pytest.raises(PermissionError):
+        ResultCache(shared_dir=str(shared_dir))
+
+
+def test_shared_entries_expire(tmp_path):
+    ResultCache(shared_dir=str(tmp_path)).set('key', {'value': 1})
+    assert ResultCache(shared_dir=str(tmp_path), shared_ttl=-1).get('key') is None
+    assert not list(tmp_path.rglob('*.pkl'))
+
+
+def test_shared_dir_is_pruned_to_size(tmp_path):
+    cache = ResultCache(shared_dir=str(tmp_path), shared_max_bytes=10_000)
+    for index in range(100):
+        cache.set(f'key{index:03d}', b'x' * 500)
+    assert sum(path.stat().st_size for path in tmp_path.rglob('*.pkl')) <= 10_000
+
+
+def test_memoize_key_includes_code_version(monkeypatch):
+    cache = ResultCache()
+    calls = []
+
+    @memoize('test.version', cache=cache)
+    def identity(value):
+        calls.append(value)
+        return value
+
+    identity(1)
+    monkeypatch.setattr(result_cache, 'CODE_VERSION', 'other')
+    identity(1)
+    assert len(calls) == 2
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from batch_engine import IRR_KEY, PARAM_KEYS, params_to_matrix
+from model_core import calculate_results, default_params
+from scenario_store import ScenarioStore
+from test_batch_engine import random_scenarios
+
+ROI_KEY = 'החזר על ההשקעה (ROI)'
+RENT_KEY = 'שכר דירה חודשי'
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ScenarioStore(str(tmp_path / 'scenarios.db')) as store:
+        yield store
+
+
+def test_save_get_and_find_round_trip(store):
+    scenario_id = store.save(default_params, name='בסיס', branch='תל אביב')
+    record = store.get(scenario_id)
+    assert (record['id'], record['name'], record['branch']) == (scenario_id, 'בסיס', 'תל אביב')
+    assert record['params'] == {key: float(default_params[key]) for key in PARAM_KEYS}
+    expected = calculate_results(default_params)
+    for key, value in record['results'].items():
+        assert value == (None if expected[key] is None else pytest.approx(expected[key], rel=1e-12)), key
+
+    # 50 ו-50.0 הם אותם פרמטרים
+    same = {key: float(value) for key, value in default_params.items()}
+    assert store.find(same) == [scenario_id]
+    assert store.find({**default_params, RENT_KEY: default_params[RENT_KEY] + 1}) == []
+    assert store.get(scenario_id + 1) is None
+
+
+def test_save_batch_matches_single_saves(store):
+    scenarios = random_scenarios(20, seed=4)
+    names = [f'תרחיש {index}' for index in range(len(scenarios))]
+    assert store.save_batch(params_to_matrix(scenarios), names=names, branch='חיפה') == len(scenarios)
+    assert len(store) == len(scenarios)
+
+    frame = store.query(order_by=None, limit=None)
+    assert frame['שם'].tolist() == names
+    for (_, row), params in zip(frame.iterrows(), scenarios):
+        expected = calculate_results(params)
+        assert row[ROI_KEY] == pytest.approx(expected[ROI_KEY], rel=1e-12)
+        if expected[IRR_KEY] is None:
+            assert np.isnan(row[IRR_KEY])
+        else:
+            assert row[IRR_KEY] == pytest.approx(expected[IRR_KEY], rel=1e-9, abs=1e-9)
+
+
+def test_query_filters_order_and_limit(store):
+    scenarios = random_scenarios(60, seed=5)
+    store.save_batch(params_to_matrix(scenarios[:30]), branch='א')
+    store.save_batch(params_to_matrix(scenarios[30:]), branch='ב')
+
+    rents = np.array([params[RENT_KEY] for params in scenarios], dtype=np.float64)
+    limit = 120_000
+    frame = store.query([(RENT_KEY, '<', limit)], order_by=ROI_KEY, limit=None)
+    assert len(frame) == np.count_nonzero(rents < limit)
+    assert (frame[RENT_KEY] < limit).all()
+    assert frame[ROI_KEY].is_monotonic_decreasing
+
+    ascending = store.query(order_by=ROI_KEY, descending=False, limit=5)
+    assert len(ascending) == 5
+    assert ascending[ROI_KEY].is_monotonic_increasing
+    assert ascending[ROI_KEY].iloc[0] == store.query(order_by=ROI_KEY, descending=False, limit=None)[ROI_KEY].min()
+
+    branch = store.query(branch='ב', order_by=None, limit=None)
+    assert (branch['סניף'] == 'ב').all() and len(branch) == 30
+
+    # אפשר לסנן גם לפי שם העמודה
+    assert len(store.query([('monthly_rent', '<', limit)], limit=None)) == len(frame)
+    with pytest.raises(ValueError, match='operator'):
+        store.query([(RENT_KEY, 'LIKE', 1)])
+    with pytest.raises(ValueError, match='Unknown scenario field'):
+        store.query(order_by='no such field')
+
+
+@pytest.mark.parametrize('descending', [True, False])
+def test_query_puts_undefined_irr_last(store, descending):
+    # אפס מבקרים - רווח שלילי ו-IRR לא מוגדר
+    empty = {**default_params, 'מספר מבקרים ביום רגיל': 0, 'מספר מבקרים ביום חופשה/חג': 0}
+    scenarios = [empty, default_params, {**default_params, RENT_KEY: 60_000}, empty]
+    store.save_batch(params_to_matrix(scenarios))
+
+    irr = store.query(order_by=IRR_KEY, descending=descending, limit=None)[IRR_KEY]
+    defined = irr.iloc[:2]
+    assert defined.notna().all() and irr.iloc[2:].isna().all()
+    assert (defined.is_monotonic_decreasing if descending else defined.is_monotonic_increasing)
+
+
+def test_latest_by_branch_and_branches(store):
+    store.save(default_params, branch='ב')
+    store.save({**default_params, RENT_KEY: 1}, branch='א')
+    store.save({**default_params, RENT_KEY: 2}, branch='א')
+    store.save(default_params)
+
+    assert store.branches() == ['א', 'ב']
+    latest = store.latest_by_branch()
+    assert latest['שם'].tolist() == ['א', 'ב']
+    assert latest[RENT_KEY].tolist() == [2, default_params[RENT_KEY]]
+
+
+def test_compare_and_delete(store):
+    base = store.save(default_params, name='בסיס')
+    cheaper = store.save({**default_params, RENT_KEY: default_params[RENT_KEY] - 10_000})
+
+    table = store.compare([base, cheaper])
+    assert list(table.columns) == ['בסיס', f'#{cheaper}', f'הפרש #{cheaper}']
+    # רק הפרמטר שהשתנה מופיע, לצד כל התוצאות
+    assert RENT_KEY in table.index and 'מספר מבקרים ביום רגיל' not in table.index
+    assert table.loc[RENT_KEY, f'הפרש #{cheaper}'] == -10_000
+    assert table.loc['רווח לפני מס', f'הפרש #{cheaper}'] > 0
+
+    only = store.compare([cheaper, base], keys=[ROI_KEY])
+    assert list(only.index) == [ROI_KEY]
+
+    store.delete([base])
+    assert len(store) == 1 and store.get(base) is None